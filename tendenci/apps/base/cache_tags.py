@@ -0,0 +1,116 @@
+"""
+Namespaced cache tags.
+
+Cache entries are stored under a key that includes the current version
+of every tag they are registered under. Invalidating a tag bumps its
+version counter, so every entry registered under it is missed from then
+on and simply expires, without a cache.clear() or a list of keys to
+delete.
+
+    from tendenci.apps.base.cache_tags import (tagged_cache_get,
+        tagged_cache_set, invalidate_tags, instance_tag, app_tag)
+
+    tags = [app_tag('newsletters'), instance_tag(newsletter)]
+    content = tagged_cache_get('newsletter.content', tags)
+    if content is None:
+        content = render(...)
+        tagged_cache_set('newsletter.content', content, tags)
+
+    invalidate_tags(instance_tag(newsletter))
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+
+CACHE_TAG_PRE_KEY = "cache_tag"
+CACHE_TAGGED_PRE_KEY = "tagged"
+
+
+def app_tag(app_label):
+    return 'app.%s' % app_label
+
+
+def model_tag(model):
+    """
+    Tag for every entry about a model; takes a model class or instance.
+    """
+    opts = model._meta
+    return 'model.%s.%s' % (opts.app_label, opts.model_name)
+
+
+def instance_tag(instance):
+    return object_tag(instance, instance.pk)
+
+
+def object_tag(model, pk):
+    """
+    Same as instance_tag, when only the model and pk are at hand.
+    """
+    opts = model._meta
+    return 'instance.%s.%s.%s' % (opts.app_label, opts.model_name, pk)
+
+
+def _tag_key(tag):
+    return '.'.join([settings.CACHE_PRE_KEY, CACHE_TAG_PRE_KEY, tag])
+
+
+def _initial_version():
+    # a counter that was evicted restarts above any value it had before,
+    # so entries stored under the old value can not come back
+    return int(time.time() * 1000)
+
+
+def get_tag_versions(tags):
+    """
+    Returns a list with the current version of each tag,
+    creating the counters that do not exist yet.
+    """
+    keys = [_tag_key(tag) for tag in tags]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            version = _initial_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions.append(version)
+    return versions
+
+
+def invalidate_tags(*tags):
+    """
+    Bumps the version of each tag; every cache entry
+    registered under one of them is missed from now on.
+    """
+    for tag in tags:
+        key = _tag_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # the counter does not exist (yet or anymore)
+            if not cache.add(key, _initial_version(), None):
+                cache.incr(key)
+
+
+def make_tagged_key(key, tags):
+    versions = '.'.join(str(v) for v in get_tag_versions(tags))
+    digest = hashlib.md5(('%s|%s' % ('|'.join(tags), versions)).encode('utf-8')
+                         ).hexdigest()
+    return '.'.join([settings.CACHE_PRE_KEY, CACHE_TAGGED_PRE_KEY, key, digest])
+
+
+def tagged_cache_get(key, tags, default=None):
+    return cache.get(make_tagged_key(key, tags), default)
+
+
+def tagged_cache_set(key, value, tags, timeout=DEFAULT_TIMEOUT):
+    cache.set(make_tagged_key(key, tags), value, timeout)
+
+
+def tagged_cache_delete(key, tags):
+    cache.delete(make_tagged_key(key, tags))
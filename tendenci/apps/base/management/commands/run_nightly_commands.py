@@ -30,6 +30,7 @@ class Command(BaseCommand):
                     'captcha_clean',
                     'cleanup_expired_dbdumps',
                     'clearsessions',
+                    'update_event_log_rollups',
                     )
         for c in commands:
             try:
@@ -14,6 +14,7 @@ from django.core.cache import cache
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 
+from tendenci.apps.base.cache_tags import instance_tag, tagged_cache_get
 from tendenci.apps.base.template_tags import parse_tag_kwargs
 from tendenci.apps.base.utils import url_exists
 from tendenci.apps.profiles.models import Profile
@@ -480,7 +481,7 @@ class PhotoImageURL(Node):
             return "%s%s" % (getattr(settings, 'STATIC_URL'), getattr(settings, 'DEFAULT_IMAGE_URL'))
 
         cache_key = generate_image_cache_key(file=str(photo.pk), size=self.size, pre_key="photo", crop=self.crop, unique_key=str(photo.pk), quality=self.quality, constrain=self.constrain)
-        cached_image_url = cache.get(cache_key)
+        cached_image_url = tagged_cache_get(cache_key, [instance_tag(photo)])
         if cached_image_url:
             return cached_image_url
 
@@ -543,7 +544,7 @@ class ImageURL(Node):
         if file and file.pk:
 
             cache_key = generate_image_cache_key(file=str(file.id), size=self.size, pre_key=FILE_IMAGE_PRE_KEY, crop=self.crop, unique_key=str(file.id), quality=self.quality, constrain=self.constrain)
-            cached_image_url = cache.get(cache_key)
+            cached_image_url = tagged_cache_get(cache_key, [instance_tag(file)])
             if cached_image_url:
                 return cached_image_url
 
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.utils.translation import ugettext_lazy as _
 
 from tendenci.apps.perms.models import TendenciBaseModel
@@ -20,3 +21,11 @@ class EmailBlock(TendenciBaseModel):
         self.email_domain = self.email_domain.lower()
 
         super(EmailBlock, self).save(*args, **kwargs)
+
+
+def reset_blocklist(sender, **kwargs):
+    from tendenci.apps.email_blocks.utils import bump_blocklist_version
+    bump_blocklist_version()
+
+post_save.connect(reset_blocklist, sender=EmailBlock, weak=False)
+post_delete.connect(reset_blocklist, sender=EmailBlock, weak=False)
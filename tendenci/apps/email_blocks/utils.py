@@ -0,0 +1,90 @@
+import threading
+import time
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+
+from tendenci.apps.email_blocks.models import EmailBlock
+
+
+CACHE_PRE_KEY = "email_blocks"
+
+
+class Blocklist(object):
+    """
+    All blocked emails and domains, held in sets so a whole
+    recipient list can be filtered without a query per address.
+    """
+    def __init__(self, emails, domains):
+        self.emails = set(e.lower() for e in emails if e)
+        self.domains = set(d.lower() for d in domains if d)
+
+    def is_blocked(self, email_to_test):
+        if not email_to_test or not '@' in email_to_test:
+            return False
+
+        email_to_test = email_to_test.lower()
+        if email_to_test in self.emails:
+            return True
+        return email_to_test.split('@')[1] in self.domains
+
+    def filter(self, emails):
+        """
+        Returns the emails that are not blocked, keeping their order.
+        """
+        return [e for e in emails if not self.is_blocked(e)]
+
+
+# The blocklist is reloaded when the version stamp in the shared
+# cache changes; the stamp is re-read at most every CHECK_INTERVAL seconds.
+CHECK_INTERVAL = 10
+_blocklist = {'blocklist': None, 'version': None, 'checked': 0}
+
+
+def _version_key():
+    return '.'.join([settings.CACHE_PRE_KEY, CACHE_PRE_KEY, 'version'])
+
+
+def _blocklist_key(version):
+    return '.'.join([settings.CACHE_PRE_KEY, CACHE_PRE_KEY, 'all',
+                     version or ''])
+
+
+def bump_blocklist_version():
+    """
+    Makes every process reload the blocklist.
+    """
+    cache.set(_version_key(), uuid4().hex, None)
+    _blocklist['blocklist'] = None
+
+
+def get_blocklist():
+    now = time.time()
+    blocklist = _blocklist['blocklist']
+    if blocklist is not None and now - _blocklist['checked'] < CHECK_INTERVAL:
+        return blocklist
+
+    version = cache.get(_version_key())
+    if blocklist is None or version != _blocklist['version']:
+        key = _blocklist_key(version)
+        rows = cache.get(key)
+        if rows is None:
+            rows = list(EmailBlock.objects.values_list('email', 'email_domain'))
+            cache.set(key, rows)
+        blocklist = Blocklist([r[0] for r in rows], [r[1] for r in rows])
+        _blocklist['blocklist'] = blocklist
+        _blocklist['version'] = version
+    _blocklist['checked'] = now
+    return blocklist
+
+
+def is_blocked(email_to_test):
+    return get_blocklist().is_blocked(email_to_test)
+
+
+def filter_blocked(emails):
+    """
+    Removes blocked addresses from a list of emails in one pass.
+    """
+    return get_blocklist().filter(emails)
@@ -1,14 +1,12 @@
 import uuid
-import copy
 from django.db import models
-from django.db.models import Q
 
 from django.core.mail.message import EmailMessage
 from django.conf import settings
 from tendenci.apps.perms.models import TendenciBaseModel
 from tendenci.libs.tinymce import models as tinymce_models
 from tendenci.apps.site_settings.utils import get_setting
-from tendenci.apps.email_blocks.models import EmailBlock
+from tendenci.apps.email_blocks.utils import is_blocked, filter_blocked
 
 
 class Email(TendenciBaseModel):
@@ -53,14 +51,7 @@ class Email(TendenciBaseModel):
     
     @staticmethod
     def is_blocked(email_to_test):
-        if not email_to_test or not '@' in email_to_test:
-            return False
-        
-        email_to_test = email_to_test.lower()
-        email_domain = email_to_test.split('@')[1]
-        return EmailBlock.objects.filter(Q(email=email_to_test) | Q(email_domain=email_domain)
-                                         ).exists()
-        
+        return is_blocked(email_to_test)
 
     def send(self, fail_silently=False, **kwargs):
         recipient_list = []
@@ -101,14 +92,8 @@ class Email(TendenciBaseModel):
             headers['X-MSMail-Priority'] = 'High'
 
         # remove blocked from recipient_list and recipient_bcc_list
-        temp_recipient_list = copy.copy(recipient_list)
-        for e in temp_recipient_list:
-            if self.is_blocked(e):
-                recipient_list.remove(e)
-        temp_recipient_bcc_list = copy.copy(recipient_bcc_list)
-        for e in temp_recipient_bcc_list:
-            if self.is_blocked(e):
-                recipient_bcc_list.remove(e)
+        recipient_list = filter_blocked(recipient_list)
+        recipient_bcc_list = filter_blocked(recipient_bcc_list)
 
         if recipient_list or recipient_bcc_list:
             msg = EmailMessage(self.subject,
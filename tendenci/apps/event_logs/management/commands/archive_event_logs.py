@@ -0,0 +1,121 @@
+import gzip
+import os
+from datetime import date, datetime
+
+import simplejson
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+
+class Command(BaseCommand):
+    """
+    Moves event logs older than N months out of the event_logs table,
+    one month at a time, either into per-month archive tables
+    (event_logs_eventlog_YYYYMM) or into gzipped JSON lines files.
+
+    The rollups are brought up to date first and only event logs
+    already counted in them are archived, so the reports are unchanged.
+
+    Usage: python manage.py archive_event_logs --months=12 --format=jsonl
+    """
+    help = 'Archive event logs older than N months'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months',
+                            dest='months',
+                            type=int,
+                            default=12,
+            help='Archive event logs older than this many months')
+        parser.add_argument('--format',
+                            dest='format',
+                            choices=['table', 'jsonl'],
+                            default='table',
+            help='Archive into per-month tables or gzipped JSON lines files')
+        parser.add_argument('--dir',
+                            dest='dir',
+                            default=os.path.join(settings.TENDENCI_ROOT,
+                                                 'event_logs_archive'),
+            help='Directory for the JSON lines files')
+
+    def handle(self, *args, **options):
+        from tendenci.apps.event_logs.models import EventLog
+        from tendenci.apps.event_logs.rollups import (update_rollups,
+            get_rolled_up_to)
+
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+        verbosity = int(options['verbosity'])
+
+        update_rollups()
+        rolled_up_to = get_rolled_up_to()
+        if not rolled_up_to:
+            return
+        cutoff = date.today().replace(day=1) - relativedelta(
+                                                months=options['months'] - 1)
+        # only the days counted in the rollups
+        cutoff = min(cutoff, rolled_up_to)
+
+        oldest = EventLog.objects.filter(create_dt__lt=cutoff
+                                         ).order_by('create_dt').first()
+        if not oldest:
+            return
+
+        month = oldest.create_dt.date().replace(day=1)
+        while month < cutoff:
+            next_month = month + relativedelta(months=1)
+            queryset = EventLog.objects.filter(create_dt__gte=month,
+                                               create_dt__lt=min(next_month, cutoff))
+            with transaction.atomic():
+                if options['format'] == 'table':
+                    count = self.archive_to_table(queryset, month)
+                else:
+                    count = self.archive_to_file(queryset, month,
+                                                 options['dir'])
+                queryset.delete()
+            if verbosity > 0:
+                self.stdout.write('%s: archived %d event logs' % (
+                                  month.strftime('%Y-%m'), count))
+            month = next_month
+
+    def archive_to_table(self, queryset, month):
+        from tendenci.apps.event_logs.models import EventLog
+
+        table = EventLog._meta.db_table
+        archive_table = '%s_%s' % (table, month.strftime('%Y%m'))
+        sql, params = queryset.query.sql_with_params()
+        count = queryset.count()
+
+        quote = connection.ops.quote_name
+        cursor = connection.cursor()
+        if archive_table in connection.introspection.table_names(cursor):
+            cursor.execute('INSERT INTO %s %s' % (quote(archive_table), sql),
+                           params)
+        else:
+            cursor.execute('CREATE TABLE %s AS %s' % (quote(archive_table), sql),
+                           params)
+        return count
+
+    def archive_to_file(self, queryset, month, directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = os.path.join(directory,
+                            'eventlog-%s.jsonl.gz' % month.strftime('%Y-%m'))
+
+        count = 0
+        # appending adds a gzip member, which gzip readers handle
+        f = gzip.open(path, 'ab')
+        try:
+            for row in queryset.values().iterator():
+                f.write(simplejson.dumps(row, default=self.json_default))
+                f.write('\n')
+                count += 1
+        finally:
+            f.close()
+        return count
+
+    def json_default(self, value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        raise TypeError(repr(value))
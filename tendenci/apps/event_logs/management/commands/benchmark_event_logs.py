@@ -0,0 +1,66 @@
+import inspect
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.client import RequestFactory
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Compares calls per second of EventLog.objects.log when the
+    caller has to be found by inspecting the stack (legacy callers)
+    against the fast path, where the request, application and action
+    are known up front. The rows written are rolled back.
+
+    Usage: python manage.py benchmark_event_logs --count=2000
+    """
+    help = 'Benchmark EventLog.objects.log calls per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count',
+                            dest='count',
+                            type=int,
+                            default=1000,
+            help='Number of log calls per run')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        request = RequestFactory().get('/articles/', REMOTE_ADDR='127.0.0.1',
+                                       HTTP_USER_AGENT='Mozilla/5.0')
+        request.user = AnonymousUser()
+
+        self.report('inspect.stack() only (old per-call overhead)', count,
+                    lambda: inspect.stack())
+        self.report('log() legacy, stack fallback', count,
+                    lambda: self.legacy_view(request))
+        self.report('log() fast path', count,
+                    lambda: self.fast_view(request))
+
+    def legacy_view(self, request):
+        from tendenci.apps.event_logs.models import EventLog
+        return EventLog.objects.log()
+
+    def fast_view(self, request):
+        from tendenci.apps.event_logs.models import EventLog
+        return EventLog.objects.log(request=request, application='articles',
+                                    action='search')
+
+    def report(self, label, count, func):
+        try:
+            with transaction.atomic():
+                start = time.time()
+                for i in xrange(count):
+                    func()
+                elapsed = time.time() - start
+                raise Rollback
+        except Rollback:
+            pass
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write('%-48s %8d calls  %8.3fs  %10.1f calls/sec' % (
+                          label, count, elapsed, rate))
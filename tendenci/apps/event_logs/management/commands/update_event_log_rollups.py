@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Counts the event logs of the days that ended (and settled) since
+    the last run into the daily and monthly rollup tables read by the
+    event log reports.
+
+    Usage: python manage.py update_event_log_rollups
+    """
+    help = 'Update the event log rollup tables incrementally'
+
+    def handle(self, *args, **options):
+        from tendenci.apps.event_logs.rollups import (update_rollups,
+            get_rolled_up_to)
+
+        processed = update_rollups()
+        if int(options['verbosity']) > 0:
+            self.stdout.write('Counted %d event logs, up to %s' % (
+                              processed, get_rolled_up_to()))
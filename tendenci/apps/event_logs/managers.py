@@ -1,4 +1,4 @@
-import inspect
+import sys
 from time import strptime
 from datetime import datetime, timedelta
 from operator import and_
@@ -12,6 +12,8 @@ from django.db.models import Q
 from django.conf import settings
 
 from tendenci.apps.robots.models import Robot
+from tendenci.apps.event_logs.utils import remove_list
+from tendenci.apps.event_logs.writer import is_async_mode, get_event_log_writer
 
 
 default_keyword_args = (
@@ -29,6 +31,53 @@ default_keyword_args = (
 )
 
 
+def get_caller_frames(frame, depth=4):
+    """
+    Returns up to depth frames starting at frame, walking f_back.
+    Much cheaper than inspect.stack(), which reads the source
+    context of every frame on the stack.
+    """
+    frames = []
+    while frame is not None and len(frames) < depth:
+        frames.append(frame)
+        frame = frame.f_back
+    return frames
+
+
+def clean_application_name(module_name):
+    """
+    Turns a module path like tendenci.apps.articles.views
+    into the application name stored on the event log.
+    """
+    application = (module_name or '').split('.')
+    for item in remove_list:
+        if item in application:
+            application.remove(item)
+
+    # Join on the chance that we are left with more than one item
+    # in the list that we created
+    return ".".join(application)
+
+
+_server_ip_address = []
+
+
+def get_server_ip_address():
+    """
+    Returns the server ip address, resolved once per process.
+    """
+    if not _server_ip_address:
+        try:
+            ip_address = settings.INTERNAL_IPS[0]
+        except:
+            try:
+                ip_address = gethostbyname(gethostname())
+            except:
+                ip_address = '0.0.0.0'
+        _server_ip_address.append(ip_address)
+    return _server_ip_address[0]
+
+
 class EventLogManager(Manager):
     def search(self, query=None, *args, **kwargs):
         """
@@ -86,22 +135,35 @@ class EventLogManager(Manager):
         
             EventLog.objects.log(instance=obj_local_var)
 
+        The fast path never inspects the stack. It is taken when the
+        request is passed in and the application and action are either
+        passed in too or were stored on the request by EventLogMiddleware:
+
+            EventLog.objects.log(request=request, application='articles',
+                                 action='detail', instance=article)
+
+        With settings.EVENT_LOG_WRITE_MODE = 'async' the event log is
+        queued and written in batches; it has no pk when returned.
+        Pass sync=True when the saved row is needed right away.
+
         """
         request, user, instance = None, None, None
-        
-        stack = inspect.stack()
-        
+
+        # Caller frames are only walked for legacy callers that
+        # leave out the request, application or action.
+        caller = sys._getframe(1)
+        frames = []
+
         # If the request is not present in the kwargs, we try to find it
         # by inspecting the stack. We dive 3 levels if necessary. - JMO 2012-05-14
         if 'request' in kwargs:
             request = kwargs['request']
         else:
-            if 'request' in inspect.getargvalues(stack[1][0]).locals:
-                request = inspect.getargvalues(stack[1][0]).locals['request']
-            elif 'request' in inspect.getargvalues(stack[2][0]).locals:
-                request = inspect.getargvalues(stack[2][0]).locals['request']
-            elif 'request' in inspect.getargvalues(stack[3][0]).locals:
-                request = inspect.getargvalues(stack[3][0]).locals['request']
+            frames = get_caller_frames(caller)
+            for frame in frames[:3]:
+                if 'request' in frame.f_locals:
+                    request = frame.f_locals['request']
+                    break
 
 
         # If this eventlog is being triggered by something without a request, we
@@ -114,6 +176,9 @@ class EventLogManager(Manager):
         if 'pingdom.com' in request.META.get('HTTP_USER_AGENT', ''):
             return None
         
+        # Callers that need the saved row (e.g. its pk) pass sync=True
+        write_async = is_async_mode() and not kwargs.get('sync')
+
         event_log = self.model()
 
         # Set the following fields to blank
@@ -145,56 +210,52 @@ class EventLogManager(Manager):
         if 'description' in kwargs:
             event_log.description = kwargs['description']
 
+        # The view resolved by EventLogMiddleware, if any
+        view_application, view_action = getattr(request, 'event_log_view',
+                                                (None, None))
+
         # Application is the name of the app that the event is coming from
         #
-        # We get the app name via inspecting. Due to our update_perms_and_save util
-        # we must filter out perms as an actual source. This is ok since there are
-        # no views within perms. - JMO 2012-05-14
+        # We get the app name from the resolved view or via inspecting. Due to
+        # our update_perms_and_save util we must filter out perms as an actual
+        # source. This is ok since there are no views within perms. - JMO 2012-05-14
         if 'application' in kwargs:
             event_log.application = kwargs['application']
 
         if not event_log.application:
-            event_log.application = inspect.getmodule(stack[1][0]).__name__
-            if "perms" in event_log.application.split('.'):
-                event_log.application = inspect.getmodule(stack[2][0]).__name__
-                if "perms" in event_log.application.split('.'):
-                    event_log.application = inspect.getmodule(stack[3][0]).__name__
-
-        event_log.application = event_log.application.split('.')
-        remove_list = ['tendenci',
-                        'models',
-                        'views',
-                        'addons',
-                        'core',
-                        'apps',
-                        'contrib']
-
-        for item in remove_list:
-            if item in event_log.application:
-                event_log.application.remove(item)
-
-        # Join on the chance that we are left with more than one item
-        # in the list that we created
-        event_log.application = ".".join(event_log.application)
+            if view_application:
+                event_log.application = view_application
+            else:
+                frames = frames or get_caller_frames(caller)
+                for frame in frames[:3]:
+                    event_log.application = frame.f_globals.get('__name__', '')
+                    if "perms" not in event_log.application.split('.'):
+                        break
+
+        event_log.application = clean_application_name(event_log.application)
 
         # Action is the name of the view that is being called
         #
-        # We get it via the stack, but we filter out stacks that are named
-        # 'save' or 'update_perms_and_save' to avoid getting the incorrect
-        # view. We don't want to miss on a save method override or our own
-        # updating. - JMO 2012-05-14
+        # We get it from the resolved view or via the stack, but we filter out
+        # stacks that are named 'save' or 'update_perms_and_save' to avoid
+        # getting the incorrect view. We don't want to miss on a save method
+        # override or our own updating. - JMO 2012-05-14
         if 'action' in kwargs:
             event_log.action = kwargs['action']
+        elif view_action:
+            event_log.action = view_action
         else:
-            event_log.action = stack[1][3]
-            if stack[1][3] == "save":
-                if stack[2][3] == "save" or stack[2][3] == "update_perms_and_save":
-                    if stack[3][3] == "update_perms_and_save":
-                        event_log.action = stack[4][3]
+            frames = frames or get_caller_frames(caller)
+            names = [frame.f_code.co_name for frame in frames] + [''] * 4
+            event_log.action = names[0]
+            if names[0] == "save":
+                if names[1] == "save" or names[1] == "update_perms_and_save":
+                    if names[2] == "update_perms_and_save":
+                        event_log.action = names[3]
                     else:
-                        event_log.action = stack[3][3]
+                        event_log.action = names[2]
                 else:
-                    event_log.action = stack[2][3]
+                    event_log.action = names[1]
 
         if event_log.application == "base":
             event_log.application = "homepage"
@@ -244,24 +305,23 @@ class EventLogManager(Manager):
                 event_log.request_method = request.META.get('REQUEST_METHOD', '')
                 event_log.query_string = request.META.get('QUERY_STRING', '')
 
-                # take care of robots
-                robot = Robot.objects.get_by_agent(event_log.http_user_agent)
-                if robot:
-                    event_log.robot = robot
+                # take care of robots; the buffered writer does
+                # this when the batch is written
+                if not write_async:
+                    robot = Robot.objects.get_by_agent(event_log.http_user_agent)
+                    if robot:
+                        event_log.robot = robot
 
-            try:
-                event_log.server_ip_address = settings.INTERNAL_IPS[0]
-            except:
-                try:
-                    event_log.server_ip_address = gethostbyname(gethostname())
-                except:
-                    event_log.server_ip_address = '0.0.0.0'
+            event_log.server_ip_address = get_server_ip_address()
             if hasattr(request, 'path'):
                 event_log.url = request.path or ''
 
         # If we have an IP address, save the event_log
         if "." in event_log.user_ip_address:
-            event_log.save()
+            if write_async:
+                get_event_log_writer().add(event_log)
+            else:
+                event_log.save()
             return event_log
         else:
             return None
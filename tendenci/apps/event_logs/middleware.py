@@ -0,0 +1,21 @@
+from tendenci.apps.event_logs.managers import clean_application_name
+
+
+def get_view_log_info(view_func):
+    """
+    Returns the (application, action) pair EventLog.objects.log
+    records for a view function.
+    """
+    module_name = getattr(view_func, '__module__', '') or ''
+    action = getattr(view_func, '__name__', '') or ''
+    return clean_application_name(module_name), action
+
+
+class EventLogMiddleware(object):
+    """
+    Stores the application and action of the resolved view on the
+    request so that EventLog.objects.log does not need to inspect
+    the stack to find them.
+    """
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.event_log_view = get_view_log_info(view_func)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_logs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventLogDailyRollup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('application', models.CharField(max_length=50)),
+                ('action', models.CharField(max_length=50)),
+                ('source', models.CharField(max_length=50, null=True)),
+                ('event_id', models.IntegerField()),
+                ('description', models.CharField(max_length=120, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('day', models.DateField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EventLogMonthlyRollup',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('application', models.CharField(max_length=50)),
+                ('action', models.CharField(max_length=50)),
+                ('source', models.CharField(max_length=50, null=True)),
+                ('event_id', models.IntegerField()),
+                ('description', models.CharField(max_length=120, null=True)),
+                ('count', models.IntegerField(default=0)),
+                ('month', models.DateField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EventLogRollupState',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('name', models.CharField(unique=True, max_length=50)),
+                ('rolled_up_to', models.DateField(null=True)),
+                ('update_dt', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='eventlogdailyrollup',
+            index_together=set([('day', 'application')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='eventlogmonthlyrollup',
+            index_together=set([('month', 'application')]),
+        ),
+    ]
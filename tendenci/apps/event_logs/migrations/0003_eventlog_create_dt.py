@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import datetime
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event_logs', '0002_eventlog_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventlog',
+            name='create_dt',
+            field=models.DateTimeField(default=datetime.datetime.now, editable=False, db_index=True),
+        ),
+    ]
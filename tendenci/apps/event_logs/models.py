@@ -1,4 +1,6 @@
 import uuid
+from datetime import datetime
+
 from django.db import models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User
@@ -34,7 +36,8 @@ class EventLog(models.Model):
     request_method = models.CharField(max_length=10, null=True)
     query_string = models.TextField(null=True)
     robot = models.ForeignKey(Robot, null=True, on_delete=models.SET_NULL)
-    create_dt = models.DateTimeField(auto_now_add=True)
+    # set when the event is logged; buffered logs are written later
+    create_dt = models.DateTimeField(default=datetime.now, editable=False, db_index=True)
 
     uuid = models.CharField(max_length=40)
     application = models.CharField(max_length=50, db_index=True)
@@ -123,3 +126,49 @@ class EventLogColor(CachedColorModel):
 
     class Meta:
         app_label="event_logs"
+
+
+class EventLogRollupBase(models.Model):
+    """
+    Event log counts grouped by application, action, source and
+    event_id. Kept current by the update_event_log_rollups command.
+    """
+    application = models.CharField(max_length=50)
+    action = models.CharField(max_length=50)
+    source = models.CharField(max_length=50, null=True)
+    event_id = models.IntegerField()
+    description = models.CharField(max_length=120, null=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class EventLogDailyRollup(EventLogRollupBase):
+    day = models.DateField(db_index=True)
+
+    class Meta:
+        app_label="event_logs"
+        index_together = [('day', 'application')]
+
+
+class EventLogMonthlyRollup(EventLogRollupBase):
+    # the first day of the month
+    month = models.DateField(db_index=True)
+
+    class Meta:
+        app_label="event_logs"
+        index_together = [('month', 'application')]
+
+
+class EventLogRollupState(models.Model):
+    """
+    How far the rollups go: the event logs created before
+    rolled_up_to (a day) are counted.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    rolled_up_to = models.DateField(null=True)
+    update_dt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label="event_logs"
@@ -0,0 +1,219 @@
+"""
+Daily and monthly event log rollups.
+
+update_rollups() counts the event logs of each day into
+EventLogDailyRollup and EventLogMonthlyRollup once the day has
+settled: EVENT_LOG_ROLLUP_SETTLE_WINDOW seconds (two hours by default)
+after it ended, so the event logs written late by buffered writers are
+in. The reports read the counts of the days rolled up from the rollups
+(monthly ones for the whole months in a summary) and count the later
+event logs from the raw rows, so they never scan the whole event_logs
+table.
+"""
+from datetime import date, datetime, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, F
+
+from tendenci.apps.event_logs.models import (EventLog, EventLogDailyRollup,
+    EventLogMonthlyRollup, EventLogRollupState)
+
+
+ROLLUP_STATE_NAME = 'rollups'
+ROLLUP_KEYS = ('application', 'action', 'source', 'event_id', 'description')
+
+
+def as_date(value):
+    """
+    DATE(create_dt) comes back as a string on sqlite.
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def get_rolled_up_to():
+    """
+    The day the rollups go up to (excluded), or None.
+    """
+    state = EventLogRollupState.objects.filter(name=ROLLUP_STATE_NAME).first()
+    if state:
+        return state.rolled_up_to
+    return None
+
+
+def get_settled_day(now=None):
+    """
+    The first day that hasn't settled yet.
+    """
+    now = now or datetime.now()
+    settle_window = getattr(settings, 'EVENT_LOG_ROLLUP_SETTLE_WINDOW', 2 * 60 * 60)
+    return (now - timedelta(seconds=settle_window)).date()
+
+
+def _add_counts(model, date_field, counts):
+    for key, count in counts.items():
+        filters = dict(zip((date_field,) + ROLLUP_KEYS, key))
+        updated = model.objects.filter(**filters).update(
+                                        count=F('count') + count)
+        if not updated:
+            model.objects.create(count=count, **filters)
+
+
+def update_rollups(until=None):
+    """
+    Counts the event logs of the days from where the rollups stopped
+    to until (excluded, the first day that hasn't settled by default)
+    into the rollup tables, a day per transaction. Returns the number
+    of event logs counted.
+    """
+    until = until or get_settled_day()
+    processed = 0
+
+    while True:
+        with transaction.atomic():
+            state, created = EventLogRollupState.objects.select_for_update(
+                                ).get_or_create(name=ROLLUP_STATE_NAME)
+            day = state.rolled_up_to
+            if day is None:
+                oldest = EventLog.objects.order_by('create_dt').first()
+                day = oldest.create_dt.date() if oldest else until
+            if day >= until:
+                if state.rolled_up_to is None:
+                    state.rolled_up_to = day
+                    state.save()
+                break
+            next_day = day + timedelta(days=1)
+
+            rows = EventLog.objects.filter(create_dt__gte=day,
+                                           create_dt__lt=next_day)\
+                        .values(*ROLLUP_KEYS)\
+                        .annotate(count=Count('pk'))\
+                        .order_by()
+
+            daily, monthly = {}, {}
+            for row in rows:
+                values = tuple(row[k] for k in ROLLUP_KEYS)
+                daily[(day,) + values] = row['count']
+                monthly[(day.replace(day=1),) + values] = row['count']
+                processed += row['count']
+
+            if not daily:
+                # skip the days without event logs
+                following = EventLog.objects.filter(create_dt__gte=next_day
+                                                    ).order_by('create_dt').first()
+                next_day = min(following.create_dt.date(), until) if following else until
+
+            _add_counts(EventLogDailyRollup, 'day', daily)
+            _add_counts(EventLogMonthlyRollup, 'month', monthly)
+
+            state.rolled_up_to = next_day
+            state.save()
+
+    return processed
+
+
+def _whole_months(from_date, to_date):
+    """
+    The first days of the months entirely between from_date and to_date.
+    """
+    months = []
+    month = from_date.replace(day=1)
+    if month < from_date:
+        month += relativedelta(months=1)
+    while month + relativedelta(months=1) - timedelta(days=1) <= to_date:
+        months.append(month)
+        month += relativedelta(months=1)
+    return months
+
+
+def _rollup_rows(fields, from_date, to_date, by_day, filters):
+    """
+    The rollup counts between from_date and to_date: the monthly
+    rollups of the whole months unless by_day, the daily rollups
+    of the other days.
+    """
+    daily = EventLogDailyRollup.objects.filter(day__gte=from_date,
+                                               day__lte=to_date,
+                                               **filters)
+    rows = []
+    months = [] if by_day else _whole_months(from_date, to_date)
+    if months:
+        rows = list(EventLogMonthlyRollup.objects.filter(month__in=months, **filters)
+                                                 .values(*fields)
+                                                 .annotate(count=Sum('count'))
+                                                 .order_by())
+        daily = daily.exclude(day__gte=months[0],
+                              day__lt=months[-1] + relativedelta(months=1))
+    return rows + list(daily.values(*fields).annotate(count=Sum('count')).order_by())
+
+
+def _merge_counts(rows, fields):
+    counts = {}
+    for row in rows:
+        key = tuple(row[f] for f in fields)
+        counts[key] = counts.get(key, 0) + row['count']
+    result = []
+    for key, count in counts.items():
+        item = dict(zip(fields, key))
+        item['count'] = count
+        result.append(item)
+    return result
+
+
+def get_event_log_counts(fields, from_date, to_date, form=None,
+                         by_day=False, **filters):
+    """
+    Returns a list of dicts with the given fields and a count of the
+    event logs between from_date and to_date (inclusive), sorted by
+    count descending. With by_day=True each dict also has a 'day' and
+    the list is sorted by day first.
+
+    form is a validated EventsFilterForm. Its event id filter is served
+    from the rollups; the ip, user and session filters are not in the
+    rollups and make the counts come from the raw event logs.
+    """
+    fields = list(fields)
+    if by_day:
+        fields = ['day'] + fields
+    next_day = to_date + timedelta(days=1)
+
+    raw_filters = False
+    if form is not None and form.is_valid():
+        cd = form.cleaned_data
+        raw_filters = any([cd['ip'], cd['user_id'], cd['session_id']])
+        if cd['event_id']:
+            filters['event_id'] = cd['event_id']
+
+    if raw_filters:
+        queryset = form.process_filter(EventLog.objects.filter(**filters))
+        queryset = queryset.filter(create_dt__gte=from_date,
+                                   create_dt__lt=next_day)
+        rollup_rows = []
+    else:
+        queryset = EventLog.objects.filter(create_dt__gte=from_date,
+                                           create_dt__lt=next_day,
+                                           **filters)
+        rolled_up_to = get_rolled_up_to()
+        if rolled_up_to:
+            queryset = queryset.filter(create_dt__gte=rolled_up_to)
+        rollup_rows = _rollup_rows(fields, from_date, to_date, by_day, filters)
+
+    if by_day:
+        queryset = queryset.extra(select={'day': 'DATE(create_dt)'})
+    raw_rows = list(queryset.values(*fields).annotate(count=Count('pk'))
+                                            .order_by())
+    if by_day:
+        for row in raw_rows:
+            row['day'] = as_date(row['day'])
+
+    counts = _merge_counts(rollup_rows + raw_rows, fields)
+    if by_day:
+        counts.sort(key=lambda item: (item['day'], -item['count']))
+    else:
+        counts.sort(key=lambda item: -item['count'])
+    return counts
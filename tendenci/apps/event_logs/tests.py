@@ -4,10 +4,16 @@ unittest). These will both pass when you run "manage.py test".
 
 Replace these with more appropriate tests for your application.
 """
-from django.test import TestCase, Client
-from django.contrib.auth.models import User
+from datetime import datetime
 
-from tendenci.apps.event_logs.models import EventLog
+from django.test import TestCase, Client, override_settings
+from django.test.client import RequestFactory
+from django.contrib.auth.models import User, AnonymousUser
+
+from tendenci.apps.event_logs.models import EventLog, EventLogDailyRollup
+from tendenci.apps.event_logs.writer import flush_event_logs
+from tendenci.apps.event_logs.rollups import (update_rollups,
+    get_event_log_counts, get_rolled_up_to)
 
 class EventLogTest(TestCase):
     def setUp(self):
@@ -116,6 +122,100 @@ class EventLogTest(TestCase):
             'instance': self.user,
         }   
         
-        self.assertRaises(Exception, EventLog.objects.log(**event_log_defaults))       
-        
-            
\ No newline at end of file
+        self.assertRaises(Exception, EventLog.objects.log(**event_log_defaults))
+
+    def test_log_fast_path(self):
+        """
+            Event log with request, application and action passed in
+            and with the view stored on the request by the middleware
+        """
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1')
+        request.user = AnonymousUser()
+
+        event_log = EventLog.objects.log(request=request,
+                                         application='articles',
+                                         action='detail')
+        self.assertEqual(event_log.application, 'articles')
+        self.assertEqual(event_log.action, 'detail')
+
+        request.event_log_view = ('news', 'search')
+        event_log = EventLog.objects.log(request=request)
+        self.assertEqual(event_log.application, 'news')
+        self.assertEqual(event_log.action, 'search')
+
+    @override_settings(EVENT_LOG_WRITE_MODE='async')
+    def test_log_async_writer(self):
+        """
+            Event logs are queued in async mode and written on flush
+        """
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1')
+        request.user = AnonymousUser()
+        count = EventLog.objects.count()
+
+        EventLog.objects.log(request=request, application='articles',
+                             action='detail')
+        self.assertEqual(EventLog.objects.count(), count)
+
+        logged = datetime.now()
+        self.assertEqual(flush_event_logs(), 1)
+        self.assertEqual(EventLog.objects.count(), count + 1)
+        # the time of the event, not of the flush
+        self.assertTrue(EventLog.objects.order_by('-pk')[0].create_dt <= logged)
+
+    def test_rollups(self):
+        """
+            Report counts are the same before and after updating
+            the rollups, rows are only counted once and the days
+            that haven't settled are left to the raw rows
+        """
+        from datetime import date, datetime, timedelta
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1')
+        request.user = AnonymousUser()
+        for i in range(3):
+            EventLog.objects.log(request=request, application='articles',
+                                 action='detail')
+        today = date.today()
+        yesterday = today - timedelta(days=1)
+        EventLog.objects.filter(application='articles').update(
+            create_dt=datetime.combine(yesterday, datetime.min.time()) + timedelta(hours=12))
+        EventLog.objects.log(request=request, application='articles',
+                             action='detail')
+
+        def counts():
+            return get_event_log_counts(['application'], yesterday, today,
+                                        application='articles')
+
+        self.assertEqual(counts()[0]['count'], 4)
+        self.assertEqual(update_rollups(until=today), 3)
+        self.assertEqual(update_rollups(until=today), 0)
+        self.assertEqual(get_rolled_up_to(), today)
+        self.assertEqual(counts()[0]['count'], 4)
+
+        EventLog.objects.log(request=request, application='articles',
+                             action='detail')
+        self.assertEqual(counts()[0]['count'], 5)
+
+        by_day = get_event_log_counts(['application'], yesterday, today,
+                                      by_day=True, application='articles')
+        self.assertEqual([(row['day'], row['count']) for row in by_day],
+                         [(yesterday, 3), (today, 2)])
+
+    def test_monthly_rollups(self):
+        """
+            Summaries of whole months read the monthly rollups
+        """
+        from datetime import date, datetime
+        request = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1')
+        request.user = AnonymousUser()
+        for day in (1, 10, 31):
+            EventLog.objects.log(request=request, application='news',
+                                 action='detail')
+            last = EventLog.objects.filter(application='news').latest('pk')
+            EventLog.objects.filter(pk=last.pk).update(create_dt=datetime(2016, 3, day, 12))
+
+        self.assertEqual(update_rollups(until=date(2016, 4, 1)), 3)
+        EventLogDailyRollup.objects.filter(application='news').delete()
+
+        counts = get_event_log_counts(['application'], date(2016, 3, 1), date(2016, 3, 31),
+                                      application='news')
+        self.assertEqual(counts[0]['count'], 3)
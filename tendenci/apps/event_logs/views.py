@@ -9,7 +9,6 @@ from django.template import RequestContext
 from django.http import HttpResponseRedirect, HttpResponse
 from django.core.urlresolvers import reverse
 from django.conf import settings
-from django.db.models import Count
 
 from tendenci.apps.base.http import render_to_403
 from tendenci.apps.base.http import Http403
@@ -21,6 +20,7 @@ from tendenci.apps.event_logs.utils import day_bars, month_days,\
     request_month_range
 from tendenci.apps.event_logs.models import EventLog, EventLogBaseColor, EventLogColor
 from tendenci.apps.event_logs.forms import EventLogSearchForm, EventsFilterForm
+from tendenci.apps.event_logs.rollups import get_event_log_counts
 from tendenci.apps.event_logs.colors import non_model_event_logs, get_color
 
 
@@ -158,26 +158,15 @@ def action_colors(data):
 
 @superuser_required
 def event_summary_report(request):
-    queryset = EventLog.objects.all()
     form = EventsFilterForm(request.GET)
-    if form.is_valid():
-        queryset = form.process_filter(queryset)
-
     from_date, to_date = request_month_range(request)
-    next_day = to_date+timedelta(days=1)
-    queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
-
-    chart_data = queryset\
-                .extra(select={'day': 'DATE(create_dt)'})\
-                .values('day', 'application')\
-                .annotate(count=Count('pk'))\
-                .order_by('day', '-count')
+
+    chart_data = get_event_log_counts(['application'], from_date, to_date,
+                                      form=form, by_day=True)
     chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, application_colors)
 
-    summary_data = queryset\
-                .values('application')\
-                .annotate(count=Count('pk'))\
-                .order_by('-count')
+    summary_data = get_event_log_counts(['application'], from_date, to_date,
+                                        form=form)
     application_colors(summary_data)
 
     m = 1+len(summary_data)/3
@@ -193,26 +182,17 @@ def event_summary_report(request):
 
 @superuser_required
 def event_application_summary_report(request, application):
-    queryset = EventLog.objects.filter(application=application)
     form = EventsFilterForm(request.GET)
-    if form.is_valid():
-        queryset = form.process_filter(queryset)
-
     from_date, to_date = request_month_range(request)
-    next_day = to_date+timedelta(days=1)
-    queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
-
-    chart_data = queryset\
-                .extra(select={'day': 'DATE(create_dt)'})\
-                .values('day', 'action')\
-                .annotate(count=Count('pk'))\
-                .order_by('day', '-count')
+
+    chart_data = get_event_log_counts(['action'], from_date, to_date,
+                                      form=form, by_day=True,
+                                      application=application)
     chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, action_colors)
 
-    summary_data = queryset\
-                .values('action', 'description')\
-                .annotate(count=Count('pk'))\
-                .order_by('-count')
+    summary_data = get_event_log_counts(['action', 'description'],
+                                        from_date, to_date, form=form,
+                                        application=application)
     action_colors(summary_data)
 
     return render_to_response(
@@ -228,26 +208,15 @@ def event_summary_historical_report(request):
     """
     This report queries based on source for historical reporting purposes
     """
-    queryset = EventLog.objects.all()
     form = EventsFilterForm(request.GET)
-    if form.is_valid():
-        queryset = form.process_filter(queryset)
-
     from_date, to_date = request_month_range(request)
-    next_day = to_date+timedelta(days=1)
-    queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
-
-    chart_data = queryset\
-                .extra(select={'day': 'DATE(create_dt)'})\
-                .values('day', 'source')\
-                .annotate(count=Count('pk'))\
-                .order_by('day', '-count')
+
+    chart_data = get_event_log_counts(['source'], from_date, to_date,
+                                      form=form, by_day=True)
     chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, source_colors)
 
-    summary_data = queryset\
-                .values('source')\
-                .annotate(count=Count('pk'))\
-                .order_by('-count')
+    summary_data = get_event_log_counts(['source'], from_date, to_date,
+                                        form=form)
     source_colors(summary_data)
 
     m = 1+len(summary_data)/3
@@ -263,26 +232,16 @@ def event_summary_historical_report(request):
 
 @superuser_required
 def event_source_summary_report(request, source):
-    queryset = EventLog.objects.filter(source=source)
     form = EventsFilterForm(request.GET)
-    if form.is_valid():
-        queryset = form.process_filter(queryset)
-
     from_date, to_date = request_month_range(request)
-    next_day = to_date+timedelta(days=1)
-    queryset = queryset.filter(create_dt__gte=from_date, create_dt__lte=next_day)
-
-    chart_data = queryset\
-                .extra(select={'day': 'DATE(create_dt)'})\
-                .values('day', 'event_id')\
-                .annotate(count=Count('pk'))\
-                .order_by('day', '-count')
+
+    chart_data = get_event_log_counts(['event_id'], from_date, to_date,
+                                      form=form, by_day=True, source=source)
     chart_data = day_bars(chart_data, from_date.year, from_date.month, 300, event_colors)
 
-    summary_data = queryset\
-                .values('event_id', 'description')\
-                .annotate(count=Count('pk'))\
-                .order_by('-count')
+    summary_data = get_event_log_counts(['event_id', 'description'],
+                                        from_date, to_date, form=form,
+                                        source=source)
     event_colors(summary_data)
 
     return render_to_response(
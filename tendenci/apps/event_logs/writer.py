@@ -0,0 +1,137 @@
+"""
+Buffered writer for event logs.
+
+With settings.EVENT_LOG_WRITE_MODE = 'async', EventLog.objects.log
+queues unsaved event logs here instead of saving them in the request.
+The queue is per process and is written with bulk_create when
+EVENT_LOG_BATCH_SIZE records are waiting, every EVENT_LOG_FLUSH_INTERVAL
+seconds from a background thread, and once more at interpreter exit.
+"""
+import atexit
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_async_mode():
+    return getattr(settings, 'EVENT_LOG_WRITE_MODE', 'sync') == 'async'
+
+
+class EventLogWriter(object):
+    def __init__(self, batch_size=100, flush_interval=5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # the writer can be inherited by forked workers; each process
+        # gets its own queue and flush thread
+        self._pid = os.getpid()
+        self._queue = []
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run,
+                                            name='event-log-writer')
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval):
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def add(self, event_log):
+        """
+        Queues an unsaved event log. Flushes inline once the
+        batch size is reached.
+        """
+        # stamped now, not when the batch is written
+        if not event_log.create_dt:
+            event_log.create_dt = datetime.now()
+        with self._lock:
+            self._ensure_thread()
+            self._queue.append(event_log)
+            full = len(self._queue) >= self.batch_size
+        if full:
+            self.flush()
+
+    def pending(self):
+        return len(self._queue)
+
+    def flush(self):
+        """
+        Writes everything queued so far. Returns the number of rows written.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            batch, self._queue = self._queue, []
+        if not batch:
+            return 0
+
+        from tendenci.apps.event_logs.models import EventLog
+        from tendenci.apps.robots.models import Robot
+
+        robots = {}
+        for event_log in batch:
+            if not event_log.uuid:
+                event_log.uuid = str(uuid.uuid1())
+            # the robot lookup is deferred from the request to here
+            agent = event_log.http_user_agent
+            if agent and not event_log.robot_id:
+                if agent not in robots:
+                    robots[agent] = Robot.objects.get_by_agent(agent)
+                event_log.robot = robots[agent]
+
+        try:
+            EventLog.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            logger.exception('Failed to write %d event logs', len(batch))
+            return 0
+        return len(batch)
+
+    def stop(self):
+        self._stopped.set()
+        self.flush()
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_event_log_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = EventLogWriter(
+                    batch_size=getattr(settings, 'EVENT_LOG_BATCH_SIZE', 100),
+                    flush_interval=getattr(settings,
+                                           'EVENT_LOG_FLUSH_INTERVAL', 5))
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def flush_event_logs():
+    """
+    Writes any queued event logs of this process.
+    """
+    if _writer is not None:
+        return _writer.flush()
+    return 0
@@ -0,0 +1,163 @@
+"""
+Calendar materialization for the month, week and day views.
+
+The events visible to a user that overlap the whole grid are fetched in
+one query and bucketed into days in Python; the event_list template tag
+then reads each day from the buckets instead of querying for every
+day cell. Buckets are cached per permission class and date range, and
+dropped whenever an event or event type is saved or deleted.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from tendenci.apps.base.cache_tags import (model_tag, invalidate_tags,
+    tagged_cache_get, tagged_cache_set)
+from tendenci.apps.events.models import Event, Type
+from tendenci.apps.perms.utils import get_query_filters
+
+EVENT_CALENDAR_CACHE_TIMEOUT = getattr(settings, 'EVENT_CALENDAR_CACHE_TIMEOUT', 60 * 60)
+
+# the event_list tag's bounds of a day
+DAY_BOUND = timedelta(hours=23, minutes=59)
+
+
+def permission_class(user):
+    """
+    Returns the part of the cache key that determines which events
+    the user can view. Anonymous users and superusers see the same
+    events as everyone of their kind; other users see events by their
+    groups and their own events too, so they get a class of their own.
+    """
+    user = getattr(user, 'impersonated_user', user)
+    if not isinstance(user, User) or user.is_anonymous():
+        return 'anonymous'
+    if user.profile.is_superuser:
+        return 'admin'
+    return 'user.%s' % user.pk
+
+
+def invalidate_calendars(**kwargs):
+    invalidate_tags(model_tag(Event))
+
+
+def as_date(day):
+    if isinstance(day, datetime):
+        return day.date()
+    return day
+
+
+def order_events(events, ordering=None):
+    """
+    Sorts a day's events as the event_list tag orders them.
+    """
+    if ordering == 'single_day':
+        return sorted(events, key=lambda e: (not e.priority, e.start_dt.hour, e.start_dt.minute))
+    if not ordering:
+        return sorted(events, key=lambda e: (not e.priority, e.start_dt))
+
+    reverse = ordering.startswith('-')
+    names = ordering.lstrip('-').split('__')
+
+    def key(event):
+        value = event
+        for name in names:
+            value = getattr(value, name, None)
+        return value
+    return sorted(events, key=key, reverse=reverse)
+
+
+class EventCalendar(object):
+    """
+    The events of the days from start to end (dates, inclusive)
+    visible to user, optionally narrowed by the search form's query
+    and search category.
+    """
+    def __init__(self, user, start, end, query=None, cat=None):
+        self.user = user
+        self.start = as_date(start)
+        self.end = as_date(end)
+        self.query = query
+        self.cat = cat
+        self._days = None
+        self._types = {}
+
+    def covers(self, day):
+        day = as_date(day)
+        return self.start <= day <= self.end
+
+    def cache_key(self):
+        return 'events.calendar.%s.%s.%s' % (
+            permission_class(self.user), self.start.isoformat(), self.end.isoformat())
+
+    def get_queryset(self):
+        start = datetime(self.start.year, self.start.month, self.start.day)
+        end = datetime(self.end.year, self.end.month, self.end.day) + DAY_BOUND
+
+        filters = get_query_filters(self.user, 'events.view_event')
+        events = Event.objects.filter(filters).filter(
+            start_dt__lte=end, end_dt__gte=start, enable_private_slug=False).distinct()
+        events = events.select_related('type__color_set').order_by('start_dt')
+
+        if self.cat == 'priority':
+            events = events.filter(**{self.cat: True})
+        elif self.query and self.cat:
+            events = events.filter(**{self.cat: self.query})
+        return events
+
+    def build_days(self):
+        """
+        Returns {date: [event, ...]} for every day in the range,
+        an event appearing on each day it overlaps.
+        """
+        days = {}
+        day = self.start
+        while day <= self.end:
+            days[day] = []
+            day += timedelta(days=1)
+
+        for event in self.get_queryset():
+            day = max(event.start_dt.date(), self.start)
+            last = min(event.end_dt.date(), self.end)
+            while day <= last:
+                day_start = datetime(day.year, day.month, day.day)
+                # same bounds as a single day query
+                if event.start_dt <= day_start + DAY_BOUND and event.end_dt >= day_start:
+                    # weekend days only show events that occur on weekends
+                    if day.weekday() < 5 or event.on_weekend:
+                        days[day].append(event)
+                day += timedelta(days=1)
+        return days
+
+    @property
+    def days(self):
+        if self._days is None:
+            # searches are not cached
+            cacheable = not (self.cat == 'priority' or (self.query and self.cat))
+            tags = [model_tag(Event)]
+            if cacheable:
+                self._days = tagged_cache_get(self.cache_key(), tags)
+            if self._days is None:
+                self._days = self.build_days()
+                if cacheable:
+                    tagged_cache_set(self.cache_key(), self._days, tags,
+                                     EVENT_CALENDAR_CACHE_TIMEOUT)
+        return self._days
+
+    def get_type(self, type_slug):
+        if type_slug not in self._types:
+            self._types[type_slug] = Type.objects.filter(slug=type_slug).first()
+        return self._types[type_slug]
+
+    def events_on(self, day, type_slug=None, ordering=None):
+        """
+        Returns the events of a day, of the type with type_slug
+        if there is one, ordered as the event_list tag orders them.
+        """
+        events = self.days.get(as_date(day), [])
+        if type_slug:
+            type = self.get_type(type_slug)
+            if type:
+                events = [e for e in events if e.type_id == type.pk]
+        return order_events(events, ordering)
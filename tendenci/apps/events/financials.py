@@ -0,0 +1,103 @@
+"""
+Financial summaries of events: the money collected and outstanding,
+the add-on totals and the registrant counts of any number of events,
+computed with one grouped query each instead of per event and
+registration.
+
+    events = attach_financial_summaries(Event.objects.all())
+    events[0].money_collected  # no query
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+# events per query
+CHUNK_SIZE = 500
+
+
+class FinancialSummary(object):
+    def __init__(self, total=None, outstanding=None, addons=None, has_addons=False, registrants=None):
+        self.total = total or Decimal('0')
+        self.money_outstanding = outstanding or Decimal('0')
+        self.addons = addons or Decimal('0')
+        self.has_addons = has_addons
+        self.registrants_count = registrants
+
+    @property
+    def addons_total(self):
+        # counted only while the event has active add-ons
+        if not self.has_addons:
+            return Decimal('0')
+        return self.addons
+
+    @property
+    def money_collected(self):
+        return self.total - self.money_outstanding
+
+    @property
+    def money_total(self):
+        return self.money_collected + self.money_outstanding
+
+    @property
+    def registration_total(self):
+        if not self.has_addons:
+            return self.money_total
+        return self.money_total - self.addons
+
+
+def get_financial_summaries(event_ids, registrants=True):
+    """
+    Returns {event id: FinancialSummary} for the events with the given
+    ids. Without registrants, their registrants_count is None.
+    """
+    from tendenci.apps.events.models import Addon, RegAddon, Registrant, Registration
+
+    event_ids = list(event_ids)
+    if len(event_ids) > CHUNK_SIZE:
+        summaries = {}
+        for i in xrange(0, len(event_ids), CHUNK_SIZE):
+            summaries.update(get_financial_summaries(event_ids[i:i + CHUNK_SIZE], registrants))
+        return summaries
+    if not event_ids:
+        return {}
+
+    money = Registration.objects.filter(event__in=event_ids, canceled=False).values(
+        'event').annotate(total=Sum('invoice__total'), outstanding=Sum('invoice__balance'))
+    money = dict((row['event'], row) for row in money)
+
+    addons = dict(RegAddon.objects.filter(
+        registration__event__in=event_ids, registration__canceled=False).values(
+        'registration__event').annotate(amount=Sum('amount')).values_list(
+        'registration__event', 'amount'))
+
+    with_addons = set(Addon.objects.filter(
+        event__in=event_ids, status=True).values_list('event', flat=True).distinct())
+
+    counts = {}
+    if registrants:
+        counts = dict(Registrant.objects.filter(
+            registration__event__in=event_ids, cancel_dt=None).values(
+            'registration__event').annotate(count=Count('pk')).values_list(
+            'registration__event', 'count'))
+
+    summaries = {}
+    for event_id in event_ids:
+        row = money.get(event_id, {})
+        summaries[event_id] = FinancialSummary(total=row.get('total'),
+                                               outstanding=row.get('outstanding'),
+                                               addons=addons.get(event_id),
+                                               has_addons=event_id in with_addons,
+                                               registrants=counts.get(event_id, 0) if registrants else None)
+    return summaries
+
+
+def attach_financial_summaries(events):
+    """
+    Evaluates events and attaches their financial summaries,
+    read by the money properties of Event. Returns a list.
+    """
+    events = list(events)
+    summaries = get_financial_summaries(event.pk for event in events)
+    for event in events:
+        event._financial_summary = summaries[event.pk]
+    return events
@@ -0,0 +1,134 @@
+"""
+The iCalendar feed of upcoming events.
+
+Calendar clients poll the feed constantly, so it is built per permission
+class (anonymous, user, member, admin) rather than per user, and
+answers conditional requests from a fingerprint of the (event, update_dt)
+pairs it lists. Each VEVENT is rendered once and cached under the
+event's update_dt; only the events changed since they were cached are
+loaded, with their place, organizers and speakers fetched in bulk.
+"""
+import hashlib
+import re
+import time
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+
+from tendenci.apps.events.models import Event
+from tendenci.apps.events.utils import build_vevent
+from tendenci.apps.site_settings.utils import get_setting
+
+VEVENT_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+FEED_STATE_TIMEOUT = 60 * 60 * 24 * 30
+
+VCALENDAR_HEADER = (u"BEGIN:VCALENDAR\n"
+                    u"PRODID:-//Schipul Technologies//Schipul Codebase 5.0 MIMEDIR//EN\n"
+                    u"VERSION:2.0\n"
+                    u"METHOD:PUBLISH\n")
+VCALENDAR_FOOTER = u"END:VCALENDAR\n"
+
+SITE_URL_RE = re.compile(r'http(s)?://(www.)?([^/]+)')
+
+
+def get_site_context():
+    d = {}
+    d['site_url'] = get_setting('site', 'global', 'siteurl')
+    match = SITE_URL_RE.search(d['site_url'])
+    if match:
+        d['domain_name'] = match.group(3)
+    else:
+        d['domain_name'] = ""
+    return d
+
+
+def feed_permission_class(user):
+    user = getattr(user, 'impersonated_user', user)
+    if not isinstance(user, User) or user.is_anonymous():
+        return 'anonymous'
+    if user.profile.is_superuser:
+        return 'admin'
+    if user.profile.is_member:
+        return 'member'
+    return 'user'
+
+
+def feed_filters(permission_class):
+    """
+    The events every user of a permission class can view. Events
+    visible through group permissions or ownership are left out,
+    those vary by user.
+    """
+    if permission_class == 'admin':
+        return Q(status=True)
+    view_q = Q(allow_anonymous_view=True)
+    if permission_class in ('user', 'member'):
+        view_q |= Q(allow_user_view=True)
+    if permission_class == 'member':
+        view_q |= Q(allow_member_view=True)
+    return Q(status=True) & Q(status_detail='active') & view_q
+
+
+def get_feed_rows(permission_class):
+    """
+    Returns (pk, update_dt) of the upcoming events in the feed.
+    """
+    events = Event.objects.filter(feed_filters(permission_class)).filter(
+        start_dt__gte=datetime.now())
+    return list(events.order_by('start_dt').values_list('pk', 'update_dt'))
+
+
+def vevent_cache_key(pk, update_dt, domain_name):
+    return 'events.ics.vevent.%s.%s.%s' % (pk, update_dt.strftime('%Y%m%d%H%M%S%f'), domain_name)
+
+
+def get_feed_state(permission_class, rows):
+    """
+    Returns the ETag of the feed and when its content last changed
+    (a timestamp). Events leaving the feed don't change any update_dt,
+    so the time is when a new ETag was first seen.
+    """
+    etag = hashlib.md5(force_bytes('%s|%s' % (permission_class, '|'.join(
+        '%s:%s' % (pk, update_dt.isoformat()) for pk, update_dt in rows)))).hexdigest()
+
+    key = 'events.ics.feed.%s' % permission_class
+    state = cache.get(key)
+    if not state or state[0] != etag:
+        state = (etag, int(time.time()))
+        cache.set(key, state, FEED_STATE_TIMEOUT)
+    return state
+
+
+def iter_vevents(rows, d):
+    """
+    Yields the VEVENT of each row, rendering and caching the
+    ones that aren't cached for the row's update_dt.
+    """
+    keys = [vevent_cache_key(pk, update_dt, d['domain_name']) for pk, update_dt in rows]
+    cached = cache.get_many(keys)
+
+    missing = [pk for (pk, update_dt), key in zip(rows, keys) if key not in cached]
+    if missing:
+        events = Event.objects.filter(pk__in=missing).select_related('place').prefetch_related(
+            'organizer_set', 'speaker_set')
+        rendered = {}
+        for event in events:
+            key = vevent_cache_key(event.pk, event.update_dt, d['domain_name'])
+            rendered[key] = build_vevent(event, d, d['site_url'])
+        cache.set_many(rendered, VEVENT_CACHE_TIMEOUT)
+        cached.update(rendered)
+
+    for key in keys:
+        # an event changed since the rows were read
+        if key in cached:
+            yield cached[key]
+
+
+def iter_feed(rows, d):
+    yield VCALENDAR_HEADER
+    for vevent in iter_vevents(rows, d):
+        yield vevent
+    yield VCALENDAR_FOOTER
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Recount the spots taken of events, all of them or the given ids.
+
+    example: python manage.py update_event_spots
+             python manage.py update_event_spots 12 13
+    """
+    def handle(self, *event_ids, **options):
+        from tendenci.apps.events.models import Event
+        from tendenci.apps.events.spots import update_spots
+
+        events = Event.objects.filter(registration_configuration__isnull=False)
+        if event_ids:
+            events = events.filter(pk__in=event_ids)
+
+        for event in events.iterator():
+            update_spots(event)
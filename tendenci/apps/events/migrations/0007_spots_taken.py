@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def count_spots_taken(apps, schema_editor):
+    """
+        Count the registrants (not canceled, and paid when payment
+        is required) of each event into its spots_taken counter
+    """
+    Event = apps.get_model('events', 'Event')
+    Registrant = apps.get_model('events', 'Registrant')
+    RegistrationConfiguration = apps.get_model('events', 'RegistrationConfiguration')
+
+    events = Event.objects.filter(registration_configuration__isnull=False).select_related(
+        'registration_configuration')
+    for event in events:
+        reg_conf = event.registration_configuration
+        registrants = Registrant.objects.filter(registration__event=event, cancel_dt__isnull=True)
+        if reg_conf.payment_required:
+            registrants = registrants.filter(registration__invoice__balance=0)
+
+        RegistrationConfiguration.objects.filter(pk=reg_conf.pk).update(
+            spots_taken=registrants.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_remove_event_group'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registrationconfiguration',
+            name='spots_taken',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_spots_taken, migrations.RunPython.noop),
+    ]
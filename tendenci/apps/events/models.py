@@ -5,7 +5,6 @@ from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models.aggregates import Sum
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth.models import User
 from django.template.defaultfilters import slugify
@@ -165,6 +164,8 @@ class RegistrationConfiguration(models.Model):
         help_text=_('A payment required before registration is accepted.'), default=True)
 
     limit = models.IntegerField(_('Registration Limit'), default=0)
+    # registrants counted against the limit; maintained by events.spots
+    spots_taken = models.IntegerField(default=0, editable=False)
     enabled = models.BooleanField(_('Enable Registration'), default=False)
 
     require_guests_info = models.BooleanField(_('Require Guests Info'), help_text=_("If checked, " + \
@@ -1201,54 +1202,42 @@ class Event(TendenciBaseModel):
     def is_over(self):
         return self.end_dt <= datetime.now()
 
+    @property
+    def financial_summary(self):
+        """
+        The money and registrant totals of this event; attached in bulk
+        to a list of events by financials.attach_financial_summaries.
+        """
+        if not hasattr(self, '_financial_summary'):
+            from tendenci.apps.events.financials import get_financial_summaries
+            self._financial_summary = get_financial_summaries([self.pk], registrants=False)[self.pk]
+        return self._financial_summary
+
     @property
     def money_collected(self):
         """
         Total collected from this event
         """
-        total_sum = Registration.objects.filter(event=self, canceled=False).aggregate(
-            Sum('invoice__total')
-        )['invoice__total__sum']
-
-        # total_sum is the amount of money received when all is said and done
-        if total_sum and self.money_outstanding:
-            return total_sum - self.money_outstanding
-        else:
-            return 0
+        return self.financial_summary.money_collected
 
     @property
     def money_outstanding(self):
         """
         Outstanding balance for this event
         """
-        balance_sum = Registration.objects.filter(event=self, canceled=False).aggregate(
-            Sum('invoice__balance')
-        )['invoice__balance__sum']
-
-        if balance_sum:
-            return balance_sum
-        else:
-            return 0
+        return self.financial_summary.money_outstanding
 
     @property
     def money_total(self):
-        return self.money_collected + self.money_outstanding
+        return self.financial_summary.money_total
 
     @property
     def registration_total(self):
-        if not self.has_addons:
-            return self.money_total
-        else:
-            return self.money_total - self.addons_total
+        return self.financial_summary.registration_total
 
     @property
     def addons_total(self):
-        total_addons = 0
-        if self.has_addons:
-            registrations = Registration.objects.filter(event=self, canceled=False)
-            for reg in registrations:
-                total_addons += reg.regaddon_set.all().aggregate(Sum('amount'))['amount__sum']
-        return total_addons
+        return self.financial_summary.addons_total
 
     def registrants(self, **kwargs):
         """
@@ -1270,6 +1259,9 @@ class Event(TendenciBaseModel):
         return registrants
 
     def registrants_count(self, **kwargs):
+        summary = getattr(self, '_financial_summary', None)
+        if not kwargs and summary and summary.registrants_count is not None:
+            return summary.registrants_count
         return self.registrants(**kwargs).count()
 
     def can_view_registrants(self, user):
@@ -1344,17 +1336,8 @@ class Event(TendenciBaseModel):
         Return a tuple of (spots_taken, spots_available) for this event.
         """
         limit = self.get_limit()
-        payment_required = self.registration_configuration.payment_required
-
-        params = {
-            'registration__event': self,
-            'cancel_dt__isnull': True
-        }
-
-        if payment_required:
-            params['registration__invoice__balance'] = 0
-
-        spots_taken = Registrant.objects.filter(**params).count()
+        # maintained by events.spots
+        spots_taken = self.registration_configuration.spots_taken
 
         if limit == 0:  # no limit
             return (spots_taken, -1)
@@ -0,0 +1,362 @@
+"""
+Registrant roster exports, written as the registrants are read.
+
+Registrants are read with values_list in chunks of EXPORT_CHUNK_SIZE
+(by primary key), and for each chunk the primary registrants of the
+registrations and the custom registration form values of the entries
+are read with one query each, pivoted to a row per registrant. The rows
+are streamed as CSV, written to a temporary file as XLSX (xlsxwriter in
+constant memory mode) or, as before, to an xlwt workbook (XLS).
+
+Rows are (values, balance index) pairs; the balance index, None for
+headings, is the column that is highlighted when a balance is owed.
+"""
+import re
+import tempfile
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from wsgiref.util import FileWrapper
+
+from django.http import StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xls': 'application/vnd.ms-excel',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# the key is the column heading, the value is the database lookup
+REGISTRANT_COLUMNS = OrderedDict([
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('phone', 'phone'),
+    ('email', 'email'),
+    ('position_title', 'position_title'),
+    ('registration_id', 'registration__pk'),
+    ('price type', 'registration__reg_conf_price__title'),
+    ('invoice_id', 'registration__invoice__pk'),
+    ('registration price', 'registration__amount_paid'),
+    ('payment method', 'registration__payment_method__machine_name'),
+    ('balance', 'registration__invoice__balance'),
+    ('company', 'company_name'),
+    ('address', 'address'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('zip', 'zip'),
+    ('country', 'country'),
+    ('date', 'create_dt'),
+])
+
+CUSTOM_REGISTRANT_COLUMNS = OrderedDict([
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('phone', 'phone'),
+    ('email', 'email'),
+    ('position_title', 'position_title'),
+    ('company', 'company_name'),
+    ('address', 'address'),
+    ('city', 'city'),
+    ('state', 'state'),
+    ('zip', 'zip'),
+    ('country', 'country'),
+    ('meal_option', 'meal_option'),
+    ('date', 'create_dt'),
+    ('registration_id', 'registration__pk'),
+    ('addons', 'registration__addons_added'),
+    ('is_primary', 'is_primary'),
+    ('amount', 'amount'),
+    ('price type', 'pricing__title'),
+    ('invoice_id', 'registration__invoice__pk'),
+    ('registration price', 'registration__invoice__total'),
+    ('payment method', 'registration__payment_method__machine_name'),
+    ('balance', 'registration__invoice__balance'),
+])
+
+# columns stored in the field entries of custom registration forms
+CUSTOM_FORM_COLUMNS = ('first_name', 'last_name', 'phone', 'email', 'company',
+                       'address', 'city', 'state', 'zip', 'country')
+
+BALANCE_LOOKUP = 'registration__invoice__balance'
+
+
+def get_roster_registrants(event, roster_view=''):
+    if roster_view == 'non-paid':
+        return event.registrants(with_balance=True)
+    if roster_view == 'paid':
+        return event.registrants(with_balance=False)
+    return event.registrants()
+
+
+def get_file_name(event, roster_view='', export_format='xls'):
+    roster_name = {'non-paid': 'Non-Paid', 'paid': 'Paid'}.get(roster_view, 'Total')
+    file_name = event.title.strip().replace(' ', '-')
+    file_name = re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
+    return 'Event-%s-%s.%s' % (file_name, roster_name, export_format)
+
+
+def iter_chunks(queryset, lookups, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields lists of queryset.values_list('pk', *lookups),
+    chunk_size rows at a time, in primary key order.
+    """
+    queryset = queryset.order_by('pk')
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', *lookups)[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def get_primary_names(registration_ids):
+    """
+    Returns {registration id: "first last"} of the primary registrants
+    (or first registrants) of registrations, as Registration.registrant.
+    """
+    from tendenci.apps.events.models import Registrant
+
+    names = {}
+    primary = set()
+    rows = Registrant.objects.filter(registration__in=set(registration_ids)).order_by('pk').values_list(
+        'registration', 'is_primary', 'first_name', 'last_name')
+    for registration_id, is_primary, first_name, last_name in rows:
+        if registration_id in primary or (registration_id in names and not is_primary):
+            continue
+        names[registration_id] = '%s %s' % (first_name, last_name)
+        if is_primary:
+            primary.add(registration_id)
+    return names
+
+
+def get_field_values(entry_ids, field_ids):
+    """
+    Returns {entry id: {field id: value}} of custom registration form entries.
+    """
+    from tendenci.apps.events.models import CustomRegFieldEntry
+
+    values = {}
+    rows = CustomRegFieldEntry.objects.filter(entry__in=entry_ids, field__in=field_ids).values_list(
+        'entry', 'field', 'value')
+    for entry_id, field_id, value in rows:
+        values.setdefault(entry_id, {})[field_id] = value
+    return values
+
+
+def iter_registrant_rows(registrants):
+    lookups = REGISTRANT_COLUMNS.values()
+    balance_index = lookups.index(BALANCE_LOOKUP)
+
+    yield REGISTRANT_COLUMNS.keys(), None
+    for rows in iter_chunks(registrants, lookups):
+        for row in rows:
+            yield row[1:], balance_index
+
+
+def iter_custom_registrant_rows(event, registrants):
+    """
+    Yields the rows of the registrants with the regular registration
+    form, then a section per custom registration form with the form's
+    fields as columns.
+    """
+    from tendenci.apps.events.models import CustomRegField, CustomRegForm
+
+    columns = OrderedDict(CUSTOM_REGISTRANT_COLUMNS)
+    if not registrants.exclude(meal_option='').exists():
+        # remove meal_option if the field is empty for every registrant
+        del columns['meal_option']
+
+    # registrants with regular reg form
+    lookups = columns.values()
+    balance_index = lookups.index(BALANCE_LOOKUP)
+    is_primary_index = lookups.index('is_primary')
+    registration_index = lookups.index('registration__pk')
+    total_index = lookups.index('registration__invoice__total')
+
+    heading = columns.keys() + ['is_paid', 'primary_registrant']
+    for rows in iter_chunks(registrants.filter(custom_reg_form_entry=None), lookups):
+        if heading:
+            yield heading, None
+            heading = None
+
+        names = get_primary_names(row[registration_index + 1] for row in rows
+                                  if not row[is_primary_index + 1])
+        for row in rows:
+            values = list(row[1:])
+            is_paid = False
+            primary_registrant = u'-- N/A ---'
+
+            if not values[is_primary_index]:
+                is_paid = (values[balance_index] == 0)
+                primary_registrant = names.get(values[registration_index])
+                values[total_index] = 0
+                values[balance_index] = 0
+
+            yield values + [is_paid, primary_registrant], balance_index
+
+    if heading is None:
+        yield [], None
+
+    # ***now the custom registration forms***
+    for field in CUSTOM_FORM_COLUMNS:
+        del columns[field]
+    lookups = columns.values() + ['custom_reg_form_entry']
+    custom_registrants = registrants.exclude(custom_reg_form_entry=None)
+
+    form_ids = custom_registrants.order_by().values_list(
+        'custom_reg_form_entry__form', flat=True).distinct()
+    for custom_reg_form in CustomRegForm.objects.filter(pk__in=list(form_ids)).order_by('pk'):
+        fields = OrderedDict(CustomRegField.objects.filter(
+            form=custom_reg_form).order_by('position').values_list('id', 'label'))
+        field_ids = fields.keys()
+        balance_index = len(field_ids) + lookups.index(BALANCE_LOOKUP)
+
+        yield [custom_reg_form.name], None
+        yield fields.values() + columns.keys(), None
+
+        form_registrants = custom_registrants.filter(custom_reg_form_entry__form=custom_reg_form)
+        for rows in iter_chunks(form_registrants, lookups):
+            values = get_field_values([row[-1] for row in rows], field_ids)
+            for row in rows:
+                entry_values = values.get(row[-1], {})
+                yield [entry_values.get(field_id, '') for field_id in field_ids] + list(row[1:-1]), balance_index
+        yield [], None
+
+
+def owes_balance(values, balance_index):
+    if balance_index is None or balance_index >= len(values):
+        return False
+    balance = values[balance_index]
+    return isinstance(balance, Decimal) and balance > 0
+
+
+class Echo(object):
+    """
+    A file that returns what is written, for csv writers to yield lines.
+    """
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%m/%d/%Y %H:%M')
+    if isinstance(value, date):
+        return value.strftime('%m/%d/%Y')
+    return value
+
+
+def iter_csv(rows):
+    import unicodecsv
+
+    writer = unicodecsv.writer(Echo(), encoding='utf-8')
+    for values, balance_index in rows:
+        yield writer.writerow([csv_value(value) for value in values])
+
+
+def write_xls(rows, fileobj):
+    import xlwt
+
+    book = xlwt.Workbook(encoding='utf8')
+    sheet = book.add_sheet('Registrants')
+
+    balance_owed_style = xlwt.easyxf('font: color-index red, bold on')
+    default_style = xlwt.Style.default_style
+    datetime_style = xlwt.easyxf(num_format_str='mm/dd/yyyy hh:mm')
+    date_style = xlwt.easyxf(num_format_str='mm/dd/yyyy')
+
+    for row, (values, balance_index) in enumerate(rows):
+        for col, value in enumerate(values):
+            # styles the date/time fields
+            if isinstance(value, datetime):
+                style = datetime_style
+            elif isinstance(value, date):
+                style = date_style
+            else:
+                style = default_style
+
+            if col == balance_index and owes_balance(values, balance_index):
+                style = balance_owed_style
+
+            sheet.write(row, col, value, style=style)
+
+    book.save(fileobj)
+
+
+def write_xlsx(rows, fileobj):
+    """
+    Writes the rows to a file object opened for writing in binary mode.
+    Rows are flushed to disk as they are written.
+    """
+    import xlsxwriter
+
+    book = xlsxwriter.Workbook(fileobj, {'constant_memory': True})
+    sheet = book.add_worksheet('Registrants')
+
+    balance_owed_format = book.add_format({'font_color': 'red', 'bold': True})
+    datetime_format = book.add_format({'num_format': 'mm/dd/yyyy hh:mm'})
+    date_format = book.add_format({'num_format': 'mm/dd/yyyy'})
+
+    for row, (values, balance_index) in enumerate(rows):
+        for col, value in enumerate(values):
+            cell_format = None
+            if isinstance(value, datetime):
+                cell_format = datetime_format
+            elif isinstance(value, date):
+                cell_format = date_format
+            elif isinstance(value, Decimal):
+                value = float(value)
+
+            if col == balance_index and owes_balance(values, balance_index):
+                cell_format = balance_owed_format
+
+            if value is None:
+                continue
+            sheet.write(row, col, value, cell_format)
+
+    book.close()
+
+
+def export_to_file(rows, export_format):
+    """
+    Writes the rows in the export format to a temporary file,
+    deleted once closed. Returns the file, at its start.
+    """
+    tmp = tempfile.TemporaryFile()
+    if export_format == 'csv':
+        for line in iter_csv(rows):
+            tmp.write(line)
+    elif export_format == 'xlsx':
+        write_xlsx(rows, tmp)
+    else:
+        write_xls(rows, tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def registrant_export_response(rows, event, roster_view='', export_format=None):
+    """
+    CSV is streamed as the rows are read; XLS and XLSX
+    are written to a temporary file first, then streamed.
+    """
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'xls'
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(iter_csv(rows), content_type=EXPORT_FORMATS['csv'])
+    else:
+        tmp = export_to_file(rows, export_format)
+        tmp.seek(0, 2)
+        size = tmp.tell()
+        tmp.seek(0)
+        response = StreamingHttpResponse(FileWrapper(tmp), content_type=EXPORT_FORMATS[export_format])
+        response['Content-Length'] = size
+
+    response['Content-Disposition'] = 'attachment; filename=%s' % get_file_name(
+        event, roster_view, export_format)
+    return response
@@ -7,7 +7,6 @@ from django.utils.translation import ugettext_lazy as _
 from tendenci.apps.site_settings.utils import get_setting
 from tendenci.apps.discounts.models import Discount, DiscountUse
 
-from tendenci.apps.events.utils import get_event_spots_taken
 from tendenci.apps.events.models import Event, RegConfPricing, Registration, Registrant
 from tendenci.apps.events.registration.constants import REG_CLOSED, REG_FULL, REG_OPEN
 from tendenci.apps.events.forms import FormForCustomRegForm
@@ -27,7 +26,7 @@ def reg_status(event, user):
     limit = event.get_limit()
     spots_taken = 0
     if limit > 0: # 0 is no limit
-        spots_taken = get_event_spots_taken(event)
+        spots_taken = event.registration_configuration.spots_taken
         if spots_taken >= limit:
             return 'FULL'
 
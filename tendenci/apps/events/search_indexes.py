@@ -4,7 +4,6 @@ from haystack import indexes
 from django.utils.html import strip_tags, strip_entities
 
 from tendenci.apps.events.models import Event, Registrant
-from tendenci.apps.events.utils import count_event_spots_taken
 from tendenci.apps.perms.indexes import TendenciBaseSearchIndex
 from tendenci.apps.perms.object_perms import ObjectPermission
 from tendenci.apps.search.indexes import CustomSearchIndex
@@ -57,10 +56,9 @@ class EventIndex(TendenciBaseSearchIndex, indexes.Indexable):
             return None
 
     def prepare_spots_taken(self, obj):
-        if hasattr(obj, 'spots_taken'):
-            return obj.spots_taken
-        else:
-            return count_event_spots_taken(obj)
+        if obj.registration_configuration:
+            return obj.registration_configuration.spots_taken
+        return 0
 
     def prepare_number_of_days(self, obj):
         return obj.number_of_days()
@@ -1,6 +1,18 @@
 def init_signals():
-    from django.db.models.signals import post_save
-    from tendenci.apps.events.models import Event
+    from django.db.models.signals import post_save, post_delete
+    from tendenci.apps.events.models import Event, Type, Registrant, RegistrationConfiguration
+    from tendenci.apps.events.calendars import invalidate_calendars
+    from tendenci.apps.events.spots import (update_invoice_spots, update_reg_conf_spots,
+        update_registrant_spots)
     from tendenci.apps.contributions.signals import save_contribution
+    from tendenci.apps.invoices.models import Invoice
 
-    post_save.connect(save_contribution, sender=Event, weak=False)
\ No newline at end of file
+    post_save.connect(save_contribution, sender=Event, weak=False)
+
+    for sender in (Event, Type):
+        post_save.connect(invalidate_calendars, sender=sender, weak=False)
+        post_delete.connect(invalidate_calendars, sender=sender, weak=False)
+
+    post_save.connect(update_invoice_spots, sender=Invoice, weak=False)
+    post_save.connect(update_reg_conf_spots, sender=RegistrationConfiguration, weak=False)
+    post_delete.connect(update_registrant_spots, sender=Registrant, weak=False)
@@ -0,0 +1,164 @@
+"""
+Spots taken of event registrations.
+
+The registrants counted against an event's limit (not canceled, and
+paid when payment is required) are kept in spots_taken of its
+RegistrationConfiguration, so that pages and registration checks
+showing the spots left read a column instead of counting.
+
+The counter is recounted with one query while the registration
+configuration row is locked (SELECT ... FOR UPDATE): when registrants
+are added or canceled and when a registration invoice changes. Registrations go through reserve_spots, which holds the same
+lock while checking the spots left and adding the registrants, so
+concurrent registrations can't both take the last spots.
+
+When payment is required, registrants only take their spots once paid,
+as before. Until then, for EVENT_REGISTRATION_HOLD_MINUTES after they
+register, they hold their spots: reserve_spots counts them against the
+limit, so two registrations can't both pass the check for the last spot
+and both pay.
+"""
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+
+HOLD_MINUTES = getattr(settings, 'EVENT_REGISTRATION_HOLD_MINUTES', 30)
+
+
+class SpotsUnavailable(Exception):
+    pass
+
+
+def count_spots(reg_conf, event):
+    """
+    Returns the number of registrants of an event
+    counted against its limit.
+    """
+    from tendenci.apps.events.models import Registrant
+
+    registrants = Registrant.objects.filter(registration__event=event, cancel_dt__isnull=True)
+    if reg_conf.payment_required:
+        registrants = registrants.filter(registration__invoice__balance=0)
+    return registrants.count()
+
+
+def count_holds(reg_conf, event):
+    """
+    Returns the number of unpaid registrants of an event that registered
+    in the last HOLD_MINUTES, when payment is required.
+    """
+    from tendenci.apps.events.models import Registrant
+
+    if not reg_conf.payment_required:
+        return 0
+    return Registrant.objects.filter(
+        registration__event=event, cancel_dt__isnull=True,
+        create_dt__gte=datetime.now() - timedelta(minutes=HOLD_MINUTES)
+    ).exclude(registration__invoice__balance=0).count()
+
+
+def lock_reg_conf(event):
+    from tendenci.apps.events.models import RegistrationConfiguration
+
+    return RegistrationConfiguration.objects.select_for_update().get(
+        pk=event.registration_configuration_id)
+
+
+def save_spots(reg_conf, total):
+    from tendenci.apps.events.models import RegistrationConfiguration
+
+    RegistrationConfiguration.objects.filter(pk=reg_conf.pk).update(spots_taken=total)
+    reg_conf.spots_taken = total
+    return total
+
+
+def set_loaded_spots(event, total):
+    # the event's registration configuration, if it was loaded already
+    cache_name = event._meta.get_field('registration_configuration').get_cache_name()
+    reg_conf = getattr(event, cache_name, None)
+    if reg_conf:
+        reg_conf.spots_taken = total
+
+
+def update_spots(event):
+    """
+    Recounts the spots taken of an event. Returns the total.
+    """
+    if not event.registration_configuration_id:
+        return 0
+    with transaction.atomic():
+        reg_conf = lock_reg_conf(event)
+        total = save_spots(reg_conf, count_spots(reg_conf, event))
+    set_loaded_spots(event, total)
+    return total
+
+
+@contextmanager
+def reserve_spots(event, count, override=False):
+    """
+    Adds registrants for count spots of an event within the block:
+
+        with reserve_spots(event, len(forms)):
+            add_registration(...)
+
+    Raises SpotsUnavailable, before the block runs, when fewer spots
+    are left (unless override); the spots held by recent unpaid
+    registrants are not left. The block runs in a transaction holding
+    the registration configuration's row lock; the spots taken are
+    recounted once it completes.
+    """
+    with transaction.atomic():
+        reg_conf = lock_reg_conf(event)
+        taken = count_spots(reg_conf, event) + count_holds(reg_conf, event)
+        limit = int(reg_conf.limit or 0)
+        if limit and not override and taken + count > limit:
+            raise SpotsUnavailable(max(limit - taken, 0))
+
+        yield
+
+        total = save_spots(reg_conf, count_spots(reg_conf, event))
+    set_loaded_spots(event, total)
+
+
+def update_invoice_spots(sender, instance, **kwargs):
+    """
+    post_save of Invoice; a payment changes the spots taken
+    when the event requires payment.
+    """
+    from tendenci.apps.events.models import Registration
+
+    if not instance.object_type_id:
+        return
+    object_type = ContentType.objects.get_for_id(instance.object_type_id)
+    if object_type.app_label != 'events' or object_type.model != 'registration':
+        return
+    registration = Registration.objects.filter(pk=instance.object_id).select_related('event').first()
+    if registration:
+        update_spots(registration.event)
+
+
+def update_registrant_spots(sender, instance, **kwargs):
+    """
+    post_delete of Registrant.
+    """
+    from tendenci.apps.events.models import Event
+
+    event = Event.objects.filter(registration__pk=instance.registration_id).first()
+    if event:
+        update_spots(event)
+
+
+def update_reg_conf_spots(sender, instance, **kwargs):
+    """
+    post_save of RegistrationConfiguration; saving the whole row writes
+    back the spots taken it was loaded with, and payment_required
+    changes which registrants are counted.
+    """
+    from tendenci.apps.events.models import Event
+
+    event = Event.objects.filter(registration_configuration=instance).first()
+    if event:
+        update_spots(event)
@@ -146,6 +146,12 @@ class EventListNode(Node):
         day = self.day.resolve(context)
         type_slug = self.type_slug.resolve(context)
 
+        # the calendar views materialize the events of the whole grid
+        calendar = context.get('event_calendar', None)
+        if calendar and calendar.covers(day):
+            context[self.context_var] = calendar.events_on(day, type_slug, self.ordering)
+            return ''
+
         types = Type.objects.filter(slug=type_slug)
 
         type = None
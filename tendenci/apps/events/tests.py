@@ -1,11 +1,22 @@
 import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 
 from django.test import Client, TestCase
-from django.contrib.auth.models import User
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
 
-from tendenci.apps.events.models import RegConfPricing, Event, Addon
+from tendenci.apps.events.calendars import EventCalendar
+from tendenci.apps.events.financials import FinancialSummary
+from tendenci.apps.events.ics.feeds import feed_permission_class, vevent_cache_key
+from tendenci.apps.events.models import (RegConfPricing, Event, Addon, Registrant,
+    Registration, RegistrationConfiguration)
+from tendenci.apps.events.registrant_exports import get_file_name, iter_csv, owes_balance
+from tendenci.apps.events.signals import init_signals
+from tendenci.apps.events.spots import HOLD_MINUTES, SpotsUnavailable, reserve_spots, update_spots
 from tendenci.apps.events.views import delete_addon
+from tendenci.apps.invoices.models import Invoice
 
 
 handler = logging.StreamHandler()
@@ -103,4 +114,157 @@ class AdddonDeleteTest(TestCase):
             Addon.objects.get(pk=addon_pk)
         with self.assertRaises(Addon.DoesNotExist):
             Addon.objects.get(title='Test Addon')
-        logger.info('Complete.')
\ No newline at end of file
+        logger.info('Complete.')
+
+
+class StaticEventCalendar(EventCalendar):
+    def __init__(self, events, *args, **kwargs):
+        super(StaticEventCalendar, self).__init__(None, *args, **kwargs)
+        self.events = events
+
+    def get_queryset(self):
+        return self.events
+
+
+class EventCalendarTest(TestCase):
+
+    def test_build_days(self):
+        # Friday to Monday, not on weekends
+        long_event = Event(title='long', start_dt=datetime(2016, 7, 1, 9), end_dt=datetime(2016, 7, 4, 17),
+                           on_weekend=False)
+        weekend_event = Event(title='weekend', start_dt=datetime(2016, 7, 2, 20), end_dt=datetime(2016, 7, 3, 1))
+        calendar = StaticEventCalendar([long_event, weekend_event], date(2016, 6, 30), date(2016, 7, 3))
+        days = calendar.build_days()
+
+        self.assertEqual(sorted(days.keys()), [date(2016, 6, 30), date(2016, 7, 1), date(2016, 7, 2), date(2016, 7, 3)])
+        self.assertEqual(days[date(2016, 6, 30)], [])
+        self.assertEqual(days[date(2016, 7, 1)], [long_event])
+        self.assertEqual(days[date(2016, 7, 2)], [weekend_event])
+        self.assertEqual(days[date(2016, 7, 3)], [weekend_event])
+        self.assertFalse(calendar.covers(date(2016, 7, 4)))
+
+
+class ICSFeedTest(TestCase):
+
+    def test_feed_permission_class(self):
+        self.assertEqual(feed_permission_class(AnonymousUser()), 'anonymous')
+
+    def test_vevent_cache_key(self):
+        key = vevent_cache_key(3, datetime(2016, 7, 1, 9, 30), 'example.com')
+        self.assertNotEqual(key, vevent_cache_key(3, datetime(2016, 7, 1, 9, 30, 1), 'example.com'))
+        self.assertNotEqual(key, vevent_cache_key(3, datetime(2016, 7, 1, 9, 30), 'example.org'))
+
+
+class FinancialSummaryTest(TestCase):
+
+    def test_totals(self):
+        summary = FinancialSummary(total=Decimal('300'), outstanding=Decimal('50'),
+                                   addons=Decimal('40'), has_addons=True)
+        self.assertEqual(summary.money_collected, Decimal('250'))
+        self.assertEqual(summary.money_total, Decimal('300'))
+        self.assertEqual(summary.addons_total, Decimal('40'))
+        self.assertEqual(summary.registration_total, Decimal('260'))
+
+    def test_paid_in_full(self):
+        summary = FinancialSummary(total=Decimal('300'), addons=Decimal('40'))
+        self.assertEqual(summary.money_collected, Decimal('300'))
+        # add-ons of disabled addons aren't split out
+        self.assertEqual(summary.addons_total, Decimal('0'))
+        self.assertEqual(summary.registration_total, Decimal('300'))
+
+
+class RegistrantExportTest(TestCase):
+
+    def test_file_name(self):
+        event = Event(title='Annual Conference: 2016')
+        self.assertEqual(get_file_name(event, 'non-paid', 'csv'), 'Event-AnnualConference2016-Non-Paid.csv')
+        self.assertEqual(get_file_name(event, '', 'xlsx'), 'Event-AnnualConference2016-Total.xlsx')
+
+    def test_csv(self):
+        rows = [(['first_name', 'date', 'balance'], None),
+                ([u'J\xfcrgen', datetime(2016, 7, 1, 9, 30), Decimal('10.00')], 2),
+                ([], None)]
+        lines = list(iter_csv(rows))
+        self.assertEqual(lines[1], 'J\xc3\xbcrgen,07/01/2016 09:30,10.00\r\n')
+        self.assertEqual(lines[2], '\r\n')
+
+    def test_owes_balance(self):
+        self.assertTrue(owes_balance(['a', Decimal('10.00')], 1))
+        self.assertFalse(owes_balance(['a', Decimal('0')], 1))
+        self.assertFalse(owes_balance(['balance'], None))
+
+
+class SpotsTest(TestCase):
+
+    def setUp(self):
+        # connected when the events urls are loaded
+        init_signals()
+        self.reg_conf = RegistrationConfiguration.objects.create(limit=2, payment_required=True,
+                                                                 enabled=True)
+        self.event = Event(title='Spots Event', registration_configuration=self.reg_conf)
+        self.event.save()
+
+    def spots_taken(self):
+        return RegistrationConfiguration.objects.get(pk=self.reg_conf.pk).spots_taken
+
+    def register(self, balance):
+        """
+        Adds a registration of one registrant, as add_registration does,
+        with an invoice of the given balance.
+        """
+        with reserve_spots(self.event, 1):
+            invoice = Invoice(due_date=datetime.now(), subtotal=Decimal('10'),
+                              total=Decimal('10'), balance=balance)
+            invoice.save()
+            registration = Registration.objects.create(event=self.event, invoice=invoice,
+                                                       amount_paid=Decimal('10') - balance)
+            registrant = Registrant.objects.create(registration=registration, first_name='Pat',
+                                                   last_name='Lee', email='pat@example.com',
+                                                   is_primary=True)
+            invoice.object_type = ContentType.objects.get_for_model(Registration)
+            invoice.object_id = registration.pk
+            invoice.save()
+        return registrant
+
+    def test_limit(self):
+        self.register(Decimal('10'))
+        self.register(Decimal('10'))
+        # unpaid registrants hold their spots while they pay
+        self.assertEqual(self.spots_taken(), 0)
+        with self.assertRaises(SpotsUnavailable):
+            self.register(Decimal('10'))
+        self.assertEqual(Registrant.objects.filter(registration__event=self.event).count(), 2)
+
+        # admins can go over the limit
+        with reserve_spots(self.event, 1, override=True):
+            pass
+
+        # holds expire
+        Registrant.objects.filter(registration__event=self.event).update(
+            create_dt=datetime.now() - timedelta(minutes=HOLD_MINUTES + 1))
+        self.register(Decimal('0'))
+        self.register(Decimal('0'))
+        self.assertEqual(self.spots_taken(), 2)
+        with self.assertRaises(SpotsUnavailable):
+            self.register(Decimal('0'))
+
+    def test_recount(self):
+        first = self.register(Decimal('0'))
+        second = self.register(Decimal('10'))
+        self.assertEqual(self.spots_taken(), 1)
+
+        # payment
+        invoice = second.registration.invoice
+        invoice.balance = Decimal('0')
+        invoice.save()
+        self.assertEqual(self.spots_taken(), 2)
+
+        # cancel, as the cancel views do
+        second.cancel_dt = datetime.now()
+        second.save()
+        update_spots(self.event)
+        self.assertEqual(self.spots_taken(), 1)
+
+        # delete
+        first.delete()
+        self.assertEqual(self.spots_taken(), 0)
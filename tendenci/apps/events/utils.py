@@ -184,43 +184,23 @@ def get_ACRF_queryset(event=None):
 
     return queryset
 
-def render_registrant_excel(sheet, rows_list, balance_index, styles, start=0):
-    for row, row_data in enumerate(rows_list):
-        for col, val in enumerate(row_data):
-            # styles the date/time fields
-            if isinstance(val, datetime):
-                style = styles['datetime_style']
-            elif isinstance(val, date):
-                style = styles['date_style']
-            else:
-                style = styles['default_style']
-
-            # style the invoice balance column
-            if col == balance_index:
-                balance = val
-                if not val:
-                    balance = 0
-                if isinstance(balance, Decimal) and balance > 0:
-                    style = styles['balance_owed_style']
-
-            sheet.write(row+start, col, val, style=style)
 
-
-def get_ievent(request, d, event_id):
+def build_vevent(event, d, site_url=None):
+    """
+    Returns the VEVENT of an event. Prefetch organizer_set and
+    speaker_set and select place when rendering many events.
+    """
     from django.conf import settings
     from timezones.utils import adjust_datetime_to_timezone
-    from tendenci.apps.events.models import Event
 
-    site_url = get_setting('site', 'global', 'siteurl')
-
-    event = Event.objects.get(id=event_id)
-    e_str = "BEGIN:VEVENT\n"
+    site_url = site_url or get_setting('site', 'global', 'siteurl')
+    lines = ["BEGIN:VEVENT\n"]
 
     # organizer
     organizers = event.organizer_set.all()
     if organizers:
         organizer_name_list = [organizer.name for organizer in organizers]
-        e_str += "ORGANIZER:%s\n" % (', '.join(organizer_name_list))
+        lines.append("ORGANIZER:%s\n" % (', '.join(organizer_name_list)))
 
     # date time
     time_zone = event.timezone
@@ -230,108 +210,62 @@ def get_ievent(request, d, event_id):
     if event.start_dt:
         start_dt = adjust_datetime_to_timezone(event.start_dt, time_zone, 'GMT')
         start_dt = start_dt.strftime('%Y%m%dT%H%M%SZ')
-        e_str += "DTSTART:%s\n" % (start_dt)
+        lines.append("DTSTART:%s\n" % (start_dt))
     if event.end_dt:
         end_dt = adjust_datetime_to_timezone(event.end_dt, time_zone, 'GMT')
         end_dt = end_dt.strftime('%Y%m%dT%H%M%SZ')
-        e_str += "DTEND:%s\n" % (end_dt)
+        lines.append("DTEND:%s\n" % (end_dt))
 
     # location
     if event.place:
-        e_str += "LOCATION:%s\n" % (event.place.name)
+        lines.append("LOCATION:%s\n" % (event.place.name))
 
-    e_str += "TRANSP:OPAQUE\n"
-    e_str += "SEQUENCE:0\n"
+    lines.append("TRANSP:OPAQUE\n")
+    lines.append("SEQUENCE:0\n")
 
     # uid
-    e_str += "UID:uid%d@%s\n" % (event.pk, d['domain_name'])
+    lines.append("UID:uid%d@%s\n" % (event.pk, d['domain_name']))
 
     event_url = "%s%s" % (site_url, reverse('event', args=[event.pk]))
     d['event_url'] = event_url
 
     # text description
-    e_str += "DESCRIPTION:%s\n" % (build_ical_text(event,d))
+    lines.append("DESCRIPTION:%s\n" % (build_ical_text(event,d)))
     #  html description
-    e_str += "X-ALT-DESC;FMTTYPE=text/html:%s\n" % (build_ical_html(event,d))
+    lines.append("X-ALT-DESC;FMTTYPE=text/html:%s\n" % (build_ical_html(event,d)))
 
-    e_str += "SUMMARY:%s\n" % strip_tags(event.title)
-    e_str += "PRIORITY:5\n"
-    e_str += "CLASS:PUBLIC\n"
-    e_str += "BEGIN:VALARM\n"
-    e_str += "TRIGGER:-PT30M\n"
-    e_str += "ACTION:DISPLAY\n"
-    e_str += "DESCRIPTION:Reminder\n"
-    e_str += "END:VALARM\n"
-    e_str += "END:VEVENT\n"
+    lines.append("SUMMARY:%s\n" % strip_tags(event.title))
+    lines.append("PRIORITY:5\n")
+    lines.append("CLASS:PUBLIC\n")
+    lines.append("BEGIN:VALARM\n")
+    lines.append("TRIGGER:-PT30M\n")
+    lines.append("ACTION:DISPLAY\n")
+    lines.append("DESCRIPTION:Reminder\n")
+    lines.append("END:VALARM\n")
+    lines.append("END:VEVENT\n")
 
-    return e_str
+    return u''.join(lines)
+
+
+def get_ievent(request, d, event_id):
+    from tendenci.apps.events.models import Event
+
+    event = Event.objects.get(id=event_id)
+    return build_vevent(event, d)
 
 
 def get_vevents(user, d):
-    from django.conf import settings
-    from timezones.utils import adjust_datetime_to_timezone
     from tendenci.apps.events.models import Event
 
     site_url = get_setting('site', 'global', 'siteurl')
 
-    e_str = ""
     # load only upcoming events by default
     filters = get_query_filters(user, 'events.view_event')
     events = Event.objects.filter(filters).filter(start_dt__gte=datetime.now())
-    events = events.order_by('start_dt')
+    events = events.order_by('start_dt').select_related('place').prefetch_related(
+        'organizer_set', 'speaker_set')
 
-    for event in events:
-        e_str += "BEGIN:VEVENT\n"
-
-        # organizer
-        organizers = event.organizer_set.all()
-        if organizers:
-            organizer_name_list = [organizer.name for organizer in organizers]
-            e_str += "ORGANIZER:%s\n" % (', '.join(organizer_name_list))
-
-        # date time
-        time_zone = event.timezone
-        if not time_zone:
-            time_zone = settings.TIME_ZONE
-
-        if event.start_dt:
-            start_dt = adjust_datetime_to_timezone(event.start_dt, time_zone, 'GMT')
-            start_dt = start_dt.strftime('%Y%m%dT%H%M%SZ')
-            e_str += "DTSTART:%s\n" % (start_dt)
-        if event.end_dt:
-            end_dt = adjust_datetime_to_timezone(event.end_dt, time_zone, 'GMT')
-            end_dt = end_dt.strftime('%Y%m%dT%H%M%SZ')
-            e_str += "DTEND:%s\n" % (end_dt)
-
-        # location
-        if event.place:
-            e_str += "LOCATION:%s\n" % (event.place.name)
-
-        e_str += "TRANSP:OPAQUE\n"
-        e_str += "SEQUENCE:0\n"
-
-        # uid
-        e_str += "UID:uid%d@%s\n" % (event.pk, d['domain_name'])
-
-        event_url = "%s%s" % (site_url, reverse('event', args=[event.pk]))
-        d['event_url'] = event_url
-
-        # text description
-        e_str += "DESCRIPTION:%s\n" % (build_ical_text(event,d))
-        #  html description
-        e_str += "X-ALT-DESC;FMTTYPE=text/html:%s\n" % (build_ical_html(event,d))
-
-        e_str += "SUMMARY:%s\n" % strip_tags(event.title)
-        e_str += "PRIORITY:5\n"
-        e_str += "CLASS:PUBLIC\n"
-        e_str += "BEGIN:VALARM\n"
-        e_str += "TRIGGER:-PT30M\n"
-        e_str += "ACTION:DISPLAY\n"
-        e_str += "DESCRIPTION:Reminder\n"
-        e_str += "END:VALARM\n"
-        e_str += "END:VEVENT\n"
-
-    return e_str
+    return u''.join(build_vevent(event, d, site_url) for event in events)
 
 
 def build_ical_text(event, d):
@@ -1033,8 +967,9 @@ def get_pricing(user, event, pricing=None):
     """
     pricing_list = []
     limit = event.get_limit()
-    spots_taken = get_event_spots_taken(event)
-    spots_left = limit - spots_taken
+    spots_left = 0
+    if limit > 0:  # 0 is no limit
+        spots_left = limit - event.registration_configuration.spots_taken
     if not pricing:
         pricing = RegConfPricing.objects.filter(
             reg_conf=event.registration_configuration,
@@ -1167,31 +1102,6 @@ def get_pricing(user, event, pricing=None):
     return sorted_pricing_list
 
 
-def count_event_spots_taken(event):
-    """
-    Return current event attendance
-    Not counting canceled registrants
-    """
-    return Registration.objects.filter(
-        event=event,
-        registrant__cancel_dt__isnull=True
-    ).count()
-
-
-def get_event_spots_taken(event):
-    """
-    Get registration count for event
-    """
-    # this method once used index to cache
-    # the value and avoid database hits
-    # we can review this method once we're
-    # using memecache
-
-    # return spots taken, append property [store in memory]
-    event.spots_taken = getattr(event, 'spots_taken', count_event_spots_taken(event))
-    return event.spots_taken
-
-
 def registration_earliest_time(event, pricing=None):
     """
     Get the earlist time out of all the pricing.
@@ -7,8 +7,6 @@ import calendar
 import itertools
 import subprocess
 import time
-import xlwt
-from collections import OrderedDict
 
 from datetime import datetime
 from datetime import date, timedelta
@@ -17,6 +15,7 @@ from copy import deepcopy
 
 from django.db.models import Q
 from django.utils.translation import ugettext_lazy as _
+from django.utils.http import http_date, quote_etag
 import simplejson as json
 from django.contrib.auth.decorators import login_required
 from django.contrib.contenttypes.models import ContentType
@@ -26,6 +25,7 @@ from django.shortcuts import get_object_or_404, redirect
 from django.template import RequestContext
 from django.http import HttpResponseRedirect, Http404, HttpResponse
 from django.http import QueryDict
+from django.http import HttpResponseNotModified, StreamingHttpResponse
 from django.core.urlresolvers import reverse
 from django.contrib import messages
 from django.template.loader import render_to_string
@@ -124,19 +124,22 @@ from tendenci.apps.events.utils import (
     registration_earliest_time,
     get_pricing,
     clean_price,
-    get_event_spots_taken,
     get_ievent,
     copy_event,
     email_admins,
     get_active_days,
     get_ACRF_queryset,
     get_custom_registrants_initials,
-    render_registrant_excel,
     event_import_process,
     check_month,
     create_member_registration,
     get_recurrence_dates,
     get_week_days)
+from tendenci.apps.events.calendars import EventCalendar
+from tendenci.apps.events.financials import attach_financial_summaries
+from tendenci.apps.events.spots import SpotsUnavailable, reserve_spots, update_spots
+from tendenci.apps.events.registrant_exports import (get_roster_registrants, iter_custom_registrant_rows,
+    iter_registrant_rows, registrant_export_response)
 from tendenci.apps.events.addons.forms import RegAddonForm
 from tendenci.apps.events.addons.formsets import RegAddonBaseFormSet
 from tendenci.apps.events.addons.utils import get_available_addons
@@ -410,52 +413,27 @@ def search(request, redirect=False, past=False, template_name="events/search.htm
 
 
 def icalendar(request):
-    import os
-    from tendenci.settings import MEDIA_ROOT
-    from tendenci.apps.events.utils import get_vevents
-    p = re.compile(r'http(s)?://(www.)?([^/]+)')
-    d = {}
-    file_name = ''
-    ics_str = ''
+    from tendenci.apps.events.ics.feeds import (feed_permission_class, get_feed_rows,
+        get_feed_state, get_site_context, iter_feed)
+    from tendenci.apps.files.streaming import is_not_modified
 
-    d['site_url'] = get_setting('site', 'global', 'siteurl')
-    match = p.search(d['site_url'])
-    if match:
-        d['domain_name'] = match.group(3)
-    else:
-        d['domain_name'] = ""
+    d = get_site_context()
+    permission_class = feed_permission_class(request.user)
+    rows = get_feed_rows(permission_class)
+    etag, modified = get_feed_state(permission_class, rows)
 
-    if request.user.is_authenticated():
-        file_name = 'ics-%s.ics' % (request.user.pk)
-
-    absolute_directory = os.path.join(MEDIA_ROOT, 'files/ics')
-    if not os.path.exists(absolute_directory):
-        os.makedirs(absolute_directory)
-
-    if file_name:
-        file_path = os.path.join(absolute_directory, file_name)
-        # Check if ics file exists
-        if os.path.isfile(file_path):
-            ics = open(file_path, 'r+')
-            ics_str = ics.read()
-            ics.close()
-    if not ics_str:
-        ics_str = "BEGIN:VCALENDAR\n"
-        ics_str += "PRODID:-//Schipul Technologies//Schipul Codebase 5.0 MIMEDIR//EN\n"
-        ics_str += "VERSION:2.0\n"
-        ics_str += "METHOD:PUBLISH\n"
-
-        # function get_vevents in events.utils
-        ics_str += get_vevents(request.user, d)
-
-        ics_str += "END:VCALENDAR\n"
-    response = HttpResponse(ics_str)
-    response['Content-Type'] = 'text/calendar'
-    if d['domain_name']:
-        file_name = '%s.ics' % (d['domain_name'])
+    if is_not_modified(request, etag, modified):
+        response = HttpResponseNotModified()
     else:
-        file_name = "event.ics"
-    response['Content-Disposition'] = 'attachment; filename=%s' % (file_name)
+        response = StreamingHttpResponse(iter_feed(rows, d), content_type='text/calendar')
+        if d['domain_name']:
+            file_name = '%s.ics' % (d['domain_name'])
+        else:
+            file_name = "event.ics"
+        response['Content-Disposition'] = 'attachment; filename=%s' % (file_name)
+    response['ETag'] = quote_etag(etag)
+    response['Last-Modified'] = http_date(modified)
+    response['Vary'] = 'Cookie'
     return response
 
 
@@ -1460,7 +1438,7 @@ def delete(request, id, template_name="events/delete.html"):
     if has_perm(request.user, 'events.delete_event'):
         if request.method == "POST":
 
-            eventlog = EventLog.objects.log(instance=event)
+            eventlog = EventLog.objects.log(instance=event, sync=True)
             # send email to admins
             recipients = get_notice_recipients('site', 'global', 'allnoticerecipients')
             if recipients and notification:
@@ -1505,7 +1483,7 @@ def delete_recurring(request, id, template_name="events/delete_recurring.html"):
     if request.method == "POST":
         recurring_manager = event.recurring_event
         for event in event_list:
-            eventlog = EventLog.objects.log(instance=event)
+            eventlog = EventLog.objects.log(instance=event, sync=True)
                 # send email to admins
             recipients = get_notice_recipients('site', 'global', 'allnoticerecipients')
             if recipients and notification:
@@ -1888,8 +1866,13 @@ def register(request, event_id=0,
 
                     kwargs = {'admin_notes': '',
                               'custom_reg_form': custom_reg_form}
-                    # add registration
-                    reg8n, reg8n_created = add_registration(*args, **kwargs)
+                    # add registration; holds the event's spots
+                    # until the registrants are added
+                    try:
+                        with reserve_spots(event, int(total_regt_forms)):
+                            reg8n, reg8n_created = add_registration(*args, **kwargs)
+                    except SpotsUnavailable:
+                        return multi_register_redirect(request, event, _('Registration is full.'))
 
                     site_label = get_setting('site', 'global', 'sitedisplayname')
                     site_url = get_setting('site', 'global', 'siteurl')
@@ -2153,7 +2136,7 @@ def multi_register(request, event_id=0, template_name="events/reg8n/multi_regist
     limit = event.get_limit()
     spots_taken = 0
     if limit > 0:
-        spots_taken = get_event_spots_taken(event)
+        spots_taken = event.registration_configuration.spots_taken
         if spots_taken > limit:
             return multi_register_redirect(request, event, _('Registration is full.'))
 
@@ -2271,17 +2254,22 @@ def multi_register(request, event_id=0, template_name="events/reg8n/multi_regist
                         admin_notes = _("Price has been overriden for this registration. ")
                     event_price = reg_form.cleaned_data['amount_for_admin']
 
-                reg8n, reg8n_created = add_registration(
-                    request,
-                    event,
-                    reg_form,
-                    registrant,
-                    addon_formset,
-                    pricing,
-                    event_price,
-                    admin_notes=admin_notes,
-                    custom_reg_form=custom_reg_form,
-                )
+                try:
+                    with reserve_spots(event, len(registrant.forms),
+                                       override=request.user.profile.is_superuser):
+                        reg8n, reg8n_created = add_registration(
+                            request,
+                            event,
+                            reg_form,
+                            registrant,
+                            addon_formset,
+                            pricing,
+                            event_price,
+                            admin_notes=admin_notes,
+                            custom_reg_form=custom_reg_form,
+                        )
+                except SpotsUnavailable:
+                    return multi_register_redirect(request, event, _('Registration is full.'))
 
                 site_label = get_setting('site', 'global', 'sitedisplayname')
                 site_url = get_setting('site', 'global', 'siteurl')
@@ -2589,6 +2577,7 @@ def cancel_registration(request, event_id, registration_id, hash='', template_na
 
             registration.canceled = True
             registration.save()
+            update_spots(event)
 
         return HttpResponseRedirect(
             reverse('event.registration_confirmation',
@@ -2684,7 +2673,7 @@ def cancel_registrant(request, event_id=0, registrant_id=0, hash='', template_na
                 reg8n.canceled = True
                 reg8n.save()
 
-
+            update_spots(event)
 
             EventLog.objects.log(instance=registrant)
 
@@ -2803,10 +2792,15 @@ def month_view(request, year=None, month=None, type=None, template_name='events/
 
     types = Type.objects.all().order_by('name')
 
+    event_calendar = EventCalendar(request.user, cal[0][0], cal[-1][-1],
+                                   query=request.GET.get('q', None),
+                                   cat=request.GET.get('search_category', None))
+
     EventLog.objects.log()
 
     return render_to_response(template_name, {
         'cal':cal,
+        'event_calendar': event_calendar,
         'month':month,
         'prev_month_url':prev_month_url,
         'next_month_url':next_month_url,
@@ -2874,10 +2868,15 @@ def week_view(request, year=None, month=None, day=None, template_name='events/we
                     messages.add_message(request, messages.INFO, _(msg_string))
                     return HttpResponseRedirect(reverse('event.week', args=[latest_date.year, latest_date.month, latest_date.day]))
 
+    event_calendar = EventCalendar(request.user, week_dates[0], week_dates[6],
+                                   query=request.GET.get('q', None),
+                                   cat=request.GET.get('search_category', None))
+
     EventLog.objects.log()
 
     return render_to_response(template_name, {
         'week':week_dates,
+        'event_calendar': event_calendar,
         'weekdays':weekdays,
         'next_week_url':next_week_url,
         'prev_week_url':prev_week_url,
@@ -2944,10 +2943,15 @@ def day_view(request, year=None, month=None, day=None, template_name='events/day
                     messages.add_message(request, messages.INFO, _(msg_string))
                     return HttpResponseRedirect(reverse('event.day', args=[latest_year, latest_month, latest_day]))
 
+    event_calendar = EventCalendar(request.user, day_date, day_date,
+                                   query=request.GET.get('q', None),
+                                   cat=request.GET.get('search_category', None))
+
     EventLog.objects.log()
 
     return render_to_response(template_name, {
         'date': day_date,
+        'event_calendar': event_calendar,
         'now': datetime.now(),
         'type': None,
         'yesterday': yesterday,
@@ -3581,105 +3585,11 @@ def registrant_export(request, event_id, roster_view=''):
     if not has_perm(request.user,'events.change_event',event):
         raise Http403
 
-    import xlwt
-    from collections import OrderedDict
-    from decimal import Decimal
-
-    # create the excel book and sheet
-    book = xlwt.Workbook(encoding='utf8')
-    sheet = book.add_sheet('Registrants')
-
-    if roster_view == 'non-paid':
-        registrants = event.registrants(with_balance=True)
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Non-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    elif roster_view == 'paid':
-        registrants = event.registrants(with_balance=False)
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    else:
-        registrants = event.registrants()
-        file_name = event.title.strip().replace(' ','-')
-        file_name = 'Event-%s-Total.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-
-    # the key is what the column will be in the
-    # excel sheet. the value is the database lookup
-    # Used OrderedDict to maintain the column order
-    registrant_mappings = OrderedDict([
-        ('first_name', 'first_name'),
-        ('last_name', 'last_name'),
-        ('phone', 'phone'),
-        ('email', 'email'),
-        ('position_title', 'position_title'),
-        ('registration_id', 'registration__pk'),
-        ('price type', 'registration__reg_conf_price__title'),
-        ('invoice_id', 'registration__invoice__pk'),
-        ('registration price', 'registration__amount_paid'),
-        ('payment method', 'registration__payment_method__machine_name'),
-        ('balance', 'registration__invoice__balance'),
-        ('company', 'company_name'),
-        ('address', 'address'),
-        ('city', 'city'),
-        ('state', 'state'),
-        ('zip', 'zip'),
-        ('country', 'country'),
-        ('date', 'create_dt'),
-    ])
-    registrant_lookups = registrant_mappings.values()
-
-    # Append the heading to the list of values that will
-    # go into the excel sheet
-    values_list = []
-    values_list.insert(0, registrant_mappings.keys())
-
-    # excel date styles
-    balance_owed_style = xlwt.easyxf('font: color-index red, bold on')
-    default_style = xlwt.Style.default_style
-    datetime_style = xlwt.easyxf(num_format_str='mm/dd/yyyy hh:mm')
-    date_style = xlwt.easyxf(num_format_str='mm/dd/yyyy')
-
-#    if registrations:
-#        # bulk of the work happens here
-#        # loop through all the registrations and append the output
-#        # of values_list django method to the values_list list
-#        for registration in registrations:
-#            registrants = registration.registrant_set.all()
-#            registrants = registrants.exclude(cancel_dt__isnull=False)
-#            registrants = registrants.values_list(*registrant_lookups)
-#            for registrant in registrants:
-#                values_list.append(registrant)
-
-    for registrant in registrants.values_list(*registrant_lookups):
-        values_list.append(registrant)
-
-    # Write the data enumerated to the excel sheet
-    for row, row_data in enumerate(values_list):
-        for col, val in enumerate(row_data):
-            # styles the date/time fields
-            if isinstance(val, datetime):
-                style = datetime_style
-            elif isinstance(val, date):
-                style = date_style
-            else:
-                style = default_style
-
-            # style the invoice balance column
-            if col == 7:
-                balance = val
-                if not val:
-                    balance = 0
-                if val is None:
-                    balance = 0
-                if isinstance(balance,Decimal) and balance > 0:
-                    style = balance_owed_style
-
-            sheet.write(row, col, val, style=style)
+    registrants = get_roster_registrants(event, roster_view)
+    response = registrant_export_response(iter_registrant_rows(registrants), event, roster_view,
+                                          request.GET.get('format'))
 
     EventLog.objects.log(instance=event)
-
-    response = HttpResponse(content_type='application/vnd.ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=%s' % file_name
-    book.save(response)
     return response
 
 
@@ -3695,203 +3605,11 @@ def registrant_export_with_custom(request, event_id, roster_view=''):
              has_perm(request.user, 'events.change_event', event)):
         raise Http403
 
-    # create the excel book and sheet
-    book = xlwt.Workbook(encoding='utf8')
-    sheet = book.add_sheet('Registrants')
-
-    # excel date styles
-    styles = {
-        'balance_owed_style': xlwt.easyxf('font: color-index red, bold on'),
-        'default_style': xlwt.Style.default_style,
-        'datetime_style': xlwt.easyxf(num_format_str='mm/dd/yyyy hh:mm'),
-        'date_style': xlwt.easyxf(num_format_str='mm/dd/yyyy')
-    }
-
-    if roster_view == 'non-paid':
-        registrants = event.registrants(with_balance=True)
-        file_name = event.title.strip().replace(' ', '-')
-        file_name = 'Event-%s-Non-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    elif roster_view == 'paid':
-        registrants = event.registrants(with_balance=False)
-        file_name = event.title.strip().replace(' ', '-')
-        file_name = 'Event-%s-Paid.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-    else:
-        registrants = event.registrants()
-        file_name = event.title.strip().replace(' ', '-')
-        file_name = 'Event-%s-Total.xls' % re.sub(r'[^a-zA-Z0-9._]+', '', file_name)
-
-    from collections import namedtuple
-
-    # the key is what the column will be in the
-    # excel sheet. the value is the database lookup
-    # Used OrderedDict to maintain the column order
-    registrant_mappings = OrderedDict([
-        ('first_name', 'first_name'),
-        ('last_name', 'last_name'),
-        ('phone', 'phone'),
-        ('email', 'email'),
-        ('position_title', 'position_title'),
-        ('company', 'company_name'),
-        ('address', 'address'),
-        ('city', 'city'),
-        ('state', 'state'),
-        ('zip', 'zip'),
-        ('country', 'country'),
-        ('meal_option', 'meal_option'),
-        ('date', 'create_dt'),
-        ('registration_id', 'registration__pk'),
-        ('addons', 'registration__addons_added'),
-        ('is_primary', 'is_primary'),
-        ('amount', 'amount'),
-        ('price type', 'pricing__title'),
-        ('invoice_id', 'registration__invoice__pk'),
-        ('registration price', 'registration__invoice__total'),
-        ('payment method', 'registration__payment_method__machine_name'),
-        ('balance', 'registration__invoice__balance'),
-    ])
-    
-    if not registrants.exclude(meal_option='').exists():
-        # remove meal_option if the field is empty for every registrant
-        del registrant_mappings['meal_option']
-
-    RegistrantTuple = namedtuple('Registrant', registrant_mappings.values())
-
-    registrant_lookups = registrant_mappings.values()
-
-    # Append the heading to the list of values that will
-    # go into the excel sheet
-    values_list = []
-
-    # registrants with regular reg form
-    non_custom_registrants = registrants.filter(custom_reg_form_entry=None)
-    non_custom_registrants = non_custom_registrants.values('pk', *registrant_lookups)
-
-    if non_custom_registrants:
-        values_list.insert(0, registrant_mappings.keys() + ['is_paid', 'primary_registrant'])
-
-        for registrant_dict in non_custom_registrants:
-
-            is_paid = False
-            primary_registrant = u'-- N/A ---'
-
-            # update registrant values
-            if not registrant_dict['is_primary']:
-
-                is_paid = (registrant_dict['registration__invoice__balance'] == 0)
-                primary_registrant = Registrant.objects.get(pk=registrant_dict['pk'])
-
-                registrant = Registrant.objects.get(pk=registrant_dict['pk'])
-                primary_registrant = registrant.registration.registrant
-
-                if primary_registrant:
-                    primary_registrant = '%s %s' % (primary_registrant.first_name, primary_registrant.last_name)
-
-                registrant_dict['registration__invoice__total'] = 0
-                registrant_dict['registration__invoice__balance'] = 0
-
-            del registrant_dict['pk']
-
-            # keeps order of values
-            registrant_tuple = RegistrantTuple(**registrant_dict)
-
-            values_list.append(tuple(registrant_tuple) + (is_paid, primary_registrant))
-
-        values_list.append(['\n'])
-
-    # Write the data enumerated to the excel sheet
-    balance_index = 17
-    start_row = 0
-    render_registrant_excel(sheet, values_list, balance_index, styles, start=start_row)
-    start_row += len(values_list)
-
-    # ***now check for the custom registration forms***
-    custom_reg_exists = Registrant.objects.filter(
-        registration__event=event).exclude(custom_reg_form_entry=None).exists()
-
-    if custom_reg_exists:
-        # get a list of custom registration forms
-        sql = """
-            SELECT form_id
-            FROM events_customregformentry
-            WHERE id IN (
-                SELECT custom_reg_form_entry_id
-                FROM events_registrant
-                WHERE (custom_reg_form_entry_id is not NULL)
-                AND registration_id IN (
-                    SELECT id FROM events_registration
-                    WHERE event_id=%d))
-            ORDER BY id
-        """  % event.id
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        # list of form ids
-        form_ids = list(set([row[0] for row in rows]))
-
-        # remove some fields from registrant_mappings because they are
-        # stored in the field entries
-        fields_to_remove = ['first_name', 'last_name', 'phone',
-                            'email', 'company', 'address', 'city',
-                            'state', 'zip', 'country']
-        for field in fields_to_remove:
-            del registrant_mappings[field]
-
-        registrant_lookups = registrant_mappings.values()
-        registrant_lookups.append('custom_reg_form_entry')
-
-        # loop through all custom registration forms
-        for form_id in form_ids:
-            rows_list = []
-            custom_reg_form = CustomRegForm.objects.get(id=form_id)
-
-            # get a list of fields in the type (id, label) and store in
-            # an ordered dict
-            fields = CustomRegField.objects.filter(
-                form=custom_reg_form).order_by('position').values_list('id', 'label')
-
-            fields_dict = OrderedDict(fields)
-            field_ids = fields_dict.keys()
-            # field header row - all the field labels in the form + registrant_mappings.keys
-            labels = fields_dict.values()
-            labels.extend(registrant_mappings.keys())
-
-            rows_list.append([custom_reg_form.name])
-            rows_list.append(labels)
-
-            # get the registrants for this form
-            custom_registrants = registrants.filter(custom_reg_form_entry__form=custom_reg_form)
-            custom_registrants = custom_registrants.values_list(*registrant_lookups)
-            for registrant in custom_registrants:
-                entry_id = registrant[-1]
-                sql = """
-                        SELECT field_id, value
-                        FROM events_customregfieldentry
-                        WHERE field_id IN (%s)
-                        AND entry_id=%d
-                    """ % (','.join([str(id) for id in field_ids]), entry_id)
-                cursor.execute(sql)
-                entry_rows = cursor.fetchall()
-                values_dict = dict(entry_rows)
-
-                custom_values_list = []
-                for field_id in field_ids:
-                    custom_values_list.append(values_dict.get(field_id, ''))
-                custom_values_list.extend(list(registrant[:-1]))
-
-                rows_list.append(custom_values_list)
-            rows_list.append(['\n'])
-
-            balance_index = len(field_ids) + len(registrant_lookups) - 1
-
-            # write to spread sheet
-            render_registrant_excel(sheet, rows_list, balance_index, styles, start=start_row)
-            start_row += len(rows_list)
+    registrants = get_roster_registrants(event, roster_view)
+    response = registrant_export_response(iter_custom_registrant_rows(event, registrants), event,
+                                          roster_view, request.GET.get('format'))
 
     EventLog.objects.log(instance=event)
-
-    response = HttpResponse(content_type='application/vnd.ms-excel')
-    response['Content-Disposition'] = 'attachment; filename=%s' % file_name
-    book.save(response)
     return response
 
 
@@ -4482,6 +4200,7 @@ def reports_financial(request, template_name="events/financial_reports.html"):
     form = EventReportFilterForm(request.GET or None)
     if form.is_valid():
         events = form.filter(queryset=events)
+    events = attach_financial_summaries(events or [])
 
     context = {'events' : events,
                 'form' : form}
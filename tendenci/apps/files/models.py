@@ -11,7 +11,6 @@ from base64 import b64encode
 from django.db import models, connection
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.core.cache import cache
 from django.contrib.contenttypes.fields import GenericRelation
 from django.core.files.storage import default_storage
 from django.dispatch import receiver
@@ -27,6 +26,8 @@ from tendenci.apps.perms.models import TendenciBaseModel
 from tendenci.apps.perms.object_perms import ObjectPermission
 from tendenci.apps.perms.utils import get_notice_recipients
 from tendenci.apps.files.managers import FileManager
+from tendenci.apps.base.cache_tags import instance_tag, invalidate_tags
+from tendenci.apps.files.renditions import delete_renditions
 from tendenci.apps.base.utils import extract_pdf
 from tendenci.apps.categories.models import CategoryItem
 from tendenci.apps.site_settings.utils import get_setting
@@ -135,19 +136,22 @@ class File(TendenciBaseModel):
             self.guid = unicode(uuid.uuid1())
             created = True
         self.f_type = self.type()
+        old_name = None
+        if not created:
+            old_name = File.objects.filter(pk=self.pk).values_list('file', flat=True).first()
 
         super(File, self).save(*args, **kwargs)
 
+        if old_name and old_name != self.file.name:
+            # the file was replaced; its renditions are stale
+            delete_renditions(old_name)
+
         if self.is_public_file():
             set_s3_file_permission(self.file, public=True)
         else:
             set_s3_file_permission(self.file, public=False)
 
-        cache_set = cache.get("files_cache_set.%s" % self.pk)
-        if cache_set is not None:
-            # TODO remove cached images
-            cache.delete_many(cache.get("files_cache_set.%s" % self.pk))
-            cache.delete("files_cache_set.%s" % self.pk)
+        invalidate_tags(instance_tag(self))
 
         # send notification to administrator(s) and module recipient(s)
         if created:
@@ -209,7 +213,9 @@ class File(TendenciBaseModel):
                 })
 
             # delete actual file; do not save() self.instance
+            delete_renditions(self.file.name)
             self.file.delete(save=False)
+        invalidate_tags(instance_tag(self))
 
         # delete database record
         super(File, self).delete(*args, **kwargs)
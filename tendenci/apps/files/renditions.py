@@ -0,0 +1,254 @@
+"""
+Resized versions ("renditions") of stored images.
+
+Each rendition is built once and kept in default_storage under
+RENDITIONS_DIR. The path is derived from the original (its name and
+modification time, or its size when the storage can't tell the time)
+and from the rendition options (size, crop, constrain, quality and
+format), so a rendition is reused for as long as the original is
+unchanged, and a changed original gets new renditions. All the
+renditions of an original share a directory that is removed with
+delete_renditions().
+
+JPEG originals are decoded in draft mode, at the smallest power of two
+scale that still covers the requested size, so large downscales don't
+decode the full image.
+
+The renditions listed in PHOTO_RENDITION_SIZES are generated when a
+photo is uploaded, by the precache_photo command run in the background.
+"""
+import hashlib
+import hmac
+import logging
+import os
+from cStringIO import StringIO
+
+from PIL import Image
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.encoding import force_bytes
+
+from tendenci.apps.base.utils import image_rescale
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = getattr(settings, 'RENDITIONS_DIR', 'renditions')
+
+# (size, options) generated for every uploaded photo; the sizes used
+# on the batch edit page and the photo set view page
+PHOTO_RENDITION_SIZES = getattr(settings, 'PHOTO_RENDITION_SIZES', (
+    ('422x700', {'constrain': True}),
+    ('102x78', {'crop': True}),
+    ('640x640', {'constrain': True}),
+))
+
+FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+}
+
+EXTENSION_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.gif': 'GIF',
+}
+
+def rendition_dir(name):
+    """
+    Returns the directory of the renditions of the original with the
+    given name. The name is signed so that the renditions of private
+    images can't be found from the name of the original.
+    """
+    digest = hmac.new(force_bytes(settings.SECRET_KEY), force_bytes(name), hashlib.sha1).hexdigest()
+    return '%s/%s/%s' % (RENDITIONS_DIR, digest[:2], digest)
+
+
+def original_version(name, storage=default_storage):
+    """
+    Returns a short digest of the modification time of the original
+    (of its size when the storage can't tell), which changes whenever
+    the original does. Costs one storage call.
+    """
+    try:
+        stamp = storage.modified_time(name)
+    except (NotImplementedError, AttributeError):
+        stamp = storage.size(name)
+    return hashlib.md5(force_bytes('%s-%s' % (name, stamp))).hexdigest()[:12]
+
+
+def rendition_name(name, size, crop=False, quality=90, constrain=False, format=None, version=None):
+    """
+    Returns the storage path of a rendition of the original with
+    the given name.
+    """
+    if version is None:
+        version = original_version(name)
+    if not format:
+        format = EXTENSION_FORMATS.get(os.path.splitext(name)[1].lower(), 'JPEG')
+    options = ['%dx%d' % tuple(size)]
+    if crop:
+        options.append('crop')
+    if constrain:
+        options.append('constrain')
+    options.append('q%d' % int(quality))
+    return '%s/%s-%s.%s' % (rendition_dir(name), '-'.join(options), version,
+                            FORMAT_EXTENSIONS.get(format, 'jpg'))
+
+
+def open_original(name, storage=default_storage):
+    if getattr(settings, 'USE_S3_STORAGE', False):
+        f = storage.open(name, 'rb')
+        try:
+            return Image.open(StringIO(f.read()))
+        finally:
+            f.close()
+    return Image.open(storage.path(name))
+
+
+def draft_size(image_size, size, crop=False):
+    """
+    Returns the size the original has to be decoded at, at least,
+    to produce a rendition of the given size.
+    """
+    orig_w, orig_h = image_size
+    w, h = size
+    if not crop:
+        return w, h
+    # a crop is cut from the original scaled to cover the whole size
+    scale = max(float(w) / orig_w, float(h) / orig_h)
+    return int(orig_w * scale + 1), int(orig_h * scale + 1)
+
+
+def resize_image(image, size, crop=False):
+    """
+    Returns the image resized to size, decoding JPEGs in draft mode
+    and cropping to fill the size when crop is set.
+    """
+    format = image.format
+    if format == 'JPEG' and all(size):
+        # pick the smallest DCT scale that still covers the target size
+        image.draft('RGB', draft_size(image.size, size, crop))
+
+    if format in ('GIF', 'PNG'):
+        if image.mode != "RGBA":
+            image = image.convert("RGBA")
+    elif image.mode != "RGB":
+        # handle infamous error
+        # IOError: cannot write mode P as JPEG
+        image = image.convert("RGB")
+
+    if crop:
+        image = image_rescale(image, size)
+    else:
+        image = image.resize(size, Image.ANTIALIAS)
+    image.format = format  # this is lost in conversion
+    return image
+
+
+def encode_image(image, format=None, quality=90):
+    format = format or image.format or 'JPEG'
+    options = {'quality': int(quality)}
+    if format == 'GIF':
+        options['transparency'] = 0
+    if format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    output = StringIO()
+    image.save(output, format, **options)
+    binary = output.getvalue()
+    output.close()
+    return binary
+
+
+def build_rendition(name, size, crop=False, quality=90, format=None, storage=default_storage):
+    """
+    Returns the binary of a rendition of the original with the given name.
+    """
+    image = open_original(name, storage)
+    format = format or image.format
+    return encode_image(resize_image(image, size, crop), format, quality)
+
+
+def save_rendition(path, binary, storage=default_storage):
+    saved = storage.save(path, ContentFile(binary))
+    if saved != path:
+        # built concurrently by another process; keep the first one
+        storage.delete(saved)
+
+
+def get_rendition(name, size, crop=False, quality=90, constrain=False, format=None,
+                  storage=default_storage, version=None):
+    """
+    Returns the storage path of the rendition, building and storing it
+    first if it doesn't exist yet.
+    """
+    if version is None:
+        version = original_version(name, storage)
+    path = rendition_name(name, size, crop, quality, constrain, format, version=version)
+    if not storage.exists(path):
+        save_rendition(path, build_rendition(name, size, crop, quality, format, storage), storage)
+    return path
+
+
+def read_rendition(name, size, crop=False, quality=90, constrain=False, format=None, storage=default_storage):
+    """
+    Returns the storage path and the binary of the rendition, building
+    and storing it first if it doesn't exist yet. The stored rendition
+    is opened right away instead of checking that it exists first.
+    """
+    path = rendition_name(name, size, crop, quality, constrain, format,
+                          version=original_version(name, storage))
+    try:
+        f = storage.open(path, 'rb')
+    except IOError:
+        binary = build_rendition(name, size, crop, quality, format, storage)
+        save_rendition(path, binary, storage)
+        return path, binary
+    try:
+        return path, f.read()
+    finally:
+        f.close()
+
+
+def delete_renditions(name, storage=default_storage):
+    """
+    Deletes all the renditions of the original with the given name.
+    """
+    path = rendition_dir(name)
+    try:
+        filenames = storage.listdir(path)[1]
+    except OSError:
+        return
+    for filename in filenames:
+        try:
+            storage.delete('%s/%s' % (path, filename))
+        except OSError:
+            pass
+
+
+def generate_renditions(name, sizes=PHOTO_RENDITION_SIZES, format=None):
+    """
+    Builds the renditions listed in sizes, a sequence of
+    ('<width>x<height>', options) pairs, for the original.
+    Sizes are fitted to the original as the photo views do.
+    Returns the sizes whose rendition could not be built.
+    """
+    from tendenci.apps.files.utils import aspect_ratio, validate_image_size
+
+    image_size = open_original(name).size
+    version = original_version(name)
+    failed = []
+    for label, options in sizes:
+        options = dict(options)
+        constrain = options.pop('constrain', False)
+        size = [int(s) for s in label.split('x')]
+        size = validate_image_size(aspect_ratio(image_size, size, constrain))
+        try:
+            get_rendition(name, size, constrain=constrain, format=format, version=version, **options)
+        except (IOError, OSError):
+            logger.exception('Failed to build the %dx%d rendition of %s', size[0], size[1], name)
+            failed.append(label)
+    return failed
@@ -0,0 +1,159 @@
+"""
+Streams stored files to the client in chunks, with support for byte
+ranges and conditional requests (ETag / Last-Modified).
+
+When FILE_SENDFILE_HEADER is set ('X-Sendfile' or 'X-Accel-Redirect')
+and the file is on the local file system, the web server is asked to
+send the file instead. For X-Accel-Redirect the internal location of
+MEDIA_ROOT is set with FILE_ACCEL_REDIRECT_PREFIX (default '/protected/').
+"""
+import calendar
+import hashlib
+import re
+import time
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+FILE_CHUNK_SIZE = getattr(settings, 'FILE_CHUNK_SIZE', 64 * 1024)
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def get_file_stat(field_file):
+    """
+    Returns the size and the modification time (a timestamp)
+    of a stored file. The time is None if the storage can't tell.
+    """
+    storage = field_file.storage
+    size = storage.size(field_file.name)
+    try:
+        modified = storage.modified_time(field_file.name)
+    except (NotImplementedError, AttributeError):
+        return size, None
+    if timezone.is_aware(modified):
+        mtime = calendar.timegm(modified.utctimetuple())
+    else:
+        mtime = int(time.mktime(modified.timetuple()))
+    return size, mtime
+
+
+def make_etag(field_file, size, mtime):
+    return hashlib.md5(force_bytes('%s-%s-%s' % (field_file.name, size, mtime))).hexdigest()
+
+
+def is_not_modified(request, etag, mtime):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [e.strip() for e in if_none_match.split(',')]
+        return quote_etag(etag) in etags or '*' in etags
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return bool(mtime and if_modified_since and mtime <= if_modified_since)
+
+
+def parse_range(header, size):
+    """
+    Returns the (start, end) bytes, end inclusive, of a single range
+    Range header. Returns None when there is no range to apply, which
+    includes invalid ranges (RFC 7233 says to ignore them and send the
+    whole file), and False when the range can't be satisfied.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # suffix range: the last n bytes
+        length = int(end)
+        if not length:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(start)
+    if end and int(end) < start:
+        return None
+    if start >= size:
+        return False
+    end = min(int(end), size - 1) if end else size - 1
+    return start, end
+
+
+def iter_file(field_file, start, length, chunk_size=FILE_CHUNK_SIZE):
+    f = field_file.storage.open(field_file.name, 'rb')
+    try:
+        if start:
+            f.seek(start)
+        while length > 0:
+            data = f.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+def get_sendfile_response(field_file, content_type):
+    header = getattr(settings, 'FILE_SENDFILE_HEADER', None)
+    if not header or getattr(settings, 'USE_S3_STORAGE', False):
+        return None
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        return None
+
+    response = HttpResponse(content_type=content_type)
+    if header.lower() == 'x-accel-redirect':
+        prefix = getattr(settings, 'FILE_ACCEL_REDIRECT_PREFIX', '/protected/')
+        response[header] = '%s%s' % (prefix, field_file.name)
+    else:
+        response[header] = path
+    return response
+
+
+def serve_file(request, field_file, content_type, content_disposition=None):
+    """
+    Returns a response that streams field_file, honoring the Range,
+    If-Range, If-None-Match and If-Modified-Since headers. Raises
+    IOError or OSError when the file can't be found.
+    """
+    size, mtime = get_file_stat(field_file)
+    etag = make_etag(field_file, size, mtime)
+
+    if is_not_modified(request, etag, mtime):
+        response = HttpResponseNotModified()
+    else:
+        response = get_sendfile_response(field_file, content_type)
+
+    if response is None:
+        byte_range = None
+        range_header = request.META.get('HTTP_RANGE')
+        if_range = request.META.get('HTTP_IF_RANGE')
+        if range_header and (not if_range or if_range == quote_etag(etag)):
+            byte_range = parse_range(range_header, size)
+
+        if byte_range is False:
+            response = HttpResponse(status=416, content_type=content_type)
+            response['Content-Range'] = 'bytes */%d' % size
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(iter_file(field_file, start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end, size)
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = StreamingHttpResponse(iter_file(field_file, 0, size),
+                                             content_type=content_type)
+            response['Content-Length'] = str(size)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = quote_etag(etag)
+    if mtime:
+        response['Last-Modified'] = http_date(mtime)
+    if content_disposition and response.status_code != 304:
+        response['Content-Disposition'] = content_disposition
+    return response
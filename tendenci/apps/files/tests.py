@@ -4,9 +4,23 @@ unittest). These will both pass when you run "manage.py test".
 
 Replace these with more appropriate tests for your application.
 """
+import shutil
+import tempfile
+from cStringIO import StringIO
 
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.test import TestCase
 
+from tendenci.apps.base.cache_tags import (instance_tag, invalidate_tags,
+    object_tag, tagged_cache_get, tagged_cache_set)
+from tendenci.apps.files.models import File
+from tendenci.apps.files.renditions import (draft_size, read_rendition, rendition_dir,
+    rendition_name)
+from tendenci.apps.files.streaming import parse_range
+
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +28,22 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+
+class ParseRangeTest(TestCase):
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=500-5000', 1000), (500, 999))
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        self.assertEqual(parse_range('bytes=1000-', 1000), False)
+        self.assertEqual(parse_range('bytes=-0', 1000), False)
+        # invalid ranges are ignored
+        self.assertEqual(parse_range('bytes=50-10', 1000), None)
+        self.assertEqual(parse_range('bytes=0-1,5-9', 1000), None)
+        self.assertEqual(parse_range('items=0-9', 1000), None)
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
@@ -21,3 +51,48 @@ Another way to test that 1 + 1 is equal to 2.
 True
 """}
 
+
+class RenditionTest(TestCase):
+    def test_rendition_name(self):
+        name = rendition_name('photos/a.png', (100, 80), crop=True, version='v1')
+        self.assertTrue(name.startswith(rendition_dir('photos/a.png') + '/'))
+        self.assertTrue(name.endswith('/100x80-crop-q90-v1.png'))
+        self.assertNotEqual(name, rendition_name('photos/a.png', (100, 80), crop=True, version='v2'))
+        self.assertNotEqual(name, rendition_name('photos/a.png', (100, 80), quality=80, version='v1'))
+        self.assertTrue(rendition_name('photos/a.png', (100, 80), format='JPEG', version='v1').endswith('.jpg'))
+
+    def test_draft_size(self):
+        self.assertEqual(draft_size((4000, 3000), (640, 480)), (640, 480))
+        # a crop needs the original scaled to cover both dimensions
+        self.assertEqual(draft_size((4000, 3000), (100, 100), crop=True), (134, 101))
+
+    def test_read_rendition(self):
+        directory = tempfile.mkdtemp()
+        try:
+            storage = FileSystemStorage(location=directory)
+            output = StringIO()
+            Image.new('RGB', (400, 300), 'red').save(output, 'PNG')
+            name = storage.save('photos/a.png', ContentFile(output.getvalue()))
+
+            path, binary = read_rendition(name, (40, 30), storage=storage)
+            self.assertTrue(storage.exists(path))
+            self.assertEqual(Image.open(StringIO(binary)).size, (40, 30))
+            # the stored rendition is read back as is
+            self.assertEqual(read_rendition(name, (40, 30), storage=storage), (path, binary))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class ImageUrlCacheTest(TestCase):
+    def test_invalidate_file(self):
+        file = File(pk=7)
+        self.assertEqual(object_tag(File, '7'), instance_tag(file))
+
+        tags = [object_tag(File, '7')]
+        tagged_cache_set('file_image.7.100x80', '/media/a.jpg', tags)
+        tagged_cache_set('file_image.8.100x80', '/media/b.jpg', [object_tag(File, '8')])
+        self.assertEqual(tagged_cache_get('file_image.7.100x80', tags), '/media/a.jpg')
+
+        invalidate_tags(instance_tag(file))
+        self.assertEqual(tagged_cache_get('file_image.7.100x80', tags), None)
+        self.assertEqual(tagged_cache_get('file_image.8.100x80', [object_tag(File, '8')]), '/media/b.jpg')
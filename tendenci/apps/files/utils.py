@@ -15,43 +15,30 @@ from django.contrib.contenttypes.models import ContentType
 from django.conf import settings
 from django.shortcuts import Http404
 from django.core.cache import cache as django_cache
-from tendenci.apps.base.utils import image_rescale
 from tendenci.libs.boto_s3.utils import read_media_file_from_s3
 
 from tendenci.apps.files.models import File as TFile
 from tendenci.apps.files.models import file_directory
+from tendenci.apps.files.renditions import encode_image, read_rendition, resize_image
 from tendenci.apps.site_settings.utils import get_setting
 
 
-def get_image(file, size, pre_key, crop=False, quality=90, cache=False, unique_key=None, constrain=False):
+def get_image(file, size, pre_key, crop=False, quality=90, cache=False, unique_key=None, constrain=False, format=None):
     """
-    Gets resized-image-object from cache or rebuilds
-    the resized-image-object using the original image-file.
+    Gets the resized-image-object from its stored rendition,
+    building the rendition from the original image-file once.
     *pre_key is either:
         from tendenci.apps.photos.cache import PHOTO_PRE_KEY
         from tendenci.apps.files.cache import FILE_IMAGE_PRE_KEY
     """
 
     size = validate_image_size(size)  # make sure it's not too big
-    binary = None
-
-    if cache:
-        key = generate_image_cache_key(file, size, pre_key, crop, unique_key, quality, constrain)
-        binary = django_cache.get(key)  # check if key exists
-
-    if not binary:
-        kwargs = {
-            'crop': crop,
-            'cache': cache,
-            'quality': quality,
-            'unique_key': unique_key,
-            'constrain': constrain,
-        }
-        binary = build_image(file, size, pre_key, **kwargs)
 
     try:
+        name, binary = read_rendition(file.name, size, crop=crop, quality=quality, constrain=constrain,
+                                      format=format)
         return Image.open(StringIO(binary))
-    except:
+    except (IOError, OSError):
         return ''
 
 
@@ -73,30 +60,7 @@ def build_image(file, size, pre_key, crop=False, quality=90, cache=False, unique
         else:
             raise Http404
 
-    image_options = {'quality': quality}
-    if image.format == 'GIF':
-        image_options['transparency'] = 0
-
-    format = image.format
-    if image.format in ('GIF', 'PNG'):
-        if image.mode != "RGBA":
-            image = image.convert("RGBA")
-        image.format = format  # this is lost in conversion
-
-    elif image.format == 'JPEG':
-        # handle infamous error
-        # IOError: cannot write mode P as JPEG
-        if image.mode != "RGB":
-            image = image.convert("RGB")
-
-    if crop:
-        image = image_rescale(image, size)  # thumbnail image
-    else:
-        format = image.format
-        image = image.resize(size, Image.ANTIALIAS)  # resize image
-        image.format = format
-
-    binary = get_image_binary(image, **image_options)
+    binary = encode_image(resize_image(image, size, crop), quality=quality)
 
     if cache:
         key = generate_image_cache_key(file, size, pre_key, crop, unique_key, quality, constrain)
@@ -14,9 +14,7 @@ from django.core.urlresolvers import reverse
 from django.middleware.csrf import get_token as csrf_get_token
 from django.forms.models import modelformset_factory
 from django.conf import settings
-from django.core.cache import cache
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
+from django.db.models.fields.files import FieldFile
 from django.core.paginator import Paginator
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Q
@@ -38,9 +36,12 @@ from tendenci.apps.categories.forms import CategoryForm
 from tendenci.apps.categories.models import Category
 from tendenci.apps.event_logs.models import EventLog
 from tendenci.apps.theme.shortcuts import themed_response as render_to_response
+from tendenci.apps.base.cache_tags import object_tag, tagged_cache_get, tagged_cache_set
 from tendenci.apps.files.cache import FILE_IMAGE_PRE_KEY
 from tendenci.apps.files.models import File, FilesCategory
-from tendenci.apps.files.utils import get_image, aspect_ratio, generate_image_cache_key, get_max_file_upload_size, get_allowed_upload_file_exts
+from tendenci.apps.files.streaming import serve_file
+from tendenci.apps.files.renditions import get_rendition
+from tendenci.apps.files.utils import aspect_ratio, generate_image_cache_key, validate_image_size, get_max_file_upload_size, get_allowed_upload_file_exts
 from tendenci.apps.files.forms import FileForm, MostViewedForm, FileSearchForm, SwfFileForm, FileSearchMinForm, TinymceUploadForm
 
 
@@ -57,9 +58,10 @@ def details(request, id, size=None, crop=False, quality=90, download=False, cons
         unique_key=id,
         quality=quality,
         constrain=constrain)
+    cache_tags = [object_tag(File, id)]
+
+    cached_image = tagged_cache_get(cache_key, cache_tags)
 
-    cached_image = cache.get(cache_key)
-    
     if cached_image:
         return redirect('%s%s' % (get_setting('site', 'global', 'siteurl'), cached_image))
 
@@ -78,13 +80,6 @@ def details(request, id, size=None, crop=False, quality=90, download=False, cons
     if isinstance(quality, basestring) and quality.isdigit():
         quality = int(quality)
 
-    # get image binary
-    try:
-        data = file.file.read()
-        file.file.close()
-    except IOError:  # no such file or directory
-        raise Http404
-
     if download:  # log download
         attachment = u'attachment;'
         EventLog.objects.log(**{
@@ -121,59 +116,40 @@ def details(request, id, size=None, crop=False, quality=90, download=False, cons
         if not all(size):
             raise Http404
 
-        # gets resized image from cache or rebuilds
-        image = get_image(file.file, size, FILE_IMAGE_PRE_KEY, cache=True, crop=crop, quality=quality, unique_key=None)
-        response = HttpResponse(content_type=file.mime_type())
-        response['Content-Disposition'] = '%s filename=%s' % (attachment, file.get_name())
-
-        params = {'quality': quality}
-        if image.format == 'GIF':
-            params['transparency'] = 0
-
-        image.save(response, image.format, **params)
+        # gets the stored rendition or builds it once
+        try:
+            rendition = get_rendition(file.file.name, validate_image_size(size), crop=crop,
+                                      quality=quality, constrain=constrain)
+            # stream the rendition like the file itself
+            response = serve_file(request, FieldFile(file, file.file.field, rendition), file.mime_type(),
+                                  '%s filename=%s' % (attachment, file.get_name()))
+        except (IOError, OSError):
+            raise Http404
 
         if file.is_public_file():
-            file_name = "%s%s" % (file.get_name(), ".jpg")
-            file_path = 'cached%s%s' % (request.path, file_name)
-            default_storage.delete(file_path)
-            default_storage.save(file_path, ContentFile(response.content))
-            full_file_path = "%s%s" % (settings.MEDIA_URL, file_path)
-            cache.set(cache_key, full_file_path)
-            cache_group_key = "files_cache_set.%s" % file.pk
-            cache_group_list = cache.get(cache_group_key)
-
-            if cache_group_list is None:
-                cache.set(cache_group_key, [cache_key])
-            else:
-                cache_group_list += [cache_key]
-                cache.set(cache_group_key, cache_group_list)
+            full_file_path = "%s%s" % (settings.MEDIA_URL, rendition)
+            tagged_cache_set(cache_key, full_file_path, cache_tags)
 
         return response
 
     if file.is_public_file():
-        cache.set(cache_key, file.get_file_public_url())
+        tagged_cache_set(cache_key, file.get_file_public_url(), cache_tags)
         set_s3_file_permission(file.file, public=True)
-        cache_group_key = "files_cache_set.%s" % file.pk
-        cache_group_list = cache.get(cache_group_key)
-
-        if cache_group_list is None:
-            cache.set(cache_group_key, [cache_key])
-        else:
-            cache_group_list += cache_key
-            cache.set(cache_group_key, cache_group_list)
 
     # set mimetype
-    if file.mime_type():
-        response = HttpResponse(data, content_type=file.mime_type())
-    else:
+    if not file.mime_type():
         raise Http404
 
-    # return response
     if file.get_name().endswith(file.ext()):
-        response['Content-Disposition'] = '%s filename=%s' % (attachment, file.get_name())
+        content_disposition = '%s filename=%s' % (attachment, file.get_name())
     else:
-        response['Content-Disposition'] = '%s filename=%s' % (attachment, file.get_name_ext())
-    return response
+        content_disposition = '%s filename=%s' % (attachment, file.get_name_ext())
+
+    # stream the file, the body is never read into memory
+    try:
+        return serve_file(request, file.file, file.mime_type(), content_disposition)
+    except (IOError, OSError):  # no such file or directory
+        raise Http404
 
 
 @is_enabled('files')
@@ -0,0 +1,285 @@
+"""
+Newsletter delivery engine used by the send_newsletter command.
+
+Recipients are read in chunks, merge fields are rendered from templates
+compiled once per newsletter, and the messages are sent by a pool of
+worker threads that each keep one open mail connection. Every address
+sent is recorded in NewsletterDelivery, so a rerun after a crash skips
+the addresses already sent in the same send round.
+"""
+import re
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.core.urlresolvers import reverse
+
+from tendenci.apps.emails.models import Email
+from tendenci.apps.email_blocks.utils import get_blocklist
+from tendenci.apps.newsletters.models import NewsletterDelivery
+from tendenci.apps.newsletters.utils import get_newsletter_connection
+from tendenci.apps.site_settings.utils import get_setting
+
+
+SUBJECT_MERGE_FIELDS = ('firstname', 'lastname')
+BODY_MERGE_FIELDS = ('username', 'firstname', 'unsubscribe_url',
+                     'browser_view_url')
+
+
+class MergeTemplate(object):
+    """
+    Text with [field] merge tags, split once into literal parts and
+    field names so rendering a recipient is a single join.
+    """
+    def __init__(self, text, fields):
+        pattern = re.compile(r'\[(%s)\]' % '|'.join(fields))
+        self.parts = pattern.split(text or u'')
+        self.fields = set(self.parts[1::2])
+
+    def render(self, values):
+        parts = list(self.parts)
+        for i in xrange(1, len(parts), 2):
+            parts[i] = values.get(parts[i]) or u''
+        return u''.join(parts)
+
+
+class RateLimiter(object):
+    """
+    Spaces calls to wait() at least 1/rate seconds apart
+    across all worker threads. A rate of 0 means no limit.
+    """
+    def __init__(self, rate=0):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_time = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.time()
+            delay = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+class DeliveryStats(object):
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    @property
+    def rate(self):
+        elapsed = self.elapsed
+        return self.sent / elapsed if elapsed else 0
+
+    def __unicode__(self):
+        return u'%d sent, %d failed, %d skipped in %.1fs (%.1f messages/sec)' % (
+            self.sent, self.failed, self.skipped, self.elapsed, self.rate)
+
+
+class NewsletterSender(object):
+    """
+    Sends one send round of a newsletter.
+
+        sender = NewsletterSender(newsletter, workers=4, rate=10)
+        stats = sender.send()
+    """
+    def __init__(self, newsletter, workers=4, chunk_size=100, rate=0,
+                 progress=None):
+        self.newsletter = newsletter
+        self.send_round = newsletter.get_send_round()
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.rate_limiter = RateLimiter(rate)
+        self.progress = progress
+        self.stats = DeliveryStats()
+
+        email = newsletter.email
+        self.sender = email.sender
+        self.sender_display = email.sender_display
+        self.reply_to = email.reply_to
+
+        # replace relative to absolute urls
+        self.site_url = get_setting('site', 'global', 'siteurl')
+        body = email.body.replace("src=\"/", "src=\"%s/" % self.site_url)
+        body = body.replace("href=\"/", "href=\"%s/" % self.site_url)
+        self.subject_template = MergeTemplate(email.subject, SUBJECT_MERGE_FIELDS)
+        self.body_template = MergeTemplate(body, BODY_MERGE_FIELDS)
+        self.browser_view_url = ''
+        if 'browser_view_url' in self.body_template.fields:
+            self.browser_view_url = newsletter.get_browser_view_url()
+
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._group_slugs = {}
+
+    def get_connection(self):
+        """
+        Returns the open mail connection of the current worker thread.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = get_newsletter_connection()
+            connection.open()
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    def drop_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            with self._connections_lock:
+                self._connections.remove(connection)
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def close_connections(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def get_unsubscribe_url(self, recipient):
+        if not recipient.newsletter_key:
+            # generates and saves the key
+            return recipient.noninteractive_unsubscribe_url
+        group_id = recipient.group_id
+        if group_id not in self._group_slugs:
+            self._group_slugs[group_id] = recipient.group.slug
+        return self.site_url + reverse(
+                    'group.newsletter_unsubscribe_noninteractive',
+                    kwargs={'group_slug': self._group_slugs[group_id],
+                            'newsletter_key': recipient.newsletter_key})
+
+    def build_messages(self, recipient):
+        """
+        Returns (address, subject, body) for each address of a recipient.
+        """
+        member = recipient.member
+        values = {
+            'firstname': member.first_name,
+            'lastname': member.last_name,
+            'username': member.username,
+            'browser_view_url': self.browser_view_url,
+        }
+        if 'unsubscribe_url' in self.body_template.fields:
+            values['unsubscribe_url'] = self.get_unsubscribe_url(recipient)
+        subject = self.subject_template.render(values)
+        body = self.body_template.render(values)
+
+        addresses = [member.email]
+        if self.newsletter.send_to_email2:
+            profile = getattr(member, 'profile', None)
+            if profile and profile.email2:
+                addresses.append(profile.email2)
+        return [(address, subject, body) for address in addresses]
+
+    def send_message(self, message):
+        address, subject, body = message
+        self.rate_limiter.wait()
+        try:
+            Email(subject=subject,
+                  body=body,
+                  sender=self.sender,
+                  sender_display=self.sender_display,
+                  reply_to=self.reply_to,
+                  recipient=address
+                  ).send(connection=self.get_connection())
+        except Exception as e:
+            # start over with a fresh connection on the next message
+            self.drop_connection()
+            return address, NewsletterDelivery.STATUS_FAILED, unicode(e)[:255]
+        return address, NewsletterDelivery.STATUS_SENT, ''
+
+    def record(self, results):
+        deliveries = self.newsletter.deliveries.filter(send_round=self.send_round)
+        # failed addresses of an earlier run are retried and re-recorded
+        deliveries.filter(email__in=[r[0] for r in results]).delete()
+        NewsletterDelivery.objects.bulk_create([
+            NewsletterDelivery(newsletter=self.newsletter,
+                               send_round=self.send_round,
+                               email=address,
+                               status=status,
+                               error=error)
+            for address, status, error in results])
+
+        for address, status, error in results:
+            if status == NewsletterDelivery.STATUS_SENT:
+                self.stats.sent += 1
+            else:
+                self.stats.failed += 1
+
+    def get_chunks(self):
+        recipients = self.newsletter.get_recipients().select_related('member')
+        if self.newsletter.send_to_email2:
+            recipients = recipients.select_related('member', 'member__profile')
+        chunk = []
+        for recipient in recipients.iterator():
+            chunk.append(recipient)
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def send(self):
+        """
+        Sends to every recipient not yet sent in this send round.
+        Returns the DeliveryStats.
+        """
+        already_sent = set(self.newsletter.deliveries.filter(
+                                send_round=self.send_round,
+                                status=NewsletterDelivery.STATUS_SENT
+                            ).values_list('email', flat=True))
+        blocklist = get_blocklist()
+
+        pool = ThreadPool(self.workers)
+        try:
+            for chunk in self.get_chunks():
+                messages = []
+                for recipient in chunk:
+                    for message in self.build_messages(recipient):
+                        address = message[0]
+                        if not address or address in already_sent or \
+                                blocklist.is_blocked(address):
+                            self.stats.skipped += 1
+                            continue
+                        already_sent.add(address)
+                        messages.append(message)
+
+                if messages:
+                    self.record(pool.map(self.send_message, messages))
+                if self.progress:
+                    self.progress(self.stats)
+        finally:
+            pool.close()
+            pool.join()
+            self.close_connections()
+            self.stats.end = time.time()
+
+        return self.stats
+
+    def sent_count(self):
+        """
+        Addresses sent in this send round, including earlier runs.
+        """
+        return self.newsletter.deliveries.filter(
+                    send_round=self.send_round,
+                    status=NewsletterDelivery.STATUS_SENT).count()
@@ -1,6 +1,5 @@
 from optparse import make_option
 from django.core.management.base import BaseCommand, CommandError
-from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.template.loader import render_to_string
 
@@ -14,16 +13,41 @@ class Command(BaseCommand):
 
         example:
         python manage.py send_newsletter 1
+        python manage.py send_newsletter 1 --workers=8 --rate=20
+
+    Rerunning the command for a newsletter that is still sending
+    skips the addresses already sent.
 
     """
     def add_arguments(self, parser):
         parser.add_argument('newsletter_id', type=int)
+        parser.add_argument('--workers',
+                            dest='workers',
+                            type=int,
+                            default=4,
+            help='Number of sending threads, each with its own connection')
+        parser.add_argument('--chunk-size',
+                            dest='chunk_size',
+                            type=int,
+                            default=100,
+            help='Number of recipients read and recorded at a time')
+        parser.add_argument('--rate',
+                            dest='rate',
+                            type=float,
+                            default=0,
+            help='Maximum messages per second for the relay (0 for no limit)')
+
+    def print_progress(self, stats):
+        print "Progress: %s" % unicode(stats)
 
     def handle(self, *args, **options):
         import datetime
         from tendenci.apps.emails.models import Email
+        from tendenci.apps.newsletters.delivery import NewsletterSender
         from tendenci.apps.newsletters.models import Newsletter
         from tendenci.apps.site_settings.utils import get_setting
+        from tendenci.apps.user_groups.models import GroupMembership
+        from tendenci.apps.base.cache_tags import instance_tag, model_tag, invalidate_tags
 
         from tendenci.apps.newsletters.utils import get_newsletter_connection
 
@@ -55,59 +79,18 @@ class Command(BaseCommand):
             newsletter.send_status = 'resending'
 
         elif newsletter.send_status == 'resent':
-            newsletter.send_status == 'resending'
+            newsletter.send_status = 'resending'
 
         newsletter.save()
 
-        recipients = newsletter.get_recipients()
-        email = newsletter.email
-        # replace relative to absolute urls
-        self.site_url = get_setting('site', 'global', 'siteurl')
-        email.body = email.body.replace("src=\"/", "src=\"%s/" % self.site_url)
-        email.body = email.body.replace("href=\"/", "href=\"%s/" % self.site_url)
-
-
-        counter = 0
-        for recipient in recipients:
-            subject = email.subject
-            body = email.body
-
-            if '[firstname]' in subject:
-                subject = subject.replace('[firstname]', recipient.member.first_name)
-
-            if '[lastname]' in subject:
-                subject = subject.replace('[lastname]', recipient.member.last_name)
-
-            if '[username]' in body:
-                body = body.replace('[username]', recipient.member.username)
-
-            if '[firstname]' in body:
-                body = body.replace('[firstname]', recipient.member.first_name)
-
-            if '[unsubscribe_url]' in body:
-                body = body.replace('[unsubscribe_url]', recipient.noninteractive_unsubscribe_url)
-
-            if '[browser_view_url]' in body:
-                body = body.replace('[browser_view_url]', newsletter.get_browser_view_url())
-
-            email_to_send = Email(
-                    subject=subject,
-                    body=body,
-                    sender=email.sender,
-                    sender_display=email.sender_display,
-                    reply_to=email.reply_to,
-                    recipient=recipient.member.email
-                    )
-            email_to_send.send(connection=connection)
-            counter += 1
-            print "Newsletter sent to %s" % recipient.member.email
-
-            if newsletter.send_to_email2 and hasattr(recipient.member, 'profile') \
-                and recipient.member.profile.email2:
-                email_to_send.recipient = recipient.member.profile.email2
-                email_to_send.send(connection=connection)
-                counter += 1
-                print "Newsletter sent to %s" % recipient.member.profile.email2
+        sender = NewsletterSender(newsletter,
+                                  workers=options['workers'],
+                                  chunk_size=options['chunk_size'],
+                                  rate=options['rate'],
+                                  progress=self.print_progress)
+        stats = sender.send()
+        print "Sending finished: %s" % unicode(stats)
+        counter = sender.sent_count()
 
         if newsletter.send_status == 'sending':
             newsletter.send_status = 'sent'
@@ -147,7 +130,7 @@ class Command(BaseCommand):
 
         print "Confirmation email sent."
 
-        # add cache clear to resolve issue
-        # TODO: cache clear only to specifies
-        cache.clear()
-        print 'Cache cleared!'
+        # the send updated the newsletter and unsubscribes may
+        # have changed its group memberships
+        invalidate_tags(instance_tag(newsletter), model_tag(GroupMembership))
+        print 'Newsletter cache invalidated.'
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletters', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('send_round', models.IntegerField(default=0)),
+                ('email', models.CharField(max_length=255)),
+                ('status', models.CharField(max_length=10, choices=[('sent', 'Sent'), ('failed', 'Failed')])),
+                ('error', models.CharField(default='', max_length=255, blank=True)),
+                ('create_dt', models.DateTimeField(auto_now_add=True)),
+                ('newsletter', models.ForeignKey(related_name='deliveries', to='newsletters.Newsletter')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='newsletterdelivery',
+            unique_together=set([('newsletter', 'send_round', 'email')]),
+        ),
+    ]
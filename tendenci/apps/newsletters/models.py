@@ -12,6 +12,8 @@ from django.template.defaultfilters import slugify
 from django.core.urlresolvers import reverse
 
 from tendenci.apps.articles.models import Article
+from tendenci.apps.base.cache_tags import (app_tag, instance_tag, model_tag,
+    invalidate_tags, tagged_cache_get, tagged_cache_set)
 from tendenci.apps.emails.models import Email
 from tendenci.apps.files.models import file_directory
 from tendenci.apps.newsletters.utils import extract_files
@@ -34,6 +36,8 @@ from tendenci.apps.user_groups.utils import get_default_group
 from tendenci.libs.tinymce import models as tinymce_models
 
 
+NEWSLETTER_CACHE_TIMEOUT = getattr(settings, 'NEWSLETTER_CACHE_TIMEOUT', 60 * 60)
+
 """
 Choice constants
 """
@@ -403,6 +407,22 @@ class Newsletter(models.Model):
 
         return members
 
+    def get_cache_tags(self):
+        return [app_tag('newsletters'), instance_tag(self), model_tag(GroupMembership)]
+
+    def get_recipient_count(self):
+        """
+        Number of addresses get_recipients() sends to, cached until
+        the newsletter or a group membership changes.
+        """
+        cache_key = 'newsletter.recipient_count.%s' % self.pk
+        tags = self.get_cache_tags()
+        count = tagged_cache_get(cache_key, tags)
+        if count is None:
+            count = self.get_recipients().count()
+            tagged_cache_set(cache_key, count, tags, NEWSLETTER_CACHE_TIMEOUT)
+        return count
+
     def send_to_recipients(self):
         subprocess.Popen(["python", "manage.py",
                               "send_newsletter",
@@ -414,12 +434,50 @@ class Newsletter(models.Model):
         if "log" in kwargs:
             kwargs.pop('log')
         super(Newsletter, self).save(*args, **kwargs)
+        invalidate_tags(instance_tag(self))
 
     def get_browser_view_url(self):
         site_url = get_setting('site', 'global', 'siteurl')
         return "%s%s?key=%s" % (site_url, reverse('newsletter.view_from_browser', args=[self.pk]), self.security_key)
 
+    def get_send_round(self):
+        """
+        Deliveries are recorded per round: 0 for the first send,
+        1 for the first resend, and so on.
+        """
+        if self.send_status in ('resending', 'resent'):
+            return (self.resend_count or 0) + 1
+        return 0
+
 
+class NewsletterDelivery(models.Model):
+    """
+    Delivery state of one recipient address for one send round
+    of a newsletter. Lets an interrupted send_newsletter resume.
+    """
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_SENT, _('Sent')),
+        (STATUS_FAILED, _('Failed')),
+    )
+
+    newsletter = models.ForeignKey(Newsletter, related_name='deliveries')
+    send_round = models.IntegerField(default=0)
+    email = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    error = models.CharField(max_length=255, blank=True, default='')
+    create_dt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('newsletter', 'send_round', 'email')
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.email, self.status)
 
 
+def invalidate_group_memberships(**kwargs):
+    invalidate_tags(model_tag(GroupMembership))
 
+models.signals.post_save.connect(invalidate_group_memberships, sender=GroupMembership, weak=False)
+models.signals.post_delete.connect(invalidate_group_memberships, sender=GroupMembership, weak=False)
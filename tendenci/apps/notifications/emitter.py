@@ -0,0 +1,381 @@
+"""
+Concurrent emitter for queued notices.
+
+Several NoticeEmitter workers, in one or more processes, can run at
+once. Each claims NoticeQueueBatch rows for itself (FOR UPDATE SKIP
+LOCKED on PostgreSQL, a conditional update of the claimed_by column
+elsewhere). It then sends every notice in the batch with bulk user
+fetches, cached NoticeTypes and templates, a single open mail
+connection and one bulk insert of the Notice rows.
+"""
+import datetime
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from os.path import splitext
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core.mail import EmailMessage, get_connection, mail_admins
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.db.models import Q
+from django.template import Context
+from django.template.loader import select_template
+from django.utils.translation import ugettext, get_language, activate
+
+from tendenci.apps.email_blocks.utils import get_blocklist
+from tendenci.apps.notifications.models import (NoticeQueueBatch, NoticeType,
+    Notice, NoticeSetting, get_notification_language,
+    LanguageStoreNotAvailable)
+
+
+# claims older than this are considered abandoned by a dead worker
+CLAIM_TIMEOUT = getattr(settings, "NOTIFICATION_CLAIM_TIMEOUT", 60 * 60)
+
+FORMATS = (
+    'full.html',
+    'short.txt',
+    'notice.html',
+)
+
+
+def _render(template, context):
+    # the engine level template renders a Context directly
+    return getattr(template, 'template', template).render(context)
+
+
+class EmitterStats(object):
+    def __init__(self):
+        self.batches = 0
+        self.notices = 0
+        self.emails = 0
+        self.skipped = 0
+        self.start = time.time()
+        self.end = None
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+    def add(self, other):
+        self.batches += other.batches
+        self.notices += other.notices
+        self.emails += other.emails
+        self.skipped += other.skipped
+
+    def __unicode__(self):
+        elapsed = self.elapsed
+        rate = self.notices / elapsed if elapsed else 0
+        return u'%d batches, %d notices, %d emails, %d skipped in %.2f seconds (%.1f notices/sec)' % (
+            self.batches, self.notices, self.emails, self.skipped, elapsed, rate)
+
+
+class NoticeEmitter(object):
+    def __init__(self, worker_id=None, batch_limit=10):
+        self.worker_id = worker_id or '%s:%s:%s' % (
+            socket.gethostname(), os.getpid(), threading.current_thread().ident)
+        self.batch_limit = batch_limit
+        self.stats = EmitterStats()
+        self.notice_types = {}
+        self.templates = {}
+        self.connection = None
+        self.done = 0
+
+    def claim_batches(self):
+        """
+        Claims up to batch_limit unclaimed (or abandoned) batches.
+        Returns their ids.
+        """
+        now = datetime.datetime.now()
+        stale_dt = now - datetime.timedelta(seconds=CLAIM_TIMEOUT)
+
+        if connection.vendor == 'postgresql':
+            table = NoticeQueueBatch._meta.db_table
+            with transaction.atomic():
+                cursor = connection.cursor()
+                cursor.execute(
+                    'UPDATE %(table)s SET claimed_by = %%s, claimed_dt = %%s '
+                    'WHERE id IN (SELECT id FROM %(table)s '
+                    "WHERE claimed_by = '' OR claimed_dt < %%s "
+                    'ORDER BY id LIMIT %%s FOR UPDATE SKIP LOCKED) '
+                    'RETURNING id' % {'table': table},
+                    [self.worker_id, now, stale_dt, self.batch_limit])
+                return sorted(row[0] for row in cursor.fetchall())
+
+        # a conditional update per row is atomic on every database;
+        # whoever updates the row first owns it
+        claimed = []
+        candidates = NoticeQueueBatch.objects.filter(
+                        Q(claimed_by='') | Q(claimed_dt__lt=stale_dt))
+        for batch in candidates.order_by('pk').values('pk', 'claimed_by')[:self.batch_limit * 2]:
+            updated = NoticeQueueBatch.objects.filter(
+                            pk=batch['pk'], claimed_by=batch['claimed_by']
+                        ).update(claimed_by=self.worker_id, claimed_dt=now)
+            if updated:
+                claimed.append(batch['pk'])
+                if len(claimed) >= self.batch_limit:
+                    break
+        return claimed
+
+    def get_notice_type(self, label):
+        if label not in self.notice_types:
+            try:
+                self.notice_types[label] = NoticeType.objects.get(label=label)
+            except (NoticeType.DoesNotExist, NoticeType.MultipleObjectsReturned):
+                self.notice_types[label] = None
+        return self.notice_types[label]
+
+    def get_template(self, *names):
+        if names not in self.templates:
+            self.templates[names] = select_template(names)
+        return self.templates[names]
+
+    def get_connection(self):
+        if self.connection is None:
+            self.connection = get_connection()
+            self.connection.open()
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+            self.connection = None
+
+    def get_send_settings(self, users, notice_type):
+        """
+        Returns {user_id: send} for the email medium, creating the
+        missing NoticeSetting rows in bulk (opted out by default).
+        """
+        found = dict(NoticeSetting.objects.filter(
+                        user__in=users, notice_type=notice_type, medium="1"
+                    ).values_list('user_id', 'send'))
+        missing = [NoticeSetting(user=user, notice_type=notice_type,
+                                 medium="1", send=False)
+                   for user in users if user.pk not in found]
+        if missing:
+            NoticeSetting.objects.bulk_create(missing)
+            for setting in missing:
+                found[setting.user.pk] = False
+        return found
+
+    def render_messages(self, label, context):
+        messages = {}
+        for format in FORMATS:
+            template_name, template_ext = splitext(format)
+            context.autoescape = template_ext != '.txt'
+            template = self.get_template('notification/%s/%s' % (label, format),
+                                         'notification/%s' % format)
+            message = _render(template, context)
+            if template_name == 'short':
+                message = message.strip()
+            messages[template_name] = (message, template_ext)
+        return messages
+
+    def send_email(self, email):
+        email.send()
+
+    def emit_notice(self, user, notice_type, label, extra_context, on_site,
+                    send, current_site, notices_url):
+        """
+        Sends one notice. Returns its unsaved Notice row.
+        """
+        try:
+            language = get_notification_language(user)
+        except LanguageStoreNotAvailable:
+            language = None
+        if language is not None:
+            activate(language)
+
+        context = Context({
+            "user": user,
+            "notice": ugettext(notice_type.display),
+            "notices_url": notices_url,
+            "current_site": current_site,
+        })
+        context.update(extra_context)
+        messages = self.render_messages(label, context)
+
+        # Strip newlines from subject
+        context.push({'message': messages['short'][0]})
+        subject = ''.join(_render(
+            self.get_template('notification/email_subject.txt'), context).splitlines())
+        context.pop()
+        context.push({'message': messages['full'][0]})
+        body = _render(self.get_template('notification/email_body.txt'), context)
+        context.pop()
+
+        if send:
+            email = EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL,
+                                 [user.email],
+                                 connection=self.get_connection())
+            if messages['full'][1] == '.html':
+                email.content_subtype = 'html'
+            else:
+                email.content_subtype = 'text'
+            self.send_email(email)
+            self.stats.emails += 1
+
+        self.stats.notices += 1
+        return Notice(user=user,
+                      message=messages['notice'][0],
+                      notice_type=notice_type,
+                      on_site=on_site)
+
+    def emit_batch(self, notices):
+        """
+        Sends the notices of one batch, in order. Mirrors models.send_all.
+
+        self.done counts the notices handled so far. When one fails the
+        Notice rows of the ones before it are saved and the exception is
+        raised, so that only notices[self.done:] are retried.
+        """
+        stats = self.stats
+        self.done = 0
+        users = User.objects.in_bulk(set(n[0] for n in notices))
+        blocklist = get_blocklist()
+        current_site = Site.objects.get_current()
+        protocol = getattr(settings, "DEFAULT_HTTP_PROTOCOL", "http")
+        notices_url = u"%s://%s%s" % (protocol, unicode(current_site),
+                                      reverse("notification_notices"))
+        current_language = get_language()
+
+        def recipient(user_id, label):
+            user = users.get(user_id)
+            if not user or not self.get_notice_type(label) or not user.email or \
+                    blocklist.is_blocked(user.email):
+                return None
+            return user
+
+        # the email settings of each notice type's recipients, in bulk
+        by_label = {}
+        for user_id, label, extra_context, on_site in notices:
+            user = recipient(user_id, label)
+            if user:
+                by_label.setdefault(label, {})[user.pk] = user
+        send_settings = dict((label, self.get_send_settings(label_users.values(),
+                                                            self.notice_types[label]))
+                             for label, label_users in by_label.items())
+
+        notice_rows = []
+        try:
+            for user_id, label, extra_context, on_site in notices:
+                user = recipient(user_id, label)
+                if user:
+                    notice_rows.append(self.emit_notice(
+                        user, self.notice_types[label], label, extra_context or {},
+                        on_site, send_settings[label].get(user.pk),
+                        current_site, notices_url))
+                else:
+                    stats.skipped += 1
+                self.done += 1
+        finally:
+            # reset environment to original language
+            activate(current_language)
+            Notice.objects.bulk_create(notice_rows)
+
+    def release_batch(self, batch, remaining=None):
+        """
+        Releases a claimed batch for a retry. With remaining,
+        only those notices are left in it.
+        """
+        values = {'claimed_by': '', 'claimed_dt': None}
+        if remaining is not None:
+            values['pickled_data'] = pickle.dumps(remaining).encode("base64")
+        NoticeQueueBatch.objects.filter(pk=batch.pk, claimed_by=self.worker_id
+                                        ).update(**values)
+
+    def release_batches(self, batch_ids):
+        """
+        Releases the claimed batches that were not sent.
+        """
+        if batch_ids:
+            NoticeQueueBatch.objects.filter(pk__in=batch_ids, claimed_by=self.worker_id
+                                            ).update(claimed_by='', claimed_dt=None)
+
+    def run(self):
+        """
+        Claims and sends batches until none are left, or one fails.
+        Returns the EmitterStats of this worker.
+        """
+        unsent = set()
+        try:
+            while True:
+                batch_ids = self.claim_batches()
+                if not batch_ids:
+                    break
+                unsent.update(batch_ids)
+                for batch in NoticeQueueBatch.objects.filter(pk__in=batch_ids,
+                                                 claimed_by=self.worker_id):
+                    notices = None
+                    try:
+                        notices = pickle.loads(str(batch.pickled_data).decode("base64"))
+                        self.emit_batch(notices)
+                    except:
+                        # release the batch for a retry, without the
+                        # notices already sent, and report it
+                        self.release_batch(batch, notices[self.done:] if notices else None)
+                        unsent.discard(batch.pk)
+                        self.report_exception()
+                        return self.stats
+                    # a worker that took over the expired claim owns it now
+                    NoticeQueueBatch.objects.filter(pk=batch.pk,
+                                                    claimed_by=self.worker_id).delete()
+                    unsent.discard(batch.pk)
+                    self.stats.batches += 1
+                    logging.info("%s: %s" % (self.worker_id, unicode(self.stats)))
+        finally:
+            # the other batches of the claim are left to the next run
+            self.release_batches(unsent)
+            self.close()
+            self.stats.end = time.time()
+        return self.stats
+
+    def report_exception(self):
+        exc_class, e, t = sys.exc_info()
+        # email people
+        current_site = Site.objects.get_current()
+        subject = "[%s emit_notices] %r" % (current_site.name, e)
+        message = "%s" % ("\n".join(traceback.format_exception(*sys.exc_info())),)
+        mail_admins(subject, message, fail_silently=True)
+        # log it as critical
+        logging.critical("an exception occurred: %r" % e)
+
+
+def emit_all(workers=1):
+    """
+    Runs the given number of emitter threads until the queue is empty.
+    Returns the combined EmitterStats.
+    """
+    total = EmitterStats()
+    results = []
+
+    def work():
+        try:
+            results.append(NoticeEmitter().run())
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=work) for i in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for stats in results:
+        total.add(stats)
+    total.end = time.time()
+    return total
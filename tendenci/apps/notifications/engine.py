@@ -18,6 +18,7 @@ from lockfile import FileLock, AlreadyLocked, LockTimeout
 
 from tendenci.apps.notifications.models import NoticeQueueBatch
 from tendenci.apps.notifications import models as notification
+from tendenci.apps.notifications.emitter import emit_all
 
 # lock timeout value. how long to wait for the lock to become available.
 # default behavior is to never wait for the lock to be available.
@@ -43,7 +44,7 @@ def send_all():
     try:
         # nesting the try statement to be Python 2.4
         try:
-            for queued_batch in NoticeQueueBatch.objects.all():
+            for queued_batch in NoticeQueueBatch.objects.filter(claimed_by=''):
                 notices = pickle.loads(str(queued_batch.pickled_data).decode("base64"))
                 for user, label, extra_context, on_site in notices:
                     user = User.objects.get(pk=user)
@@ -72,3 +73,15 @@ def send_all():
     logging.info("")
     logging.info("%s batches, %s sent" % (batches, sent,))
     logging.info("done in %.2f seconds" % (time.time() - start_time))
+
+
+def send_all_concurrent(workers=1):
+    """
+    Emits the queued notices with NoticeEmitter workers. Unlike
+    send_all, no file lock is taken: any number of processes may run
+    this at once, each batch is claimed by a single worker.
+    """
+    stats = emit_all(workers=workers)
+    logging.info("")
+    logging.info(unicode(stats))
+    return stats
@@ -3,12 +3,27 @@ import logging
 
 from django.core.management.base import NoArgsCommand
 
-from tendenci.apps.notifications.engine import send_all
+from tendenci.apps.notifications.engine import send_all, send_all_concurrent
 
 class Command(NoArgsCommand):
     help = "Emit queued notices."
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers',
+                            dest='workers',
+                            type=int,
+                            default=1,
+            help='Number of emitter threads claiming batches')
+        parser.add_argument('--legacy',
+                            action='store_true',
+                            dest='legacy',
+                            default=False,
+            help='Use the single, file locked sender')
+
     def handle_noargs(self, **options):
         logging.basicConfig(level=logging.DEBUG, format="%(message)s")
         logging.info("-" * 72)
-        send_all()
+        if options['legacy']:
+            send_all()
+        else:
+            send_all_concurrent(workers=options['workers'])
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticequeuebatch',
+            name='claimed_by',
+            field=models.CharField(default='', max_length=100, db_index=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='noticequeuebatch',
+            name='claimed_dt',
+            field=models.DateTimeField(null=True, blank=True),
+        ),
+    ]
@@ -29,6 +29,7 @@ from django.utils.html import escape
 
 from tendenci.apps.site_settings.utils import get_setting
 from tendenci.apps.emails.models import Email
+from tendenci.apps.email_blocks.utils import get_blocklist
 
 QUEUE_ALL = getattr(settings, "NOTIFICATION_QUEUE_ALL", False)
 
@@ -181,6 +182,10 @@ class NoticeQueueBatch(models.Model):
     Denormalized data for a notice.
     """
     pickled_data = models.TextField()
+    # set by the emitter worker that is sending the batch
+    claimed_by = models.CharField(max_length=100, blank=True, default='',
+                                  db_index=True)
+    claimed_dt = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         app_label = 'notifications'
@@ -496,8 +501,9 @@ def send_now(users, label, extra_context=None, on_site=True, *args, **kwargs):
             'notice.html',
         )  # TODO make formats configurable
 
+        blocklist = get_blocklist()
         for user in users:
-            if not user.email or Email.is_blocked(user.email):
+            if not user.email or blocklist.is_blocked(user.email):
                 continue
 
             recipients = []
@@ -0,0 +1,109 @@
+import datetime
+
+from django.contrib.auth.models import User
+from django.contrib.sites.models import Site
+from django.core import mail
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from tendenci.apps.notifications.emitter import NoticeEmitter, pickle
+from tendenci.apps.notifications.models import (Notice, NoticeQueueBatch,
+    NoticeSetting, NoticeType, queue)
+
+
+class FailingEmitter(NoticeEmitter):
+    """
+    Fails to send the emails after the first fail_after ones.
+    """
+    def __init__(self, fail_after, **kwargs):
+        super(FailingEmitter, self).__init__(**kwargs)
+        self.fail_after = fail_after
+
+    def send_email(self, email):
+        if self.stats.emails >= self.fail_after:
+            raise Exception('SMTP error')
+        super(FailingEmitter, self).send_email(email)
+
+
+class NoticeEmitterTest(TestCase):
+
+    def setUp(self):
+        self.notice_type = NoticeType.objects.create(label='emitter_test',
+                                                     display='Emitter test',
+                                                     description='Emitter test',
+                                                     default=2)
+        self.users = []
+        for i in range(3):
+            user = User.objects.create(username='emitter%d' % i,
+                                       email='emitter%d@example.com' % i)
+            NoticeSetting.objects.create(user=user, notice_type=self.notice_type,
+                                         medium='1', send=True)
+            self.users.append(user)
+
+    def user_emails(self):
+        addresses = [user.email for user in self.users]
+        return [m for m in mail.outbox if m.to and m.to[0] in addresses]
+
+    def test_claim_batches(self):
+        for i in range(3):
+            queue(self.users[:1], 'emitter_test')
+
+        first = NoticeEmitter(worker_id='first', batch_limit=2).claim_batches()
+        second = NoticeEmitter(worker_id='second', batch_limit=2).claim_batches()
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first) & set(second))
+        self.assertEqual(NoticeEmitter(worker_id='third').claim_batches(), [])
+
+        # the claims of a dead worker expire
+        NoticeQueueBatch.objects.filter(pk__in=first).update(
+            claimed_dt=datetime.datetime.now() - datetime.timedelta(days=1))
+        self.assertEqual(sorted(NoticeEmitter(worker_id='third').claim_batches()),
+                         sorted(first))
+
+    def test_emit(self):
+        queue(self.users, 'emitter_test')
+        stats = NoticeEmitter().run()
+
+        self.assertEqual(stats.batches, 1)
+        self.assertEqual(stats.emails, 3)
+        self.assertFalse(NoticeQueueBatch.objects.exists())
+        self.assertEqual(Notice.objects.filter(notice_type=self.notice_type).count(), 3)
+
+        emails = self.user_emails()
+        self.assertEqual(len(emails), 3)
+        site = unicode(Site.objects.get_current())
+        self.assertTrue(emails[0].subject.startswith(u'[%s]' % site))
+        self.assertIn(reverse('notification_notices'), emails[0].body)
+
+    def test_partial_failure(self):
+        """
+            A batch that fails part-way is retried without
+            the notices already sent
+        """
+        queue(self.users, 'emitter_test')
+        FailingEmitter(fail_after=1).run()
+
+        self.assertEqual(len(self.user_emails()), 1)
+        self.assertEqual(Notice.objects.filter(notice_type=self.notice_type).count(), 1)
+        batch = NoticeQueueBatch.objects.get()
+        self.assertEqual(batch.claimed_by, '')
+        remaining = pickle.loads(str(batch.pickled_data).decode("base64"))
+        self.assertEqual([n[0] for n in remaining], [user.pk for user in self.users[1:]])
+
+        NoticeEmitter().run()
+        self.assertEqual(sorted(m.to[0] for m in self.user_emails()),
+                         sorted(user.email for user in self.users))
+        self.assertEqual(Notice.objects.filter(notice_type=self.notice_type).count(), 3)
+        self.assertFalse(NoticeQueueBatch.objects.exists())
+
+    def test_failure_releases_claim(self):
+        """
+            The batches claimed along with a failed one are released
+        """
+        for i in range(3):
+            queue(self.users[:1], 'emitter_test')
+        FailingEmitter(fail_after=0, batch_limit=3).run()
+
+        self.assertEqual(NoticeQueueBatch.objects.count(), 3)
+        self.assertFalse(NoticeQueueBatch.objects.exclude(claimed_by='').exists())
@@ -1,11 +1,75 @@
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import User, Permission
+from django.db.models import Q
 from django.db.models.base import Model
 
 from tendenci.apps.perms.object_perms import ObjectPermission
 from tendenci.apps.perms.utils import can_view
 
 
+def get_object_perm_key(obj):
+    return (ContentType.objects.get_for_model(obj).pk, obj.pk)
+
+
+def get_object_perm_map(user_obj, attr):
+    """
+    Returns the map of (content_type_id, object_id) to object permission
+    strings held on the user object, which lives as long as the request.
+    """
+    if not hasattr(user_obj, attr):
+        setattr(user_obj, attr, {})
+    return getattr(user_obj, attr)
+
+
+def load_object_perms(user_obj, objects):
+    """
+    Loads the user and group ObjectPermission rows of objects
+    into the permission maps of user_obj, with one query per model.
+    """
+    all_perm_map = get_object_perm_map(user_obj, '_object_perm_map')
+    group_perm_map = get_object_perm_map(user_obj, '_group_object_perm_map')
+
+    object_ids = {}
+    for obj in objects:
+        key = get_object_perm_key(obj)
+        object_ids.setdefault(key[0], set()).add(key[1])
+        all_perm_map[key] = set()
+        group_perm_map[key] = set()
+
+    for content_type_id, ids in object_ids.items():
+        perms = ObjectPermission.objects.filter(
+            Q(user=user_obj) | Q(group__members=user_obj),
+            content_type_id=content_type_id,
+            object_id__in=ids
+        ).values_list('object_id', 'content_type__app_label', 'codename',
+                      'user_id').distinct()
+        for object_id, app_label, codename, user_id in perms:
+            key = (content_type_id, object_id)
+            perm = u"%s.%s.%s" % (object_id, app_label, codename)
+            all_perm_map[key].add(perm)
+            if user_id != user_obj.pk:
+                group_perm_map[key].add(perm)
+
+
+def prefetch_object_perms(user_obj, objects):
+    """
+    Loads the object permissions of user_obj for a page of objects
+    (model instances or search results) in bulk, so that the has_perm
+    checks of each row do not query ObjectPermission.
+    """
+    if not user_obj or user_obj.is_anonymous():
+        return
+    objects = [obj if isinstance(obj, Model) else getattr(obj, 'object', None)
+               for obj in objects]
+    objects = [obj for obj in objects if isinstance(obj, Model) and obj.pk]
+    if objects:
+        load_object_perms(user_obj, objects)
+
+    impersonated_user = getattr(user_obj, 'impersonated_user', None)
+    if isinstance(impersonated_user, User) and impersonated_user != user_obj:
+        prefetch_object_perms(impersonated_user, objects)
+
+
 class ObjectPermBackend(object):
     """
     Custom backend that supports tendenci's version of group permissions and
@@ -67,39 +131,26 @@ class ObjectPermBackend(object):
         return user_obj._perm_cache
 
     def get_group_object_permissions(self, user_obj, obj):
-        app_label = obj._meta.app_label
-        user_obj_attr = '_%s_%d_group_object_perm_cache' % (
-            app_label,
-            obj.pk
-        )
-        if not hasattr(user_obj, user_obj_attr):
-            content_type = ContentType.objects.get_for_model(obj)
-            filters = {
-               'group__members': user_obj,
-               'content_type': content_type,
-               'object_id': obj.pk
-            }
-            group_object_perms = ObjectPermission.objects.filter(**filters)
-            user_obj._group_object_perm_cache = set([u"%s.%s.%s" % (p.object_id, p.content_type.app_label, p.codename) for p in group_object_perms])
-        return user_obj._group_object_perm_cache
+        """
+        Returns a set of object permission strings that this user has
+        on obj through his/her groups.
+        """
+        key = get_object_perm_key(obj)
+        perm_map = get_object_perm_map(user_obj, '_group_object_perm_map')
+        if key not in perm_map:
+            load_object_perms(user_obj, [obj])
+        return perm_map.get(key, set())
 
     def get_all_object_permissions(self, user_obj, obj):
-        app_label = obj._meta.app_label
-        user_obj_attr = '_%s_%d_object_perm_cache' % (
-            app_label,
-            obj.pk
-        )
-        if not hasattr(user_obj, user_obj_attr):
-            content_type = ContentType.objects.get_for_model(obj)
-            filters = {
-                'content_type': content_type,
-                'object_id': obj.pk,
-                'user': user_obj
-            }
-            perms = ObjectPermission.objects.filter(**filters)
-            user_obj._object_perm_cache = set([u"%s.%s.%s" % (p.object_id, p.content_type.app_label, p.codename) for p in perms])
-            user_obj._object_perm_cache.update(self.get_group_object_permissions(user_obj, obj))
-        return user_obj._object_perm_cache
+        """
+        Returns a set of object permission strings that this user has
+        on obj, directly or through his/her groups.
+        """
+        key = get_object_perm_key(obj)
+        perm_map = get_object_perm_map(user_obj, '_object_perm_map')
+        if key not in perm_map:
+            load_object_perms(user_obj, [obj])
+        return perm_map.get(key, set())
 
     def has_perm(self, user, perm, obj=None):
         # check codename, return false if its a malformed codename
@@ -159,6 +210,12 @@ class ObjectPermBackend(object):
         if not isinstance(obj, Model):
             return False
 
+        # object permissions prefetched with prefetch_object_perms
+        # are checked before the search index is queried
+        perm_map = getattr(user, '_object_perm_map', {})
+        if '%s.%s' % (obj.pk, perm) in perm_map.get(get_object_perm_key(obj), ()):
+            return True
+
         # lets check the search index for view permissions
         # before we ever hit the database, faster
         if 'view' in perm:
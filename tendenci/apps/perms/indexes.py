@@ -1,7 +1,11 @@
+from itertools import islice
+
 from haystack import indexes
 
 from django.db.models import signals
+from django.db.models.query import QuerySet
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
 
 from tendenci.apps.perms.object_perms import ObjectPermission
 #from tendenci.apps.search.indexes import CustomSearchIndex
@@ -10,6 +14,36 @@ def is_whoosh():
     default_engine = settings.HAYSTACK_CONNECTIONS.get('default', {}).get('ENGINE', '')
     return default_engine and 'whoosh' in default_engine.lower()
 
+
+# number of objects whose view permissions are loaded with one query
+# while the index is being updated
+PERMS_CHUNK_SIZE = 1000
+
+
+class PermissionIndexQuerySet(QuerySet):
+    """
+    Queryset used to update a search index. It hands each chunk of
+    objects to the search index before they are prepared, so that
+    their view permissions are loaded in bulk.
+    """
+    search_index = None
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        kwargs.setdefault('search_index', self.search_index)
+        return super(PermissionIndexQuerySet, self)._clone(klass, setup, **kwargs)
+
+    def iterator(self):
+        objects = super(PermissionIndexQuerySet, self).iterator()
+        while True:
+            chunk = list(islice(objects, PERMS_CHUNK_SIZE))
+            if not chunk:
+                break
+            if self.search_index is not None:
+                self.search_index.prefetch_view_perms(chunk)
+            for obj in chunk:
+                yield obj
+
+
 class TendenciBaseSearchIndex(indexes.SearchIndex):
     text = indexes.CharField(document=True, use_template=True)
 
@@ -40,11 +74,43 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
     # the prepare_order method to sort by a different field
     order = indexes.DateTimeField()
 
+    def __init__(self, *args, **kwargs):
+        super(TendenciBaseSearchIndex, self).__init__(*args, **kwargs)
+        self.use_whoosh = is_whoosh()
+        # pk -> (object, group ids) of the chunk being indexed
+        self._groups_can_view = {}
+
     def get_model(self):
         return None
 
+    def build_queryset(self, *args, **kwargs):
+        queryset = super(TendenciBaseSearchIndex, self).build_queryset(*args, **kwargs)
+        return queryset._clone(klass=PermissionIndexQuerySet, search_index=self)
+
+    def prefetch_view_perms(self, objects):
+        """
+        Loads the groups with view permission on objects with one
+        query, for prepare_groups_can_view to use.
+        """
+        self._groups_can_view = {}
+        if not objects:
+            return
+        model = objects[0].__class__
+        content_type = ContentType.objects.get_for_model(model)
+        for obj in objects:
+            self._groups_can_view[obj.pk] = (obj, [])
+
+        perms = ObjectPermission.objects.filter(
+            content_type=content_type,
+            object_id__in=self._groups_can_view.keys(),
+            codename='view_%s' % model._meta.model_name,
+            group__isnull=False,
+        ).values_list('object_id', 'group_id')
+        for object_id, group_id in perms:
+            self._groups_can_view[object_id][1].append(group_id)
+
     def prepare_allow_anonymous_view(self, obj):
-        if is_whoosh():
+        if self.use_whoosh:
             try:
                 temp = int(obj.allow_anonymous_view)
             except TypeError:
@@ -53,7 +119,7 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
         return obj.allow_anonymous_view
 
     def prepare_allow_user_view(self, obj):
-        if is_whoosh():
+        if self.use_whoosh:
             try:
                 temp = int(obj.allow_user_view)
             except TypeError:
@@ -62,7 +128,7 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
         return obj.allow_user_view
 
     def prepare_allow_member_view(self, obj):
-        if is_whoosh():
+        if self.use_whoosh:
             try:
                 temp = int(obj.allow_member_view)
             except TypeError:
@@ -71,7 +137,7 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
         return obj.allow_member_view
 
     def prepare_allow_user_edit(self, obj):
-        if is_whoosh():
+        if self.use_whoosh:
             try:
                 temp = int(obj.allow_user_edit)
             except TypeError:
@@ -80,7 +146,7 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
         return obj.allow_user_edit
 
     def prepare_allow_member_edit(self, obj):
-        if is_whoosh():
+        if self.use_whoosh:
             try:
                 temp = int(obj.allow_member_edit)
             except TypeError:
@@ -89,7 +155,7 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
         return obj.allow_member_edit
 
     def prepare_status(self, obj):
-        if is_whoosh():
+        if self.use_whoosh:
             try:
                 temp = int(obj.status)
             except TypeError:
@@ -115,5 +181,8 @@ class TendenciBaseSearchIndex(indexes.SearchIndex):
         This needs to be overwritten if 'view' permission label does not follow the standard convention:
         (app_label).view_(module_name)
         """
+        prefetched = self._groups_can_view.pop(obj.pk, None)
+        if prefetched and prefetched[0] is obj:
+            return prefetched[1]
         return ObjectPermission.objects.groups_with_perms('%s.view_%s' % (obj._meta.app_label, obj._meta.model_name), obj)
 
@@ -193,6 +193,39 @@ class ObjectPermissionManager(models.Manager):
                     }
                     self.get_or_create(**defaults)
 
+    def bulk_assign_group(self, group_perms, objects):
+        """
+        Assigns permissions to groups for many new objects
+        of the same model with a single insert.
+        bulk_assign_group(self, group_perms, objects)
+
+        -- group_perms: a tuple of (group id, perm) pairs,
+        like ((2, 'view',), (2, 'change',))
+
+        -- objects: a list of saved instances of one model class.
+        Existing permissions are not checked for, so this is
+        meant for objects that were just created.
+        """
+        if not group_perms or not objects:
+            return
+
+        content_type = ContentType.objects.get_for_model(objects[0])
+        model_name = objects[0]._meta.object_name.lower()
+        codenames = set(Permission.objects.filter(content_type=content_type).values_list(
+                        'codename', flat=True))
+
+        perms = []
+        for group_id, perm in set(group_perms):
+            codename = '%s_%s' % (perm, model_name)
+            if codename not in codenames:
+                continue
+            for object in objects:
+                perms.append(self.model(codename=codename,
+                                        object_id=object.pk,
+                                        content_type=content_type,
+                                        group_id=int(group_id)))
+        self.bulk_create(perms)
+
     def assign(self, user_or_users, object, perms=None):
         """
         Assigns permissions to user or multiple users
@@ -1,7 +1,7 @@
 from django.template import Library, Node, Variable
 from django.contrib.auth.models import User
 
-from tendenci.apps.perms import utils
+from tendenci.apps.perms import backend, utils
 from tendenci.apps.perms.fields import groups_with_perms
 
 register = Library()
@@ -196,3 +196,16 @@ def obj_status(obj):
 
     return value
 
+
+
+@register.simple_tag
+def prefetch_object_perms(user, objects):
+    """
+        {% prefetch_object_perms user objects %}
+
+        Loads the object permissions of user for a page of objects
+        in bulk, ahead of the has_perm checks made for each row.
+    """
+    if isinstance(user, User) and not user.profile.is_superuser:
+        backend.prefetch_object_perms(user, objects)
+    return ''
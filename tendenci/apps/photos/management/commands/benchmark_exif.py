@@ -0,0 +1,81 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Compares the EXIF readers over a folder of sample JPEGs: the
+    pure-Python EXIF.process_file, PIL's _getexif and the lean reader
+    used for uploads. Also reports the images where the lean reader's
+    tags differ from PIL's.
+
+    Usage: python manage.py benchmark_exif /path/to/samples --repeat=3
+    """
+    help = 'Benchmark the EXIF readers over a folder of JPEGs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder')
+        parser.add_argument('--repeat',
+                            dest='repeat',
+                            type=int,
+                            default=3,
+            help='Number of runs over the folder')
+
+    def handle(self, folder, **options):
+        from PIL import Image as PILImage
+        from PIL.ExifTags import TAGS
+        from tendenci.apps.photos.models import Image
+        from tendenci.apps.photos.utils import EXIF
+        from tendenci.apps.photos.utils.fast_exif import read_exif
+
+        if not os.path.isdir(folder):
+            raise CommandError('%s is not a folder' % folder)
+        paths = [os.path.join(folder, name) for name in sorted(os.listdir(folder))
+                 if os.path.splitext(name)[1].lower() in ('.jpg', '.jpeg')]
+        if not paths:
+            raise CommandError('No JPEGs in %s' % folder)
+
+        def exif_py(path):
+            with open(path, 'rb') as f:
+                return EXIF.process_file(f)
+
+        def pil(path):
+            exif = PILImage.open(path)._getexif() or {}
+            return dict((TAGS.get(tag, tag), value) for tag, value in exif.items()
+                        if TAGS.get(tag, tag) in Image.EXIF_KEYS)
+
+        def lean(path):
+            return read_exif(path, Image.EXIF_KEYS)
+
+        self.stdout.write('%d images, %d runs' % (len(paths), options['repeat']))
+        for label, func in (('EXIF.process_file', exif_py),
+                            ('PIL _getexif', pil),
+                            ('lean reader', lean)):
+            self.report(label, func, paths, options['repeat'])
+
+        mismatches = []
+        for path in paths:
+            try:
+                if pil(path) != lean(path):
+                    mismatches.append(path)
+            except Exception:
+                mismatches.append(path)
+        self.stdout.write('lean reader differs from PIL on %d images' % len(mismatches))
+        for path in mismatches[:10]:
+            self.stdout.write('  %s' % path)
+
+    def report(self, label, func, paths, repeat):
+        timings = []
+        for i in xrange(repeat):
+            start = time.time()
+            for path in paths:
+                try:
+                    func(path)
+                except Exception:
+                    pass
+            timings.append(time.time() - start)
+        self.stdout.write('  %-20s best %8.3fs  avg %8.3fs  %8.2fms/image' % (
+                          label, min(timings), sum(timings) / len(timings),
+                          min(timings) * 1000 / len(paths)))
@@ -1,21 +1,52 @@
-from django.core.management.base import BaseCommand
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
 
 
 class Command(BaseCommand):
-    help = ('Loops through all of the photos to create a cached version.')
+    help = ('Loops through all of the photos to create a cached version. '
+            'Photos whose file is unchanged since they were last cached are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+            help='Number of processes resizing the photos')
+        parser.add_argument('--since',
+            help='Only photos updated on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--limit', type=int,
+            help='Stop after caching this many photos')
+        parser.add_argument('--force', action='store_true', default=False,
+            help='Cache the photos even if they are unchanged')
+        parser.add_argument('--hash', action='store_true', default=False,
+            help='Compare the photo contents instead of their modification time')
 
     def handle(self, *args, **options):
-        from tendenci.apps.photos.models import Image
+        from tendenci.apps.files.renditions import PHOTO_RENDITION_SIZES
+        from tendenci.apps.photos.models import Image, ImageFingerprint
+        from tendenci.apps.photos.utils.batch import process_images, renditions_worker
         from tendenci.apps.photos.utils.caching import cache_photo_size
 
-        for photo in Image.objects.all().order_by('-pk'):
+        images = Image.objects.all()
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date as YYYY-MM-DD')
+            images = images.filter(update_dt__gte=since)
 
-            cache_kwargs_list = []
-            cache_kwargs_list.append({"id": photo.pk, "size": "422x700", "constrain": True})
-            cache_kwargs_list.append({"id": photo.pk, "size": "102x78", "crop": True})
-            cache_kwargs_list.append({"id": photo.pk, "size": "640x640", "constrain": True})
+        verbosity = int(options['verbosity'])
 
-            for cache_kwargs in cache_kwargs_list:
-                cache_photo_size(**cache_kwargs)
+        def cache_urls(pk, data):
+            # the renditions exist now; this only caches their urls
+            for size, cache_kwargs in PHOTO_RENDITION_SIZES:
+                cache_photo_size(id=pk, size=size, **cache_kwargs)
+            if verbosity > 1:
+                self.stdout.write(str(pk))
 
-            print photo.pk
+        stats = process_images(ImageFingerprint.TASK_RENDITIONS, renditions_worker, images,
+                               workers=options['workers'],
+                               limit=options['limit'],
+                               force=options['force'],
+                               use_hash=options['hash'],
+                               on_result=cache_urls)
+        if verbosity > 0:
+            self.stdout.write(str(stats))
@@ -0,0 +1,80 @@
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Adds image files, zip files of images or directories of images
+    to a photo set, processing the images in a pool of workers.
+
+    Usage:
+        python manage.py ingest_photos <photoset_id> <path> [<path> ...]
+
+        example:
+        python manage.py ingest_photos 23 /tmp/gala.zip --user 1
+                                                        --workers 8
+    """
+    help = 'Bulk add photos to a photo set'
+
+    def add_arguments(self, parser):
+        parser.add_argument('photoset_id', type=int)
+        parser.add_argument('paths', nargs='+')
+        parser.add_argument('--user',
+            type=int,
+            dest='user',
+            default=1,
+            help='The owner of the photos')
+        parser.add_argument('--identifier',
+            dest='identifier',
+            default='',
+            help='Progress identifier')
+        parser.add_argument('--workers',
+            type=int,
+            dest='workers',
+            default=None,
+            help='Number of worker processes')
+        parser.add_argument('--limit',
+            type=int,
+            dest='limit',
+            default=None,
+            help='Maximum number of photos to add')
+        parser.add_argument('--event-log',
+            type=int,
+            dest='event_log',
+            default=None,
+            help='The event log of the upload, to log the additions with')
+        parser.add_argument('--remove-paths',
+            action='store_true',
+            dest='remove_paths',
+            default=False,
+            help='Remove the paths once done (used for uploads)')
+
+    def handle(self, photoset_id, paths, **options):
+        from django.contrib.auth.models import User
+        from tendenci.apps.event_logs.models import EventLog
+        from tendenci.apps.photos.models import PhotoSet
+        from tendenci.apps.photos.utils.ingest import INGEST_WORKERS, ingest_photos
+
+        try:
+            photo_set = PhotoSet.objects.get(pk=photoset_id)
+            user = User.objects.get(pk=options['user'])
+        except (PhotoSet.DoesNotExist, User.DoesNotExist) as e:
+            raise CommandError(e)
+
+        event_log = None
+        if options['event_log']:
+            event_log = EventLog.objects.filter(pk=options['event_log']).first()
+
+        try:
+            photos = ingest_photos(photo_set, user, paths,
+                                   identifier=options['identifier'] or None,
+                                   workers=options['workers'] or INGEST_WORKERS,
+                                   limit=options['limit'],
+                                   event_log=event_log)
+        finally:
+            if options['remove_paths']:
+                for path in paths:
+                    shutil.rmtree(path, ignore_errors=True)
+
+        self.stdout.write('Added %d photos to %s' % (len(photos), photo_set))
@@ -1,18 +1,48 @@
-from django.core.management.base import BaseCommand
-from django.core.files.storage import default_storage
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
 
 class Command(BaseCommand):
     """
     Populate the exif_data field in Image table.
+
+    Images whose file is unchanged since it was last read are skipped.
     """
 
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+            help='Number of processes reading the images')
+        parser.add_argument('--since',
+            help='Only images updated on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--limit', type=int,
+            help='Stop after reading this many images')
+        parser.add_argument('--force', action='store_true', default=False,
+            help='Read the images even if they are unchanged')
+        parser.add_argument('--hash', action='store_true', default=False,
+            help='Compare the image contents instead of their modification time')
+
     def handle(self, *args, **options):
-        from tendenci.apps.photos.models import Image
+        from tendenci.apps.photos.models import Image, ImageFingerprint
+        from tendenci.apps.photos.utils.batch import process_images, read_exif_worker
 
         images = Image.objects.all()
-        for image in images:
-            if not image.exif_data:
-                if default_storage.exists(image.image.name):
-                    exif_exists = image.get_exif_data()
-                    if exif_exists:
-                        image.save()
+        if options['since']:
+            try:
+                since = datetime.strptime(options['since'], '%Y-%m-%d')
+            except ValueError:
+                raise CommandError('--since must be a date as YYYY-MM-DD')
+            images = images.filter(update_dt__gte=since)
+
+        def save_exif_data(pk, exif_data):
+            if exif_data is not None:
+                Image.objects.filter(pk=pk).update(exif_data=exif_data)
+
+        stats = process_images(ImageFingerprint.TASK_EXIF, read_exif_worker, images,
+                               workers=options['workers'],
+                               limit=options['limit'],
+                               force=options['force'],
+                               use_hash=options['hash'],
+                               on_result=save_exif_data)
+        if int(options['verbosity']) > 0:
+            self.stdout.write(str(stats))
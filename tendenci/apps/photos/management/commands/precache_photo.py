@@ -8,12 +8,8 @@ class Command(BaseCommand):
         
 
     def handle(self, photo_id, **options):
+        from tendenci.apps.files.renditions import PHOTO_RENDITION_SIZES
         from tendenci.apps.photos.utils.caching import cache_photo_size
 
-        cache_kwargs_list = []
-        cache_kwargs_list.append({"id": photo_id, "size": "422x700", "constrain": True})
-        cache_kwargs_list.append({"id": photo_id, "size": "102x78", "crop": True})
-        cache_kwargs_list.append({"id": photo_id, "size": "640x640", "constrain": True})
-
-        for cache_kwargs in cache_kwargs_list:
-            cache_photo_size(**cache_kwargs)
+        for size, cache_kwargs in PHOTO_RENDITION_SIZES:
+            cache_photo_size(id=photo_id, size=size, **cache_kwargs)
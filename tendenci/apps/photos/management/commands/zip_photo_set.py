@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Compiles all photos of a photo set into a single zip file.
+
+    Usage:
+        python manage.py zip_photo_set <photoset_id> [--identifier <identifier>]
+    """
+    help = 'Compile all photos of a photo set into a zip file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('photoset_id', type=int)
+        parser.add_argument('--identifier',
+            dest='identifier',
+            default='',
+            help='Progress identifier')
+
+    def handle(self, photoset_id, **options):
+        from tendenci.apps.photos.models import PhotoSet
+        from tendenci.apps.photos.utils.archive import zip_photo_set
+        from tendenci.apps.photos.utils.ingest import Progress
+
+        try:
+            photo_set = PhotoSet.objects.get(pk=photoset_id)
+        except PhotoSet.DoesNotExist as e:
+            raise CommandError(e)
+
+        progress = Progress(options['identifier']) if options['identifier'] else None
+        self.stdout.write(zip_photo_set(photo_set, progress))
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('photos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageFingerprint',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('task', models.CharField(max_length=20, choices=[('exif', 'EXIF data'), ('renditions', 'Renditions')])),
+                ('fingerprint', models.CharField(max_length=50)),
+                ('update_dt', models.DateTimeField(auto_now=True)),
+                ('image', models.ForeignKey(related_name='fingerprints', to='photos.Image')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='imagefingerprint',
+            unique_together=set([('image', 'task')]),
+        ),
+    ]
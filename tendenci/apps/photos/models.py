@@ -1,7 +1,6 @@
 import uuid
 import os
 from PIL import Image as PILImage
-from PIL.ExifTags import TAGS as PILTAGS
 from PIL import ImageFile
 from PIL import ImageFilter
 
@@ -18,7 +17,6 @@ from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.core.exceptions import SuspiciousOperation
 from django.conf import settings
-from django.core.cache import cache
 from django.utils.encoding import smart_str, force_unicode
 from django.utils.functional import curry
 from django.utils.translation import ugettext_lazy as _
@@ -33,12 +31,15 @@ from tendenci.apps.perms.models import TendenciBaseModel
 from tendenci.apps.perms.object_perms import ObjectPermission
 from tendenci.apps.perms.utils import get_query_filters
 from tendenci.apps.base.fields import DictField
+from tendenci.apps.base.cache_tags import instance_tag, invalidate_tags
+from tendenci.apps.files.renditions import delete_renditions
 from tendenci.apps.photos.managers import PhotoManager, PhotoSetManager
 from tendenci.apps.meta.models import Meta as MetaTags
 from tendenci.apps.photos.module_meta import PhotoMeta
 from tendenci.libs.boto_s3.utils import set_s3_file_permission
 
 from tendenci.apps.photos.utils import EXIF
+from tendenci.apps.photos.utils.fast_exif import read_exif
 from tendenci.apps.photos.utils.reflection import add_reflection
 from tendenci.apps.photos.utils.watermark import apply_watermark
 from tendenci.libs.abstracts.models import OrderingBaseModel
@@ -586,11 +587,7 @@ class PhotoSet(OrderingBaseModel, TendenciBaseModel):
         if not self.is_public():
             for photo in Image.objects.filter(photoset=self.pk):
                 set_s3_file_permission(photo.image.file, public=False)
-                cache_set = cache.get("photos_cache_set.%s" % photo.pk)
-                if cache_set is not None:
-                    # TODO remove cached images
-                    cache.delete_many(cache.get("photos_cache_set.%s" % photo.pk))
-                    cache.delete("photos_cache_set.%s" % photo.pk)
+                invalidate_tags(instance_tag(photo))
 
     def get_default_cover_photo_small(self):
         return settings.STATIC_URL + "images/default-photo-small.jpg"
@@ -737,8 +734,16 @@ class Image(OrderingBaseModel, ImageModel, TendenciBaseModel):
         initial_save = not self.id
         if not self.id:
             self.guid = str(uuid.uuid1())
+        old_name = None
+        if not initial_save:
+            old_name = Image.objects.filter(pk=self.pk).values_list('image', flat=True).first()
 
         super(Image, self).save(*args, **kwargs)
+
+        if old_name and old_name != self.image.name:
+            # the image was replaced; its renditions are stale
+            delete_renditions(old_name)
+            invalidate_tags(instance_tag(self))
        # # clear the cache
        # caching.instance_cache_clear(self, self.pk)
        # caching.cache_clear(PHOTOS_KEYWORDS_CACHE, key=self.pk)
@@ -749,11 +754,7 @@ class Image(OrderingBaseModel, ImageModel, TendenciBaseModel):
         if not self.is_public_photo() or not self.is_public_photoset():
             if hasattr(settings, 'USE_S3_STORAGE') and settings.USE_S3_STORAGE and hasattr(self.image, 'file'):
                 set_s3_file_permission(self.image.file, public=False)
-            cache_set = cache.get("photos_cache_set.%s" % self.pk)
-            if cache_set is not None:
-                # TODO remove cached images
-                cache.delete_many(cache.get("photos_cache_set.%s" % self.pk))
-                cache.delete("photos_cache_set.%s" % self.pk)
+            invalidate_tags(instance_tag(self))
 
         if initial_save:
             try:
@@ -767,6 +768,8 @@ class Image(OrderingBaseModel, ImageModel, TendenciBaseModel):
         """
         Delete image-file and all resized versions
         """
+        # the cached urls of the resized versions
+        invalidate_tags(instance_tag(self))
 
         super(Image, self).delete(*args, **kwargs)
 
@@ -785,6 +788,7 @@ class Image(OrderingBaseModel, ImageModel, TendenciBaseModel):
                 pass
 
             # delete actual image; do not save() self.instance
+            delete_renditions(self.image.name)
             self.image.delete(save=False)
 
 
@@ -802,26 +806,35 @@ class Image(OrderingBaseModel, ImageModel, TendenciBaseModel):
         Extract EXIF data from image and store in the field exif_data.
         """
         try:
-            img = PILImage.open(default_storage.open(self.image.name))
-            exif = img._getexif()
-        except (AttributeError, IOError):
+            f = default_storage.open(self.image.name)
+            try:
+                exif_data = self.read_exif_data(f)
+            finally:
+                f.close()
+        except (IOError, OSError):
             return False
 
-        if exif:
-            for tag, value in exif.items():
-                key = PILTAGS.get(tag, tag)
-                if key in self.EXIF_KEYS:
-                    self.exif_data[key] = value
-
-        self.exif_data['lat'], self.exif_data['lng'] = self.get_lat_lng(
-                                    self.exif_data.get('GPSInfo'))
-        self.exif_data['location'] = self.get_location_via_latlng(
-                                            self.exif_data['lat'],
-                                            self.exif_data['lng']
-                                        )
+        self.exif_data.update(exif_data)
         return True
 
-    def get_lat_lng(self, gps_info):
+    @classmethod
+    def read_exif_data(cls, f):
+        """
+        Returns the EXIF_KEYS tags of an image file, with the
+        lat, lng and location of its GPS info.
+        """
+        exif_data = read_exif(f, cls.EXIF_KEYS)
+
+        exif_data['lat'], exif_data['lng'] = cls.get_lat_lng(
+                                    exif_data.get('GPSInfo'))
+        exif_data['location'] = cls.get_location_via_latlng(
+                                            exif_data['lat'],
+                                            exif_data['lng']
+                                        )
+        return exif_data
+
+    @staticmethod
+    def get_lat_lng(gps_info):
         """
         Calculate the latitude and longitude from gps_info.
         """
@@ -844,7 +857,8 @@ class Image(OrderingBaseModel, ImageModel, TendenciBaseModel):
 
         return lat, lng
 
-    def get_location_via_latlng(self, lat, lng):
+    @staticmethod
+    def get_location_via_latlng(lat, lng):
         """
         Get location via lat and lng.
         """
@@ -1027,6 +1041,32 @@ class AlbumCover(models.Model):
     def __unicode__(self):
         return self.photo.title
 
+
+class ImageFingerprint(models.Model):
+    """
+    The fingerprint of an image file when a batch task last processed
+    it, so that the photo management commands can skip unchanged images.
+    """
+    TASK_EXIF = 'exif'
+    TASK_RENDITIONS = 'renditions'
+    TASK_CHOICES = (
+        (TASK_EXIF, _('EXIF data')),
+        (TASK_RENDITIONS, _('Renditions')),
+    )
+
+    image = models.ForeignKey(Image, related_name='fingerprints')
+    task = models.CharField(max_length=20, choices=TASK_CHOICES)
+    fingerprint = models.CharField(max_length=50)
+    update_dt = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        app_label = 'photos'
+        unique_together = ('image', 'task')
+
+    def __unicode__(self):
+        return u'%s %s: %s' % (self.image_id, self.task, self.fingerprint)
+
+
 # Set up the accessor methods
 def add_methods(sender, instance, signal, *args, **kwargs):
     """ Adds methods to access sized images (urls, paths)
@@ -5,8 +5,23 @@ unittest). These will both pass when you run "manage.py test".
 Replace these with more appropriate tests for your application.
 """
 
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from cStringIO import StringIO
+
+from PIL import Image as PILImage
+from django.core.exceptions import ValidationError
 from django.test import TestCase
 
+from tendenci.apps.photos.models import Image, ImageFingerprint
+from tendenci.apps.photos.utils.batch import DONE, SKIPPED, process_images
+from tendenci.apps.photos.utils.fast_exif import read_exif
+from tendenci.apps.photos.utils.ingest import (clean_filename, collect_sources,
+    extract_images, validate_image)
+
 class SimpleTest(TestCase):
     def test_basic_addition(self):
         """
@@ -14,6 +29,104 @@ class SimpleTest(TestCase):
         """
         self.failUnlessEqual(1 + 1, 2)
 
+class CollectSourcesTest(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_zip_and_image_files(self):
+        zip_path = os.path.join(self.tmp_dir, 'gala.zip')
+        archive = zipfile.ZipFile(zip_path, 'w')
+        archive.writestr('gala/one.JPG', 'one')
+        archive.writestr('gala/notes.txt', 'notes')
+        archive.writestr('__MACOSX/gala/._one.JPG', '')
+        archive.close()
+        image_path = os.path.join(self.tmp_dir, 'two.png')
+        open(image_path, 'wb').write('two')
+
+        sources = collect_sources([zip_path, image_path], self.tmp_dir)
+        self.assertEqual([name for path, name in sources], ['one.JPG', 'two.png'])
+        self.assertEqual(open(sources[0][0], 'rb').read(), 'one')
+
+    def test_zip_limits(self):
+        zip_path = os.path.join(self.tmp_dir, 'gala.zip')
+        archive = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED)
+        for i in range(3):
+            archive.writestr('%d.jpg' % i, 'x' * 100)
+        archive.close()
+
+        sources = extract_images(zip_path, self.tmp_dir, max_members=2)
+        self.assertEqual([name for path, name in sources], ['0.jpg', '1.jpg'])
+
+        # the uncompressed bytes are capped
+        sources = extract_images(zip_path, self.tmp_dir, max_size=250)
+        self.assertEqual([name for path, name in sources], ['0.jpg', '1.jpg'])
+        self.assertEqual(len(os.listdir(self.tmp_dir)), 3)
+
+    def test_validate_image(self):
+        image_path = os.path.join(self.tmp_dir, 'one.png')
+        PILImage.new('RGB', (10, 10)).save(image_path, 'PNG')
+        validate_image(image_path, 'one.png', 1024 * 1024)
+        self.assertRaises(ValidationError, validate_image, image_path, 'one.png', 10)
+
+        not_image_path = os.path.join(self.tmp_dir, 'two.jpg')
+        open(not_image_path, 'wb').write('<?php ?>')
+        self.assertRaises(ValidationError, validate_image, not_image_path, 'two.jpg', 1024 * 1024)
+
+    def test_clean_filename(self):
+        title, filename = clean_filename('/tmp/Board Meeting (1).JPG')
+        self.assertEqual(title, 'Board Meeting (1)')
+        self.assertTrue(filename.startswith('Board-Meeting-1-'))
+        self.assertTrue(filename.endswith('.jpg'))
+
+class FastExifTest(TestCase):
+    def make_jpeg(self):
+        """
+        A JPEG head with an EXIF segment: IFD0 (Make, and pointers to
+        the EXIF and GPS IFDs), the EXIF IFD (DateTimeOriginal and a
+        maker note) and the GPS IFD (latitude ref and latitude).
+        """
+        ifd0 = 8
+        exif_ifd = ifd0 + 2 + 3 * 12 + 4
+        gps_ifd = exif_ifd + 2 + 2 * 12 + 4
+        values = gps_ifd + 2 + 2 * 12 + 4
+        date = '2019:05:06 07:08:09\x00'
+        tiff = 'II*\x00' + struct.pack('<L', ifd0)
+        tiff += struct.pack('<H', 3)
+        tiff += struct.pack('<HHL4s', 0x010F, 2, 4, 'Can\x00')
+        tiff += struct.pack('<HHLL', 0x8769, 4, 1, exif_ifd)
+        tiff += struct.pack('<HHLL', 0x8825, 4, 1, gps_ifd)
+        tiff += struct.pack('<L', 0)
+        tiff += struct.pack('<H', 2)
+        tiff += struct.pack('<HHLL', 0x9003, 2, len(date), values)
+        tiff += struct.pack('<HHLL', 0x927C, 7, 4, 0)
+        tiff += struct.pack('<L', 0)
+        tiff += struct.pack('<H', 2)
+        tiff += struct.pack('<HHL4s', 1, 2, 2, 'N\x00\x00\x00')
+        tiff += struct.pack('<HHLL', 2, 5, 3, values + len(date))
+        tiff += struct.pack('<L', 0)
+        tiff += date + struct.pack('<6L', 40, 1, 26, 1, 463, 10)
+        app1 = 'Exif\x00\x00' + tiff
+        return '\xff\xd8\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1 + '\xff\xda'
+
+    def test_read_exif(self):
+        exif = read_exif(StringIO(self.make_jpeg()), ('Make', 'DateTimeOriginal', 'GPSInfo'))
+        self.assertEqual(exif, {
+            'Make': 'Can',
+            'DateTimeOriginal': '2019:05:06 07:08:09',
+            'GPSInfo': {1: 'N', 2: ((40, 1), (26, 1), (463, 10))},
+        })
+
+    def test_only_requested_tags(self):
+        exif = read_exif(StringIO(self.make_jpeg()), ('DateTimeOriginal',))
+        self.assertEqual(exif, {'DateTimeOriginal': '2019:05:06 07:08:09'})
+
+    def test_no_exif(self):
+        self.assertEqual(read_exif(StringIO('\xff\xd8\xff\xda'), ('Make',)), {})
+
+
 __test__ = {"doctest": """
 Another way to test that 1 + 1 is equal to 2.
 
@@ -21,3 +134,43 @@ Another way to test that 1 + 1 is equal to 2.
 True
 """}
 
+
+class ProcessImagesTest(TestCase):
+    def setUp(self):
+        Image.objects.bulk_create([
+            Image(guid='batch-1', title='one', image='photos/one.jpg', exif_data={'Make': 'Canon'}),
+            Image(guid='batch-2', title='two', image='photos/two.jpg', exif_data={}),
+        ])
+        self.images = Image.objects.filter(guid__startswith='batch-')
+        self.one, self.two = self.images.order_by('pk').values_list('pk', flat=True)
+        self.calls = []
+
+    def worker(self, args):
+        """
+        Records (pk, fingerprint, adopt) instead of reading the image.
+        """
+        pk, name, fingerprint, use_hash, adopt = args
+        self.calls.append((pk, fingerprint, adopt))
+        if fingerprint == 'v1':
+            return pk, fingerprint, SKIPPED, None
+        return pk, 'v1', DONE, None
+
+    def run_task(self, **kwargs):
+        self.calls = []
+        return process_images(ImageFingerprint.TASK_EXIF, self.worker, self.images, **kwargs)
+
+    def test_skip_adopt_force(self):
+        # images with EXIF data and no fingerprint yet are adopted
+        stats = self.run_task()
+        self.assertEqual(stats.processed, 2)
+        self.assertEqual(self.calls, [(self.one, None, True), (self.two, None, False)])
+
+        # unchanged images are skipped
+        stats = self.run_task()
+        self.assertEqual(stats.skipped, 2)
+        self.assertEqual(self.calls, [(self.one, 'v1', True), (self.two, 'v1', False)])
+
+        # forced images are read again, not adopted
+        stats = self.run_task(force=True)
+        self.assertEqual(stats.processed, 2)
+        self.assertEqual(self.calls, [(self.one, None, False), (self.two, None, False)])
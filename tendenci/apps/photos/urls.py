@@ -51,6 +51,9 @@ urlpatterns = patterns('tendenci.apps',
     url(r'^%s/batch-add/$' % urlpath, 'photos.views.photos_batch_add', name='photos_batch_add'),
     # /photos/batch-add/36/
     url(r'^%s/batch-add/(?P<photoset_id>\d+)$' % urlpath, 'photos.views.photos_batch_add', name='photos_batch_add'),
+    # /photos/bulk-add/36/
+    url(r'^%s/bulk-add/(?P<photoset_id>\d+)/$' % urlpath, 'photos.views.photos_bulk_add', name='photos_bulk_add'),
+    url(r'^%s/bulk-add/(?P<photoset_id>\d+)/status/(?P<identifier>\w+)/$' % urlpath, 'photos.views.photos_bulk_add_status', name='photos_bulk_add_status'),
     # /photos/batch-edit/
     url(r'^%s/batch-edit/$' % urlpath, 'photos.views.photos_batch_edit', name='photos.views.photos_batch_edit'),
     # /photos/batch-edit/36
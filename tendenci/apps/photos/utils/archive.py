@@ -0,0 +1,79 @@
+"""
+Zip archives of photo sets.
+"""
+import os
+import tempfile
+import zipfile
+from contextlib import closing
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+
+def write_image(archive, name):
+    """
+    Adds a stored image to the archive. zipfile copies local files in
+    chunks; remote files are first copied, in chunks, to a temporary file.
+    """
+    arcname = os.path.basename(name)
+    try:
+        path = default_storage.path(name)
+    except NotImplementedError:
+        path = None
+
+    if path:
+        archive.write(path, arcname)
+        return
+
+    with tempfile.NamedTemporaryFile() as tmp:
+        f = default_storage.open(name, 'rb')
+        try:
+            for chunk in f.chunks():
+                tmp.write(chunk)
+        finally:
+            f.close()
+        tmp.flush()
+        archive.write(tmp.name, arcname)
+
+
+def zip_photo_set(photo_set, progress=None):
+    """
+    Compiles all photos of a photo set into MEDIA_ROOT/zip_files/set_<id>.zip
+    and returns its url. The archive is written under a temporary name
+    and renamed once complete, so a partial file is never served.
+    """
+    zip_dir = os.path.join(settings.MEDIA_ROOT, 'zip_files')
+    # create zip files directory if it doesn't already exist
+    try:
+        os.makedirs(zip_dir)
+    except OSError:
+        pass
+
+    file_name = "set_%s.zip" % photo_set.id
+    names = [name for name in photo_set.image_set.values_list('image', flat=True) if name]
+    if progress:
+        progress.update(status='processing', total=len(names))
+
+    fd, tmp_path = tempfile.mkstemp(dir=zip_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        with closing(zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_STORED, allowZip64=True)) as archive:
+            for i, name in enumerate(names, 1):
+                try:
+                    write_image(archive, name)
+                except (IOError, OSError):
+                    # skip missing files
+                    pass
+                if progress and i % 10 == 0:
+                    progress.update(done=i)
+        os.rename(tmp_path, os.path.join(zip_dir, file_name))
+    except Exception:
+        os.remove(tmp_path)
+        if progress:
+            progress.update(status='failed')
+        raise
+
+    url = os.path.join(settings.MEDIA_URL, 'zip_files', file_name)
+    if progress:
+        progress.update(status='done', done=len(names), result=url)
+    return url
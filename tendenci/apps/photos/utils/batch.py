@@ -0,0 +1,178 @@
+"""
+Incremental, parallel processing of the photo library, used by the
+populate_exif_data, cache_photos and precache_photo commands.
+
+Each image file gets a fingerprint per task, a digest of its name and
+modification time (or, with use_hash, of its content), stored in
+ImageFingerprint once the task has processed it. Images whose file
+still has the stored fingerprint are skipped.
+
+The fingerprints are computed and the files processed in a pool of
+worker processes, which only use storage; the results are written to
+the database by the parent process, a chunk at a time.
+"""
+import hashlib
+import logging
+import multiprocessing
+
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+
+from tendenci.apps.files.renditions import PHOTO_RENDITION_SIZES, generate_renditions, original_version
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+
+DONE = 'done'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class BatchStats(object):
+    def __init__(self):
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def __str__(self):
+        return 'processed: %d, skipped: %d, failed: %d' % (
+                self.processed, self.skipped, self.failed)
+
+
+def file_fingerprint(name, use_hash=False):
+    if use_hash:
+        md5 = hashlib.md5()
+        f = default_storage.open(name, 'rb')
+        try:
+            for chunk in f.chunks():
+                md5.update(chunk)
+        finally:
+            f.close()
+        return 'md5:%s' % md5.hexdigest()
+    return 'stat:%s' % original_version(name)
+
+
+def read_exif_worker(args):
+    """
+    Returns (pk, fingerprint, status, exif data) for an image.
+    Images that already have EXIF data but no fingerprint yet
+    (adopt) were read before; only their fingerprint is taken.
+    """
+    from tendenci.apps.photos.models import Image
+
+    pk, name, fingerprint, use_hash, adopt = args
+    try:
+        current = file_fingerprint(name, use_hash)
+        if current == fingerprint:
+            return pk, current, SKIPPED, None
+        if adopt and fingerprint is None:
+            return pk, current, DONE, None
+        f = default_storage.open(name, 'rb')
+        try:
+            return pk, current, DONE, Image.read_exif_data(f)
+        finally:
+            f.close()
+    except Exception:
+        logger.exception('Failed to read the EXIF data of %s', name)
+        return pk, None, FAILED, None
+
+
+def renditions_worker(args):
+    """
+    Builds the PHOTO_RENDITION_SIZES renditions of an image.
+    Returns (pk, fingerprint, status, None); the image fails,
+    to be retried, when any of its renditions does.
+    """
+    pk, name, fingerprint, use_hash, adopt = args
+    try:
+        current = file_fingerprint(name, use_hash)
+        if current == fingerprint:
+            return pk, current, SKIPPED, None
+        if generate_renditions(name, PHOTO_RENDITION_SIZES, format='JPEG'):
+            return pk, None, FAILED, None
+        return pk, current, DONE, None
+    except Exception:
+        logger.exception('Failed to build the renditions of %s', name)
+        return pk, None, FAILED, None
+
+
+def save_fingerprints(task, fingerprints):
+    from tendenci.apps.photos.models import ImageFingerprint
+
+    if not fingerprints:
+        return
+    with transaction.atomic():
+        ImageFingerprint.objects.filter(task=task, image__in=fingerprints.keys()).delete()
+        ImageFingerprint.objects.bulk_create([
+            ImageFingerprint(image_id=pk, task=task, fingerprint=fingerprint)
+            for pk, fingerprint in fingerprints.items()])
+
+
+def process_images(task, worker, images, workers=1, limit=None, force=False,
+                   use_hash=False, on_result=None):
+    """
+    Runs worker over the images, a queryset of Image, skipping the
+    images whose fingerprint for task is unchanged (unless force is
+    set) and stopping after limit images were processed.
+
+    on_result(pk, data) is called in this process for each processed
+    image, before its fingerprint is saved.
+    """
+    from tendenci.apps.photos.models import ImageFingerprint
+
+    stats = BatchStats()
+    pool = None
+    if workers > 1:
+        # the workers are forked; don't share the database connections
+        for connection in connections.all():
+            connection.close()
+        pool = multiprocessing.Pool(workers)
+
+    rows = images.exclude(image='').order_by('pk').values_list('pk', 'image', 'exif_data')
+    last_pk = 0
+    try:
+        while True:
+            chunk = list(rows.filter(pk__gt=last_pk)[:CHUNK_SIZE])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+
+            fingerprints = {}
+            if not force:
+                fingerprints = dict(ImageFingerprint.objects.filter(
+                    task=task, image__in=[row[0] for row in chunk]).values_list('image', 'fingerprint'))
+            # exif_data is the stored JSON here; '{}' when nothing was read.
+            # forced images are always read again, never adopted
+            args = [(pk, name, fingerprints.get(pk), use_hash,
+                     not force and exif_data not in (None, '', '{}'))
+                    for pk, name, exif_data in chunk]
+
+            if pool:
+                results = pool.imap_unordered(worker, args, chunksize=8)
+            else:
+                results = (worker(arg) for arg in args)
+
+            done = {}
+            for pk, fingerprint, status, data in results:
+                if status == SKIPPED:
+                    stats.skipped += 1
+                elif status == FAILED:
+                    stats.failed += 1
+                else:
+                    if on_result:
+                        on_result(pk, data)
+                    done[pk] = fingerprint
+                    stats.processed += 1
+                    if limit and stats.processed >= limit:
+                        break
+            save_fingerprints(task, done)
+
+            if limit and stats.processed >= limit:
+                break
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+
+    return stats
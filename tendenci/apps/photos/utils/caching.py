@@ -1,11 +1,9 @@
-from django.http import HttpResponse
-from django.conf import settings
-from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 
-from tendenci.apps.files.utils import get_image, aspect_ratio, generate_image_cache_key
+from tendenci.apps.base.cache_tags import object_tag, tagged_cache_get, tagged_cache_set
+from tendenci.apps.files.renditions import get_rendition
+from tendenci.apps.files.utils import aspect_ratio, generate_image_cache_key, validate_image_size
 
 from tendenci.apps.photos.cache import PHOTO_PRE_KEY
 from tendenci.apps.photos.models import Image
@@ -18,7 +16,8 @@ def cache_photo_size(id, size, crop=False, quality=90, download=False, constrain
         quality = int(quality)
 
     cache_key = generate_image_cache_key(file=str(id), size=size, pre_key=PHOTO_PRE_KEY, crop=crop, unique_key=str(id), quality=quality, constrain=constrain)
-    cached_image = cache.get(cache_key)
+    cache_tags = [object_tag(Image, id)]
+    cached_image = tagged_cache_get(cache_key, cache_tags)
     if cached_image:
         return cached_image
 
@@ -39,31 +38,16 @@ def cache_photo_size(id, size, crop=False, quality=90, download=False, constrain
     size = [int(s) for s in size.split('x')]
     size = aspect_ratio(photo.image_dimensions(), size, constrain)
 
-    # gets resized image from cache or rebuild
-    image = get_image(photo.image, size, PHOTO_PRE_KEY, crop=crop, quality=quality, unique_key=str(photo.pk), constrain=constrain)
-
-    # if image not rendered; quit
-    if not image:
+    # gets the stored rendition or builds it once
+    try:
+        rendition = get_rendition(photo.image.name, validate_image_size(size), crop=crop,
+                                  quality=quality, constrain=constrain, format='JPEG')
+    except (IOError, OSError):
         return request_path
 
-    response = HttpResponse(content_type='image/jpeg')
-    response['Content-Disposition'] = ' filename=%s' % photo.image_filename()
-    image.save(response, "JPEG", quality=quality)
-
     if photo.is_public_photo() and photo.is_public_photoset():
-        file_name = photo.image_filename()
-        file_path = 'cached%s%s' % (request_path, file_name)
-        default_storage.save(file_path, ContentFile(response.content))
-        full_file_path = "%s%s" % (settings.MEDIA_URL, file_path)
-        cache.set(cache_key, full_file_path)
-        cache_group_key = "photos_cache_set.%s" % photo.pk
-        cache_group_list = cache.get(cache_group_key)
-
-        if cache_group_list is None:
-            cache.set(cache_group_key, [cache_key])
-        else:
-            cache_group_list += [cache_key]
-            cache.set(cache_group_key, cache_group_list)
+        full_file_path = default_storage.url(rendition)
+        tagged_cache_set(cache_key, full_file_path, cache_tags)
 
         return full_file_path
     return request_path
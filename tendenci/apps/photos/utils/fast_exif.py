@@ -0,0 +1,156 @@
+"""
+A lean EXIF reader.
+
+Reads only the head of the file (the EXIF segment of a JPEG is near
+the start and at most 64 KB) and parses the IFDs with struct.unpack_from,
+returning just the requested tags. Maker notes, the thumbnail IFD and
+every other tag are skipped without being decoded.
+
+Values are returned as PIL's Image._getexif() returns them: ASCII as
+unicode, single numbers as ints, rationals as (numerator, denominator)
+and GPSInfo as a dict of the GPS tags keyed by their numbers.
+"""
+import struct
+
+from PIL.ExifTags import TAGS
+
+EXIF_READ_SIZE = 128 * 1024
+
+EXIF_IFD_POINTER = 0x8769
+GPS_IFD_POINTER = 0x8825
+
+# type: (struct format, size in bytes)
+TYPE_FORMATS = {
+    1: ('B', 1),   # BYTE
+    2: ('s', 1),   # ASCII
+    3: ('H', 2),   # SHORT
+    4: ('L', 4),   # LONG
+    5: ('LL', 8),  # RATIONAL
+    6: ('b', 1),   # SBYTE
+    7: ('s', 1),   # UNDEFINED
+    8: ('h', 2),   # SSHORT
+    9: ('l', 4),   # SLONG
+    10: ('ll', 8), # SRATIONAL
+}
+
+TAG_IDS = dict((name, tag) for tag, name in TAGS.items())
+
+
+def read_head(f, size):
+    if isinstance(f, basestring):
+        with open(f, 'rb') as fp:
+            return fp.read(size)
+    return f.read(size)
+
+
+def find_tiff(data):
+    """
+    Returns the offset of the TIFF header holding the EXIF data,
+    or None when there is none in data.
+    """
+    if data[:4] in ('II*\x00', 'MM\x00*'):
+        return 0
+    if data[:2] != '\xff\xd8':
+        return None
+
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != '\xff':
+            return None
+        marker = ord(data[pos + 1])
+        if marker == 0xff:
+            # fill byte
+            pos += 1
+            continue
+        if marker == 0xda:
+            # start of scan; no more metadata segments
+            return None
+        length = struct.unpack_from('>H', data, pos + 2)[0]
+        if marker == 0xe1 and data[pos + 4:pos + 10] == 'Exif\x00\x00':
+            return pos + 10
+        pos += 2 + length
+    return None
+
+
+def read_value(data, base, endian, entry):
+    """
+    Returns the value of a 12 byte IFD entry, or None when it
+    points outside of data.
+    """
+    type_, count = struct.unpack_from(endian + 'HL', data, entry + 2)
+    if type_ not in TYPE_FORMATS:
+        return None
+    format, size = TYPE_FORMATS[type_]
+    length = size * count
+    if length <= 4:
+        offset = entry + 8
+    else:
+        offset = base + struct.unpack_from(endian + 'L', data, entry + 8)[0]
+    if offset + length > len(data):
+        return None
+
+    if format == 's':
+        value = data[offset:offset + length]
+        if type_ == 2:
+            value = value.split('\x00', 1)[0].decode('latin-1', 'replace')
+        return value
+
+    if len(format) == 2:
+        # rationals; pairs of numerator and denominator
+        values = struct.unpack_from('%s%d%s' % (endian, count * 2, format[0]), data, offset)
+        values = tuple(zip(values[::2], values[1::2]))
+    else:
+        values = struct.unpack_from('%s%d%s' % (endian, count, format), data, offset)
+    if len(values) == 1:
+        return values[0]
+    return values
+
+
+def read_ifd(data, base, endian, offset, wanted):
+    """
+    Returns {tag: value} of the wanted tags of the IFD at offset.
+    """
+    tags = {}
+    pos = base + offset
+    if pos + 2 > len(data):
+        return tags
+    count = struct.unpack_from(endian + 'H', data, pos)[0]
+    for i in xrange(count):
+        entry = pos + 2 + i * 12
+        if entry + 12 > len(data):
+            break
+        tag = struct.unpack_from(endian + 'H', data, entry)[0]
+        if wanted is None or tag in wanted:
+            value = read_value(data, base, endian, entry)
+            if value is not None:
+                tags[tag] = value
+    return tags
+
+
+def read_exif(f, names, size=EXIF_READ_SIZE):
+    """
+    Returns {name: value} of the EXIF tags with the given names found in
+    the first size bytes of f, a file object or a path. 'GPSInfo' returns
+    the whole GPS IFD.
+    """
+    data = read_head(f, size)
+    base = find_tiff(data)
+    if base is None or base + 8 > len(data):
+        return {}
+
+    endian = '<' if data[base:base + 2] == 'II' else '>'
+    ifd0_offset = struct.unpack_from(endian + 'L', data, base + 4)[0]
+
+    wanted = set(TAG_IDS[name] for name in names if name in TAG_IDS)
+    pointers = set([EXIF_IFD_POINTER, GPS_IFD_POINTER])
+
+    # IFD0 only; the next IFD (IFD1) is the thumbnail
+    tags = read_ifd(data, base, endian, ifd0_offset, wanted | pointers)
+    exif_offset = tags.pop(EXIF_IFD_POINTER, None)
+    gps_offset = tags.pop(GPS_IFD_POINTER, None)
+    if isinstance(exif_offset, (int, long)):
+        tags.update(read_ifd(data, base, endian, exif_offset, wanted))
+    if 'GPSInfo' in names and isinstance(gps_offset, (int, long)):
+        tags[GPS_IFD_POINTER] = read_ifd(data, base, endian, gps_offset, None)
+
+    return dict((TAGS.get(tag, tag), value) for tag, value in tags.items())
@@ -0,0 +1,341 @@
+"""
+Bulk ingestion of photos into a photo set.
+
+The uploaded images (or the images of uploaded zip files) are validated
+as the photo upload form does, then stored, read and resized by a pool
+of worker processes; the Image rows, their photo set links, permissions,
+search index queue entries and event logs are then inserted in bulk.
+Zip files are extracted up to PHOTO_ZIP_MAX_MEMBERS images and
+PHOTO_ZIP_MAX_SIZE uncompressed bytes. Progress is kept in the cache
+under an identifier so that the upload page can poll it while the
+ingestion runs in the background.
+"""
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import uuid
+import zipfile
+from contextlib import closing
+from copy import copy
+from datetime import datetime
+
+import simplejson
+
+from django import forms
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files import File as DjangoFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Max
+
+from tendenci.apps.files.renditions import PHOTO_RENDITION_SIZES, generate_renditions
+from tendenci.apps.files.utils import get_max_file_upload_size
+from tendenci.libs.boto_s3.utils import set_s3_file_permission
+
+logger = logging.getLogger(__name__)
+
+INGEST_WORKERS = getattr(settings, 'PHOTO_INGEST_WORKERS', 4)
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.gif', '.png')
+PROGRESS_TIMEOUT = 60 * 60 * 24
+BULK_SIZE = 100
+ZIP_MAX_MEMBERS = getattr(settings, 'PHOTO_ZIP_MAX_MEMBERS', 1000)
+ZIP_MAX_SIZE = getattr(settings, 'PHOTO_ZIP_MAX_SIZE', 2 * 1024 ** 3)
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+class Progress(object):
+    """
+    The progress of a background photo job, kept in the cache.
+    """
+    def __init__(self, identifier):
+        self.key = 'photos.progress.%s' % identifier
+
+    def get(self):
+        return cache.get(self.key)
+
+    def update(self, **kwargs):
+        state = self.get() or {'status': 'pending', 'total': 0, 'done': 0, 'failed': 0}
+        state.update(kwargs)
+        cache.set(self.key, state, PROGRESS_TIMEOUT)
+        return state
+
+
+def clean_filename(filename):
+    """
+    Returns the title and the storage file name of an upload;
+    alphanumeric with dashes, truncated and made unique.
+    """
+    title, extension = os.path.splitext(os.path.basename(filename))
+    filename = re.sub(r'[^a-zA-Z0-9._]+', '-', title)
+    return title, filename[:70] + '-' + unicode(uuid.uuid1())[:5] + extension.lower()
+
+
+def copy_limited(src, dst, limit):
+    """
+    Copies src to dst. Returns the number of bytes copied, or None
+    when there are more than limit bytes to copy.
+    """
+    copied = 0
+    while True:
+        data = src.read(min(COPY_CHUNK_SIZE, limit - copied + 1))
+        if not data:
+            return copied
+        copied += len(data)
+        if copied > limit:
+            return None
+        dst.write(data)
+
+
+def extract_images(path, to_dir, max_members=ZIP_MAX_MEMBERS, max_size=ZIP_MAX_SIZE):
+    """
+    Extracts the images of a zip file into to_dir, one member at
+    a time, and returns their paths with their original names.
+
+    Extraction stops after max_members images or max_size bytes;
+    the bytes are counted as they are extracted, as the sizes in
+    the archive can't be trusted.
+    """
+    sources = []
+    remaining = max_size
+    with closing(zipfile.ZipFile(path)) as archive:
+        for i, info in enumerate(archive.infolist()):
+            name = os.path.basename(info.filename)
+            if name.startswith('.') or os.path.splitext(name)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            if len(sources) >= max_members or info.file_size > remaining:
+                logger.warning('Stopped extracting %s after %d images', path, len(sources))
+                break
+            target = os.path.join(to_dir, '%d%s' % (i, os.path.splitext(name)[1].lower()))
+            with closing(archive.open(info)) as member:
+                with open(target, 'wb') as f:
+                    copied = copy_limited(member, f, remaining)
+            if copied is None:
+                os.remove(target)
+                logger.warning('Stopped extracting %s after %d images', path, len(sources))
+                break
+            remaining -= copied
+            sources.append((target, name))
+    return sources
+
+
+def collect_sources(paths, tmp_dir):
+    """
+    Returns (path, original name) for the image files
+    and the images of the zip files in paths.
+    """
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            sources.extend(collect_sources(
+                [os.path.join(path, name) for name in sorted(os.listdir(path))], tmp_dir))
+        elif zipfile.is_zipfile(path):
+            sources.extend(extract_images(path, tmp_dir))
+        elif os.path.splitext(path)[1].lower() in IMAGE_EXTENSIONS:
+            sources.append((path, os.path.basename(path)))
+    return sources
+
+
+def parse_date_taken(exif_data):
+    try:
+        return datetime.strptime(exif_data['DateTimeOriginal'], '%Y:%m:%d %H:%M:%S')
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def validate_image(path, filename, max_size):
+    """
+    Validates an image file as the photo upload form does, and
+    against the maximum upload size. Raises ValidationError.
+    """
+    if os.path.getsize(path) > max_size:
+        raise ValidationError('%s is larger than %d bytes' % (filename, max_size))
+    with open(path, 'rb') as f:
+        forms.ImageField().clean(DjangoFile(f, filename))
+
+
+def process_photo(args):
+    """
+    Validates and stores an image, reads its EXIF data and builds its
+    renditions. Runs in a pool worker, so it only uses storage.
+    """
+    from tendenci.apps.photos.models import Image, get_storage_path
+
+    path, filename, public, max_size = args
+    try:
+        validate_image(path, filename, max_size)
+    except ValidationError as e:
+        logger.warning('Skipped photo %s: %s', filename, '; '.join(e.messages))
+        return None
+
+    title, filename = clean_filename(filename)
+    try:
+        with open(path, 'rb') as f:
+            name = default_storage.save(get_storage_path(None, filename), DjangoFile(f))
+        if not public:
+            set_s3_file_permission(name, public=False)
+
+        with open(path, 'rb') as f:
+            exif_data = Image.read_exif_data(f)
+        try:
+            simplejson.dumps(exif_data)
+        except (TypeError, ValueError):
+            # tags that can't be stored
+            exif_data = {}
+        generate_renditions(name, PHOTO_RENDITION_SIZES, format='JPEG')
+    except Exception:
+        logger.exception('Failed to ingest photo %s', path)
+        return None
+
+    return {'title': title, 'name': name, 'exif_data': exif_data}
+
+
+def log_photos(photos, event_log):
+    """
+    Logs the addition of each photo, as the photo upload view does,
+    with the request details of event_log, the log of the upload.
+    """
+    from tendenci.apps.event_logs.models import EventLog
+    from tendenci.apps.photos.models import Image
+
+    content_type = ContentType.objects.get_for_model(Image)
+    event_logs = []
+    for photo in photos:
+        photo_log = copy(event_log)
+        photo_log.pk = None
+        photo_log.event_id = 990100
+        photo_log.event_data = '%s (%d) added by %s' % (Image._meta.object_name, photo.pk,
+                                                        event_log.username)
+        photo_log.description = '%s added' % Image._meta.object_name
+        photo_log.content_type = content_type
+        photo_log.object_id = photo.pk
+        photo_log.headline = unicode(photo)[:50]
+        photo_log.model_name = content_type.name
+        photo_log.uuid = photo.guid
+        event_logs.append(photo_log)
+    EventLog.objects.bulk_create(event_logs, batch_size=BULK_SIZE)
+
+
+def create_photos(photo_set, user, results, event_log=None):
+    """
+    Inserts the Image rows of the processed photos in bulk, with their
+    photo set links, the photo set's group permissions, search index
+    queue entries and, given the event log of the upload, event logs,
+    and returns them.
+    """
+    from tendenci.apps.perms.object_perms import ObjectPermission
+    from tendenci.apps.photos.models import Image
+    from tendenci.apps.photos.utils import get_privacy_settings
+    from tendenci.apps.search.models import UnindexedItem
+    from tendenci.apps.user_groups.utils import get_default_group
+
+    privacy = get_privacy_settings(photo_set)
+    group = get_default_group()
+    position = Image.objects.filter(
+        photoset=photo_set).aggregate(Max('position'))['position__max'] or 0
+
+    photos = []
+    for result in results:
+        position += 1
+        photo = Image(guid=unicode(uuid.uuid1()),
+                      title=result['title'],
+                      image=result['name'],
+                      exif_data=result['exif_data'],
+                      date_taken=parse_date_taken(result['exif_data']) or datetime.now(),
+                      creator=user,
+                      creator_username=user.username,
+                      owner=user,
+                      owner_username=user.username,
+                      member=user,
+                      safetylevel=3,
+                      group=group,
+                      position=position,
+                      **privacy)
+        photos.append(photo)
+
+    with transaction.atomic():
+        Image.objects.bulk_create(photos, batch_size=BULK_SIZE)
+        ids = dict(Image.objects.filter(guid__in=[p.guid for p in photos]).values_list('guid', 'pk'))
+        for photo in photos:
+            photo.pk = ids[photo.guid]
+
+        Image.photoset.through.objects.bulk_create([
+            Image.photoset.through(image_id=photo.pk, photoset_id=photo_set.pk)
+            for photo in photos], batch_size=BULK_SIZE)
+
+        # photo group perms = album group perms
+        group_perms = photo_set.perms.filter(group__isnull=False).values_list('group', 'codename')
+        group_perms = tuple([(g, c.split('_')[0]) for g, c in group_perms])
+        ObjectPermission.objects.bulk_assign_group(group_perms, photos)
+
+        content_type = ContentType.objects.get_for_model(Image)
+        UnindexedItem.objects.bulk_create([
+            UnindexedItem(content_type=content_type, object_id=photo.pk)
+            for photo in photos], batch_size=BULK_SIZE)
+
+        if event_log:
+            log_photos(photos, event_log)
+
+    # the sizes Image.save builds (renditions are built by the workers)
+    for photo in photos:
+        photo.pre_cache()
+
+    return photos
+
+
+def ingest_photos(photo_set, user, paths, identifier=None, workers=INGEST_WORKERS, limit=None,
+                  event_log=None):
+    """
+    Adds the images in paths (image files, zip files or directories)
+    to photo_set. Returns the new photos. The additions are logged
+    with the request details of event_log, if given.
+    """
+    progress = Progress(identifier) if identifier else None
+    tmp_dir = tempfile.mkdtemp(prefix='photos-ingest-')
+    try:
+        sources = collect_sources(paths, tmp_dir)
+        if limit is not None:
+            sources = sources[:max(limit, 0)]
+        if progress:
+            progress.update(status='processing', total=len(sources))
+
+        public = all([photo_set.allow_anonymous_view, photo_set.status,
+                      photo_set.status_detail.lower() == 'active'])
+        max_size = get_max_file_upload_size()
+        tasks = [(path, name, public, max_size) for path, name in sources]
+
+        # the workers are forked; don't share the database connections
+        for connection in connections.all():
+            connection.close()
+        results = []
+        failed = 0
+        pool = multiprocessing.Pool(workers)
+        try:
+            for i, result in enumerate(pool.imap(process_photo, tasks), 1):
+                if result:
+                    results.append(result)
+                else:
+                    failed += 1
+                if progress and (i % 10 == 0 or i == len(tasks)):
+                    progress.update(done=i, failed=failed)
+        finally:
+            pool.close()
+            pool.join()
+
+        photos = create_photos(photo_set, user, results, event_log)
+    except Exception:
+        if progress:
+            progress.update(status='failed')
+        raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if progress:
+        progress.update(status='done', done=len(tasks), failed=failed)
+    return photos
+
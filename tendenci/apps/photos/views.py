@@ -1,7 +1,8 @@
 import os
 import re
-
-from subprocess import Popen
+import subprocess
+import tempfile
+import uuid
 
 from django.shortcuts import get_object_or_404, redirect
 from django.http import HttpResponseRedirect, HttpResponse, Http404
@@ -13,12 +14,10 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core import serializers
-from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.files.storage import default_storage
 from django.forms.models import modelformset_factory
-from django.core.files.base import ContentFile
 from django.db.models import Q
 from django.middleware.csrf import get_token as csrf_get_token
 
@@ -30,7 +29,9 @@ from tendenci.apps.perms.decorators import is_enabled
 from tendenci.apps.perms.utils import has_perm, update_perms_and_save, get_query_filters, has_view_perm
 from tendenci.apps.site_settings.utils import get_setting
 from tendenci.apps.event_logs.models import EventLog
-from tendenci.apps.files.utils import get_image, aspect_ratio, generate_image_cache_key
+from tendenci.apps.files.renditions import read_rendition
+from tendenci.apps.base.cache_tags import object_tag, tagged_cache_get, tagged_cache_set
+from tendenci.apps.files.utils import aspect_ratio, generate_image_cache_key, validate_image_size
 from tendenci.apps.user_groups.models import Group
 from djcelery.models import TaskMeta
 
@@ -39,6 +40,7 @@ from tendenci.apps.photos.cache import PHOTO_PRE_KEY
 from tendenci.apps.photos.models import Image, Pool, PhotoSet, AlbumCover, License
 from tendenci.apps.photos.forms import PhotoUploadForm, PhotoEditForm, PhotoSetAddForm, PhotoSetEditForm, PhotoBatchEditForm
 from tendenci.apps.photos.utils import get_privacy_settings
+from tendenci.apps.photos.utils.ingest import Progress
 from tendenci.apps.photos.tasks import ZipPhotoSetTask
 
 
@@ -198,7 +200,8 @@ def photo_size(request, id, size, crop=False, quality=90, download=False, constr
         quality = int(quality)
 
     cache_key = generate_image_cache_key(file=id, size=size, pre_key=PHOTO_PRE_KEY, crop=crop, unique_key=id, quality=quality, constrain=constrain)
-    cached_image = cache.get(cache_key)
+    cache_tags = [object_tag(Image, id)]
+    cached_image = tagged_cache_get(cache_key, cache_tags)
     if cached_image:
         return redirect(cached_image)
 
@@ -215,35 +218,21 @@ def photo_size(request, id, size, crop=False, quality=90, download=False, constr
         attachment = 'attachment;'
 
 
-    if not photo.image or not default_storage.exists(photo.image.name):
+    if not photo.image:
         raise Http404
 
-    # gets resized image from cache or rebuild
-    image = get_image(photo.image, size, PHOTO_PRE_KEY, crop=crop, quality=quality, unique_key=str(photo.pk), constrain=constrain)
-
-    # if image not rendered; quit
-    if not image:
+    # reads the stored rendition or builds it once
+    try:
+        rendition, binary = read_rendition(photo.image.name, validate_image_size(size), crop=crop,
+                                           quality=quality, constrain=constrain, format='JPEG')
+    except (IOError, OSError):
         raise Http404
 
-    response = HttpResponse(content_type='image/jpeg')
+    response = HttpResponse(binary, content_type='image/jpeg')
     response['Content-Disposition'] = '%s filename=%s' % (attachment, photo.image_filename())
-    image.save(response, "JPEG", quality=quality)
 
     if photo.is_public_photo() and photo.is_public_photoset():
-        file_name = photo.image_filename()
-        file_path = 'cached%s%s' % (request.path, file_name)
-        default_storage.delete(file_path)
-        default_storage.save(file_path, ContentFile(response.content))
-        full_file_path = "%s%s" % (settings.MEDIA_URL, file_path)
-        cache.set(cache_key, full_file_path)
-        cache_group_key = "photos_cache_set.%s" % photo.pk
-        cache_group_list = cache.get(cache_group_key)
-
-        if cache_group_list is None:
-            cache.set(cache_group_key, [cache_key])
-        else:
-            cache_group_list += [cache_key]
-            cache.set(cache_group_key, cache_group_list)
+        tagged_cache_set(cache_key, default_storage.url(rendition), cache_tags)
 
     return response
 
@@ -605,7 +594,7 @@ def photos_batch_add(request, photoset_id=0):
                 # serialize queryset
                 data = serializers.serialize("json", Image.objects.filter(id=photo.id))
 
-                cache_image = Popen(["python", "manage.py", "precache_photo", str(photo.pk)])
+                subprocess.Popen(["python", "manage.py", "precache_photo", str(photo.pk)])
 
                 # returning a response of "ok" (flash likes this)
                 # response is for flash, not humans
@@ -636,6 +625,85 @@ def photos_batch_add(request, photoset_id=0):
             context_instance=RequestContext(request))
 
 
+@is_enabled('photos')
+@login_required
+def photos_bulk_add(request, photoset_id):
+    """
+    Takes many image files, or zip files of images, at once and adds
+    them to the photo set in a background process. Responds with the
+    url to poll for the progress.
+    """
+    photo_set = get_object_or_404(PhotoSet, id=photoset_id)
+    if not has_perm(request.user, 'photos.add_photoset'):
+        raise Http403
+
+    uploads = request.FILES.getlist('files')
+    if request.method != 'POST' or not uploads:
+        return HttpResponse(json.dumps({'error': 'no files'}), content_type='application/json', status=400)
+
+    photo_limit = get_setting('module', 'photos', 'photolimit')
+    try:
+        photo_limit = int(photo_limit)
+    except ValueError:
+        # default limit for photo set images 150
+        photo_limit = 150
+    image_slot_left = photo_limit - photo_set.image_set.count()
+
+    # the uploads are handed to the background process in a directory
+    upload_dir = tempfile.mkdtemp(prefix='photos-upload-')
+    for i, uploaded_file in enumerate(uploads):
+        file_name = os.path.basename(uploaded_file.name)
+        os.mkdir(os.path.join(upload_dir, str(i)))
+        with open(os.path.join(upload_dir, str(i), file_name), 'wb') as f:
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+
+    # the additions are logged in the background with the details of this request
+    event_log = EventLog.objects.log(**{
+        'event_id': 991100,
+        'event_data': '%d files uploaded to %s (%d) by %s' % (len(uploads), photo_set._meta.object_name,
+                                                             photo_set.pk, request.user),
+        'description': '%s bulk add' % photo_set._meta.object_name,
+        'user': request.user,
+        'request': request,
+        'instance': photo_set,
+        'sync': True,
+    })
+
+    identifier = uuid.uuid4().hex
+    Progress(identifier).update(status='pending')
+    args = ["python", "manage.py", "ingest_photos",
+            str(photo_set.pk), upload_dir,
+            '--user=%s' % request.user.id,
+            '--identifier=%s' % identifier,
+            '--limit=%s' % image_slot_left,
+            '--remove-paths']
+    if event_log:
+        args.append('--event-log=%s' % event_log.pk)
+    subprocess.Popen(args)
+
+    return HttpResponse(json.dumps({
+        'identifier': identifier,
+        'status_url': reverse('photos_bulk_add_status', args=[photo_set.pk, identifier]),
+    }), content_type='application/json')
+
+
+@is_enabled('photos')
+@login_required
+def photos_bulk_add_status(request, photoset_id, identifier):
+    """
+    Returns the progress of a bulk add as JSON:
+    status, total, done and failed.
+    """
+    if not has_perm(request.user, 'photos.add_photoset'):
+        raise Http403
+
+    progress = Progress(identifier).get()
+    if progress is None:
+        raise Http404
+    return HttpResponse(json.dumps(progress), content_type='application/json')
+
+
 @is_enabled('photos')
 @login_required
 def photos_batch_edit(request, photoset_id=0, template_name="photos/batch-edit.html"):
@@ -774,8 +842,11 @@ def photoset_zip(request, id, template_name="photos/photo-set/zip.html"):
     file_path = ""
     task_id = ""
     if not settings.CELERY_IS_ACTIVE:
-        task = ZipPhotoSetTask()
-        file_path = task.run(photo_set)
+        # compile the zip file in the background and poll its progress
+        task_id = uuid.uuid4().hex
+        Progress(task_id).update(status='pending')
+        subprocess.Popen(["python", "manage.py", "zip_photo_set",
+                          str(photo_set.pk), '--identifier=%s' % task_id])
     else:
         task = ZipPhotoSetTask.delay(photo_set)
         task_id = task.task_id
@@ -787,6 +858,12 @@ def photoset_zip(request, id, template_name="photos/photo-set/zip.html"):
     }, context_instance=RequestContext(request))
 
 def photoset_zip_status(request, id, task_id):
+    if not settings.CELERY_IS_ACTIVE:
+        progress = Progress(task_id).get()
+        if progress and progress['status'] == 'done':
+            return HttpResponse(json.dumps(progress['result']), content_type='application/json')
+        return HttpResponse(json.dumps('DNE'), content_type='application/json')
+
     try:
         task = TaskMeta.objects.get(task_id=task_id)
     except TaskMeta.DoesNotExist:
@@ -0,0 +1,93 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from uuid import uuid4
+
+from django.core.cache import cache
+from django.conf import settings
+
+from tendenci.apps.robots.cache import CACHE_PRE_KEY
+
+
+class RobotMatcher(object):
+    """
+    Matches user agents against all robot names with a single
+    compiled regex, and keeps a bounded LRU of recent results.
+
+    The leftmost robot name found in the user agent wins; when two
+    names start at the same position the robot listed first wins.
+    """
+    def __init__(self, robots, lru_size=1000):
+        self.robots = {}
+        patterns = []
+        for robot in robots:
+            name = (robot.name or '').lower()
+            if name and name not in self.robots:
+                self.robots[name] = robot
+                patterns.append(re.escape(name))
+        if patterns:
+            self.regex = re.compile('|'.join(patterns))
+        else:
+            self.regex = None
+        self.lru_size = lru_size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+
+    def match(self, user_agent):
+        with self._lock:
+            try:
+                robot = self._lru.pop(user_agent)
+                self._lru[user_agent] = robot
+                return robot
+            except KeyError:
+                pass
+
+        robot = None
+        if self.regex is not None:
+            found = self.regex.search(user_agent.lower())
+            if found:
+                robot = self.robots[found.group(0)]
+
+        with self._lock:
+            self._lru[user_agent] = robot
+            while len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+        return robot
+
+
+# The matcher is rebuilt when the version stamp in the shared cache
+# changes; the stamp is re-read at most every CHECK_INTERVAL seconds.
+CHECK_INTERVAL = 30
+_matcher = {'matcher': None, 'version': None, 'checked': 0}
+_matcher_lock = threading.Lock()
+
+
+def _version_key():
+    return '.'.join([settings.CACHE_PRE_KEY, CACHE_PRE_KEY, 'version'])
+
+
+def bump_robots_version():
+    """
+    Makes every process rebuild its robot matcher.
+    """
+    cache.set(_version_key(), uuid4().hex, None)
+    _matcher['matcher'] = None
+
+
+def get_robot_matcher():
+    from tendenci.apps.robots.models import Robot
+
+    now = time.time()
+    matcher = _matcher['matcher']
+    if matcher is not None and now - _matcher['checked'] < CHECK_INTERVAL:
+        return matcher
+
+    version = cache.get(_version_key())
+    if matcher is None or version != _matcher['version']:
+        with _matcher_lock:
+            matcher = RobotMatcher(Robot.objects.all().order_by('pk'))
+            _matcher['matcher'] = matcher
+            _matcher['version'] = version
+    _matcher['checked'] = now
+    return matcher
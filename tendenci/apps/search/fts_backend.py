@@ -0,0 +1,852 @@
+"""
+A haystack backend that keeps the search index in a local database,
+so that no external search service is needed. It is opt-in:
+
+    HAYSTACK_CONNECTIONS = {
+        'default': {
+            'ENGINE': 'tendenci.apps.search.fts_backend.FullTextSearchEngine',
+            'PATH': os.path.join(PROJECT_ROOT, 'search_index', 'search_index.sqlite3'),
+        }
+    }
+
+The index is stored in a SQLite file using FTS5 (Python's sqlite3 must
+be built with it) or, when the site runs on PostgreSQL, in the site
+database using a tsvector column with a GIN index; those tables are
+created by the search migrations. Ranking, pagination and filtering on
+the indexed fields (status, status_detail, allow_anonymous_view,
+groups_can_view, ...) are done by the database.
+
+After switching to the engine, fill the index with
+
+    python manage.py migrate search
+    python manage.py rebuild_index
+
+Options:
+    PATH - the SQLite file, used when the site database is not
+        PostgreSQL. Its directory must be writable by the site.
+    DATABASE - the database alias checked for PostgreSQL ('default').
+    TEXT_SEARCH_CONFIG - the PostgreSQL text search configuration ('english').
+
+The document field (text) is indexed for full text search but not
+stored, so it is not available on the search results.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections as db_connections, transaction
+from django.utils import six, timezone
+from django.utils.encoding import force_text
+
+from haystack import connections
+from haystack.backends import (BaseEngine, BaseSearchBackend, BaseSearchQuery,
+                               SearchNode, log_query)
+from haystack.constants import DJANGO_CT, DJANGO_ID, ID
+from haystack.exceptions import SkipDocument
+from haystack.inputs import BaseInput, Exact
+from haystack.models import SearchResult
+from haystack.utils import get_identifier, get_model_ct
+
+DOCUMENT_TABLE = 'search_fts_document'
+FIELD_TABLE = 'search_fts_field'
+TEXT_TABLE = 'search_fts_text'
+
+# longest field value kept for filtering and sorting
+VALUE_MAX_LENGTH = 255
+
+# words of a document matched by more_like_this
+MORE_LIKE_THIS_TERMS = 12
+STOP_WORDS = frozenset((
+    'about', 'also', 'been', 'from', 'have', 'into', 'more', 'other',
+    'some', 'than', 'that', 'their', 'them', 'then', 'there', 'these',
+    'they', 'this', 'were', 'what', 'when', 'which', 'will', 'with',
+    'would', 'your',
+))
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+PHRASE_RE = re.compile(r'"([^"]+)"')
+# the field:value and field:"value" terms of a narrow() query
+NARROW_RE = re.compile(r'(\w+):(?:"([^"]*)"|(\S+))', re.UNICODE)
+
+COMPARISONS = {
+    'gt': '>',
+    'gte': '>=',
+    'lt': '<',
+    'lte': '<=',
+}
+
+
+def normalize_value(value):
+    """
+    Returns the (text, number) pair a value is stored and compared as.
+    Text is lowercased, so filters are case insensitive; the number is
+    set for numeric values and is used for range filters and sorting.
+    """
+    if isinstance(value, BaseInput):
+        value = value.query_string
+    if isinstance(value, bool):
+        return (u'1' if value else u'0'), float(value)
+    if isinstance(value, six.integer_types + (float, Decimal)):
+        return force_text(value), float(value)
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value, timezone.utc)
+        return value.replace(microsecond=0).isoformat(), None
+    if isinstance(value, date):
+        return u'%sT00:00:00' % value.isoformat(), None
+
+    text = force_text(value).lower()[:VALUE_MAX_LENGTH]
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    return text, number
+
+
+class TextQuery(object):
+    """
+    A full text query parsed from user input: words (matched as
+    prefixes), "quoted phrases" and -excluded words. With any, a
+    document matches when it has any of the words (more_like_this).
+    """
+    def __init__(self, query_string, exact=False):
+        self.terms = []
+        self.phrases = []
+        self.excluded = []
+        self.any = False
+        query_string = force_text(query_string).lower()
+
+        if exact:
+            words = WORD_RE.findall(query_string)
+            if words:
+                self.phrases.append(words)
+            return
+
+        for phrase in PHRASE_RE.findall(query_string):
+            words = WORD_RE.findall(phrase)
+            if words:
+                self.phrases.append(words)
+
+        for token in PHRASE_RE.sub(' ', query_string).split():
+            words = WORD_RE.findall(token)
+            if token.startswith('-') and len(token) > 1:
+                self.excluded.extend(words)
+            else:
+                self.terms.extend(words)
+
+    @classmethod
+    def any_of(cls, words):
+        query = cls(u'')
+        query.terms = list(words)
+        query.any = True
+        return query
+
+    def has_positive(self):
+        return bool(self.terms or self.phrases)
+
+    def __bool__(self):
+        return bool(self.terms or self.phrases or self.excluded)
+    __nonzero__ = __bool__
+
+
+class SQLiteStore(object):
+    """
+    The index kept in a SQLite file with an FTS5 table for the text.
+    """
+    vendor = 'sqlite'
+
+    def __init__(self, path):
+        if not path:
+            raise ImproperlyConfigured("You must specify a 'PATH' in your settings for the full text search connection.")
+        self.path = path
+        self.local = threading.local()
+
+    def get_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        # connections can not be shared with forked processes
+        if connection is None or self.local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self.local.connection = connection
+            self.local.pid = os.getpid()
+        return connection
+
+    def cursor(self):
+        return StoreCursor(self.get_connection().cursor(), '?')
+
+    @contextmanager
+    def atomic(self):
+        connection = self.get_connection()
+        try:
+            yield
+        except:
+            connection.rollback()
+            raise
+        else:
+            connection.commit()
+
+    def setup(self):
+        cursor = self.cursor()
+        cursor.execute('CREATE TABLE IF NOT EXISTS %s ('
+                       'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                       'doc_id VARCHAR(255) NOT NULL UNIQUE, '
+                       'django_ct VARCHAR(100) NOT NULL, '
+                       'django_id VARCHAR(255) NOT NULL, '
+                       'data TEXT NOT NULL)' % DOCUMENT_TABLE)
+        cursor.execute('CREATE INDEX IF NOT EXISTS %s_ct ON %s (django_ct)' % (
+                       DOCUMENT_TABLE, DOCUMENT_TABLE))
+        cursor.execute('CREATE TABLE IF NOT EXISTS %s ('
+                       'document_id INTEGER NOT NULL, '
+                       'name VARCHAR(100) NOT NULL, '
+                       'value TEXT NOT NULL, '
+                       'num REAL, '
+                       'token SMALLINT NOT NULL DEFAULT 0)' % FIELD_TABLE)
+        cursor.execute('CREATE INDEX IF NOT EXISTS %s_value ON %s (name, value, document_id)' % (
+                       FIELD_TABLE, FIELD_TABLE))
+        cursor.execute('CREATE INDEX IF NOT EXISTS %s_num ON %s (name, num, document_id)' % (
+                       FIELD_TABLE, FIELD_TABLE))
+        cursor.execute('CREATE INDEX IF NOT EXISTS %s_document ON %s (document_id, name)' % (
+                       FIELD_TABLE, FIELD_TABLE))
+        try:
+            cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+                           "text, tokenize='porter unicode61 remove_diacritics 1')" % TEXT_TABLE)
+        except sqlite3.OperationalError as e:
+            raise ImproperlyConfigured("The full text search backend needs SQLite with FTS5 "
+                                       "(SQLite %s): %s" % (sqlite3.sqlite_version, e))
+        self.get_connection().commit()
+
+    def insert_document(self, cursor, doc_id, django_ct, django_id, data):
+        cursor.execute('INSERT INTO %s (doc_id, django_ct, django_id, data) '
+                       'VALUES (%%s, %%s, %%s, %%s)' % DOCUMENT_TABLE,
+                       [doc_id, django_ct, django_id, data])
+        return cursor.lastrowid
+
+    def write_text(self, cursor, document_id, text):
+        cursor.execute('DELETE FROM %s WHERE rowid = %%s' % TEXT_TABLE, [document_id])
+        cursor.execute('INSERT INTO %s (rowid, text) VALUES (%%s, %%s)' % TEXT_TABLE,
+                       [document_id, text])
+
+    def delete_text(self, cursor, where, params):
+        cursor.execute('DELETE FROM %s WHERE rowid IN (SELECT id FROM %s WHERE %s)' % (
+                       TEXT_TABLE, DOCUMENT_TABLE, where), params)
+
+    def match_expression(self, query, terms, phrases):
+        bits = [u'"%s"*' % term for term in terms]
+        bits += [u'"%s"' % u' '.join(words) for words in phrases]
+        return bits
+
+    def positive_expression(self, query):
+        connector = u' OR ' if query.any else u' AND '
+        return connector.join(self.match_expression(query, query.terms, query.phrases))
+
+    def text_condition(self, query):
+        """
+        FTS5 has no unary NOT, so excluded words are subtracted
+        with a second match when there are no positive words.
+        """
+        positive = self.positive_expression(query)
+        excluded = u' OR '.join(self.match_expression(query, query.excluded, []))
+        match_sql = 'd.id %%s (SELECT rowid FROM %s WHERE %s MATCH %%%%s)' % (
+                    TEXT_TABLE, TEXT_TABLE)
+        if positive and excluded:
+            return match_sql % 'IN', [u'(%s) NOT (%s)' % (positive, excluded)]
+        if positive:
+            return match_sql % 'IN', [positive]
+        return match_sql % 'NOT IN', [excluded]
+
+    def rank(self, query):
+        """
+        Returns the join, score and ordering, each with its params,
+        used to rank the documents matching query.
+        """
+        positive = self.positive_expression(query)
+        join = ('LEFT JOIN (SELECT rowid AS document_id, bm25(%s) AS rank FROM %s '
+                'WHERE %s MATCH %%s) r ON r.document_id = d.id' % (
+                TEXT_TABLE, TEXT_TABLE, TEXT_TABLE))
+        # bm25 is lower for better matches
+        return {
+            'join': (join, [positive]),
+            'score': ('-r.rank', []),
+            'order': ('r.rank IS NULL, r.rank', []),
+        }
+
+    def limit(self, start_offset, end_offset):
+        if end_offset is None:
+            return 'LIMIT -1 OFFSET %d' % start_offset
+        return 'LIMIT %d OFFSET %d' % (max(end_offset - start_offset, 0), start_offset)
+
+
+class PostgresStore(object):
+    """
+    The index kept in the PostgreSQL database of the site,
+    with a tsvector column and a GIN index for the text.
+    """
+    vendor = 'postgresql'
+
+    def __init__(self, alias, config):
+        self.alias = alias
+        self.config = config
+
+    def cursor(self):
+        return StoreCursor(db_connections[self.alias].cursor(), '%s')
+
+    def atomic(self):
+        return transaction.atomic(using=self.alias)
+
+    def setup(self):
+        # the tables are created by the search migrations
+        connection = db_connections[self.alias]
+        with connection.cursor() as cursor:
+            if DOCUMENT_TABLE not in connection.introspection.table_names(cursor):
+                raise ImproperlyConfigured("The full text search tables are missing, "
+                                           "run: python manage.py migrate search")
+
+    def insert_document(self, cursor, doc_id, django_ct, django_id, data):
+        cursor.execute('INSERT INTO %s (doc_id, django_ct, django_id, data) '
+                       'VALUES (%%s, %%s, %%s, %%s) RETURNING id' % DOCUMENT_TABLE,
+                       [doc_id, django_ct, django_id, data])
+        return cursor.fetchone()[0]
+
+    def write_text(self, cursor, document_id, text):
+        cursor.execute('UPDATE %s SET vector = to_tsvector(%%s::regconfig, %%s) '
+                       'WHERE id = %%s' % DOCUMENT_TABLE,
+                       [self.config, text, document_id])
+
+    def delete_text(self, cursor, where, params):
+        # the vector is removed along with the document row
+        pass
+
+    def tsquery(self, terms, phrases, excluded, any=False):
+        bits = [u'%s:*' % term for term in terms]
+        bits += [u'(%s)' % u' & '.join(words) for words in phrases]
+        positive = (u' | ' if any else u' & ').join(bits)
+        if positive and excluded:
+            positive = u'(%s)' % positive
+        return u' & '.join([b for b in [positive] if b] + [u'!%s' % term for term in excluded])
+
+    def text_condition(self, query):
+        return ('d.vector @@ to_tsquery(%s::regconfig, %s)',
+                [self.config, self.tsquery(query.terms, query.phrases, query.excluded, query.any)])
+
+    def rank(self, query):
+        params = [self.config, self.tsquery(query.terms, query.phrases, [], query.any)]
+        score = 'ts_rank(d.vector, to_tsquery(%s::regconfig, %s))'
+        return {
+            'join': ('', []),
+            'score': (score, params),
+            'order': ('%s DESC' % score, params),
+        }
+
+    def limit(self, start_offset, end_offset):
+        if end_offset is None:
+            return 'OFFSET %d' % start_offset
+        return 'LIMIT %d OFFSET %d' % (max(end_offset - start_offset, 0), start_offset)
+
+
+class StoreCursor(object):
+    """
+    Wraps a DB-API cursor so that SQL is always written with %s
+    placeholders, whatever the paramstyle of the driver.
+    """
+    def __init__(self, cursor, placeholder):
+        self.cursor = cursor
+        self.placeholder = placeholder
+
+    def convert(self, sql):
+        if self.placeholder == '%s':
+            return sql
+        return sql.replace('%s', self.placeholder)
+
+    def execute(self, sql, params=()):
+        return self.cursor.execute(self.convert(sql), list(params))
+
+    def executemany(self, sql, param_list):
+        return self.cursor.executemany(self.convert(sql), param_list)
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    @property
+    def lastrowid(self):
+        return self.cursor.lastrowid
+
+
+class FullTextSearchBackend(BaseSearchBackend):
+    def __init__(self, connection_alias, **connection_options):
+        super(FullTextSearchBackend, self).__init__(connection_alias, **connection_options)
+        self.setup_complete = False
+        self.log = logging.getLogger('haystack')
+
+        database = connection_options.get('DATABASE', 'default')
+        if db_connections[database].vendor == 'postgresql':
+            self.store = PostgresStore(database,
+                                       connection_options.get('TEXT_SEARCH_CONFIG', 'english'))
+        else:
+            self.store = SQLiteStore(connection_options.get('PATH'))
+
+    def setup(self):
+        self.store.setup()
+        self.setup_complete = True
+
+    def get_search_fields(self):
+        return connections[self.connection_alias].get_unified_index().all_searchfields()
+
+    def get_document_field(self):
+        return connections[self.connection_alias].get_unified_index().document_field
+
+    def update(self, index, iterable, commit=True):
+        if not self.setup_complete:
+            self.setup()
+
+        fields = index.fields
+        document_field = self.get_document_field()
+
+        try:
+            with self.store.atomic():
+                cursor = self.store.cursor()
+                for obj in iterable:
+                    try:
+                        doc = index.full_prepare(obj)
+                    except SkipDocument:
+                        self.log.debug(u"Indexing for object `%s` skipped", obj)
+                        continue
+                    self.write_document(cursor, doc, fields, document_field)
+        except Exception as e:
+            if not self.silently_fail:
+                raise
+            self.log.error(u"%s while updating the full text search index" % e.__class__.__name__,
+                           exc_info=True, extra={"data": {"index": index}})
+
+    def write_document(self, cursor, doc, fields, document_field):
+        """
+        Replaces the stored document, its field values and its text.
+        """
+        doc_id = doc[ID]
+        text = doc.pop(document_field, u'') or u''
+        data = {}
+        rows = []
+
+        for name, value in doc.items():
+            if name in (ID, DJANGO_CT, DJANGO_ID, 'boost') or value is None:
+                continue
+            field = fields.get(name)
+            if field is None:
+                continue
+            if field.stored:
+                data[name] = value
+            if field.indexed:
+                rows.extend(self.field_rows(name, value))
+
+        cursor.execute('SELECT id FROM %s WHERE doc_id = %%s' % DOCUMENT_TABLE, [doc_id])
+        row = cursor.fetchone()
+        data = json.dumps(data, cls=DjangoJSONEncoder)
+        if row:
+            document_id = row[0]
+            cursor.execute('UPDATE %s SET data = %%s WHERE id = %%s' % DOCUMENT_TABLE,
+                           [data, document_id])
+            cursor.execute('DELETE FROM %s WHERE document_id = %%s' % FIELD_TABLE,
+                           [document_id])
+        else:
+            document_id = self.store.insert_document(cursor, doc_id, doc[DJANGO_CT],
+                                                     force_text(doc[DJANGO_ID]), data)
+
+        if rows:
+            cursor.executemany('INSERT INTO %s (document_id, name, value, num, token) '
+                               'VALUES (%%s, %%s, %%s, %%s, %%s)' % FIELD_TABLE,
+                               [(document_id,) + row for row in rows])
+        self.store.write_text(cursor, document_id, force_text(text))
+
+    def field_rows(self, name, value):
+        """
+        Returns the (name, value, num, token) rows of a field. Besides
+        the whole value, the words of text values are stored as tokens
+        so that the default (contains) filter matches single words.
+        """
+        if not isinstance(value, (list, tuple, set)):
+            value = [value]
+        rows = []
+        for item in value:
+            if item is None:
+                continue
+            text, number = normalize_value(item)
+            rows.append((name, text, number, 0))
+            if number is None and isinstance(item, six.string_types):
+                words = set(WORD_RE.findall(text))
+                words.discard(text)
+                rows.extend((name, word, None, 1) for word in words)
+        return rows
+
+    def remove(self, obj_or_string, commit=True):
+        if not self.setup_complete:
+            self.setup()
+
+        self.delete_documents('doc_id = %s', [get_identifier(obj_or_string)])
+
+    def clear(self, models=None, commit=True):
+        if not self.setup_complete:
+            self.setup()
+
+        if models is None:
+            self.delete_documents('1 = 1', [])
+        else:
+            assert isinstance(models, (list, tuple))
+            model_cts = [get_model_ct(model) for model in models]
+            if model_cts:
+                self.delete_documents('django_ct IN (%s)' % ', '.join(['%s'] * len(model_cts)),
+                                      model_cts)
+
+    def delete_documents(self, where, params):
+        try:
+            with self.store.atomic():
+                cursor = self.store.cursor()
+                self.store.delete_text(cursor, where, params)
+                cursor.execute('DELETE FROM %s WHERE document_id IN (SELECT id FROM %s WHERE %s)' % (
+                               FIELD_TABLE, DOCUMENT_TABLE, where), params)
+                cursor.execute('DELETE FROM %s WHERE %s' % (DOCUMENT_TABLE, where), params)
+        except Exception as e:
+            if not self.silently_fail:
+                raise
+            self.log.error(u"Failed to remove documents from the full text search index: %s", e,
+                           exc_info=True)
+
+    @log_query
+    def search(self, query_string, query_filter=None, sort_by=None, start_offset=0,
+               end_offset=None, models=None, limit_to_registered_models=None,
+               result_class=None, **kwargs):
+        if not self.setup_complete:
+            self.setup()
+
+        conditions, params = self.model_conditions(models, limit_to_registered_models)
+
+        compiler = QueryCompiler(self.store, self.get_search_fields(), self.get_document_field())
+        if query_filter is not None:
+            sql, sql_params = compiler.compile_node(query_filter)
+        elif query_string and query_string != u'*':
+            sql, sql_params = compiler.compile_text(TextQuery(query_string))
+        else:
+            sql, sql_params = '', []
+        if sql:
+            conditions.append(sql)
+            params.extend(sql_params)
+
+        for narrow_query in sorted(kwargs.get('narrow_queries') or ()):
+            sql, sql_params = compiler.compile_narrow(narrow_query)
+            if sql:
+                conditions.append(sql)
+                params.extend(sql_params)
+
+        return self.run_search(conditions, params, compiler, sort_by, start_offset,
+                               end_offset, result_class)
+
+    def model_conditions(self, models, limit_to_registered_models):
+        if models:
+            model_cts = sorted(get_model_ct(model) for model in models)
+        else:
+            if limit_to_registered_models is None:
+                limit_to_registered_models = getattr(settings, 'HAYSTACK_LIMIT_TO_REGISTERED_MODELS', True)
+            model_cts = self.build_models_list() if limit_to_registered_models else []
+        if not model_cts:
+            return [], []
+        return ['d.django_ct IN (%s)' % ', '.join(['%s'] * len(model_cts))], model_cts
+
+    def run_search(self, conditions, params, compiler, sort_by, start_offset,
+                   end_offset, result_class):
+        where = ' AND '.join(conditions) or '1 = 1'
+        cursor = self.store.cursor()
+        cursor.execute('SELECT COUNT(*) FROM %s d WHERE %s' % (DOCUMENT_TABLE, where), params)
+        hits = cursor.fetchone()[0]
+
+        if not hits or (end_offset is not None and end_offset <= start_offset):
+            return {'results': [], 'hits': hits}
+
+        rank = {'join': ('', []), 'score': ('0', []), 'order': ('', [])}
+        if compiler.rank_query is not None:
+            rank = self.store.rank(compiler.rank_query)
+
+        join, join_params = rank['join']
+        score, score_params = rank['score']
+        order_by, order_params = compiler.compile_order(sort_by or [], rank['order'])
+        sql = 'SELECT d.django_ct, d.django_id, d.data, %s FROM %s d %s WHERE %s ORDER BY %s %s' % (
+              score, DOCUMENT_TABLE, join, where, order_by,
+              self.store.limit(start_offset, end_offset))
+        cursor.execute(sql, score_params + join_params + params + order_params)
+
+        return {
+            'results': self.build_results(cursor.fetchall(), result_class or SearchResult),
+            'hits': hits,
+        }
+
+    def build_results(self, rows, result_class):
+        unified_index = connections[self.connection_alias].get_unified_index()
+        results = []
+        for django_ct, django_id, data, score in rows:
+            app_label, model_name = django_ct.split('.')
+            stored = {}
+            for name, value in json.loads(data).items():
+                field = unified_index.fields.get(name)
+                if field is not None:
+                    try:
+                        value = field.convert(value)
+                    except (TypeError, ValueError):
+                        pass
+                stored[str(name)] = value
+            results.append(result_class(app_label, model_name, django_id,
+                                        score or 0, **stored))
+        return results
+
+    def prep_value(self, value):
+        return value
+
+    @log_query
+    def more_like_this(self, model_instance, additional_query_string=None,
+                       start_offset=0, end_offset=None, models=None,
+                       limit_to_registered_models=None, result_class=None, **kwargs):
+        """
+        Ranks the documents having any of the most frequent words of
+        the instance's document, leaving the instance out.
+        """
+        if not self.setup_complete:
+            self.setup()
+
+        unified_index = connections[self.connection_alias].get_unified_index()
+        index = unified_index.get_index(model_instance._meta.concrete_model)
+        try:
+            text = index.full_prepare(model_instance).get(self.get_document_field()) or u''
+        except SkipDocument:
+            text = u''
+        words = significant_words(text)
+        if not words:
+            return {'results': [], 'hits': 0}
+
+        conditions, params = self.model_conditions(models, limit_to_registered_models)
+        conditions.append('d.doc_id <> %s')
+        params.append(get_identifier(model_instance))
+
+        compiler = QueryCompiler(self.store, self.get_search_fields(), self.get_document_field())
+        for query in (TextQuery.any_of(words), TextQuery(additional_query_string or u'')):
+            sql, sql_params = compiler.compile_text(query)
+            if sql:
+                conditions.append(sql)
+                params.extend(sql_params)
+
+        return self.run_search(conditions, params, compiler, None, start_offset,
+                               end_offset, result_class)
+
+
+def significant_words(text, count=MORE_LIKE_THIS_TERMS):
+    """
+    The most frequent words of a text, leaving out the short ones,
+    numbers and stop words.
+    """
+    frequencies = {}
+    for word in WORD_RE.findall(force_text(text).lower()):
+        if len(word) < 4 or word.isdigit() or word in STOP_WORDS:
+            continue
+        frequencies[word] = frequencies.get(word, 0) + 1
+    ranked = sorted(frequencies.items(), key=lambda item: (-item[1], item[0]))
+    return [word for word, frequency in ranked[:count]]
+
+
+class QueryCompiler(object):
+    """
+    Compiles a haystack SearchNode into a SQL condition on the
+    documents table (aliased as d).
+    """
+    def __init__(self, store, fields, document_field):
+        self.store = store
+        self.fields = fields
+        self.document_field = document_field
+        # the first full text query that is not negated ranks the results
+        self.rank_query = None
+
+    def compile_node(self, node, negated=False):
+        parts = []
+        params = []
+        negated = negated != bool(node.negated)
+
+        for child in node.children:
+            if isinstance(child, SearchNode):
+                sql, sql_params = self.compile_node(child, negated)
+            else:
+                expression, value = child
+                field, filter_type = node.split_expression(expression)
+                sql, sql_params = self.compile_filter(field, filter_type, value, negated)
+            if sql:
+                parts.append(sql)
+                params.extend(sql_params)
+
+        if not parts:
+            return '', []
+        sql = '(%s)' % (' %s ' % node.connector).join(parts)
+        if node.negated:
+            sql = 'NOT %s' % sql
+        return sql, params
+
+    def compile_text(self, query, negated=False):
+        if not query:
+            return '', []
+        if not negated and query.has_positive() and self.rank_query is None:
+            self.rank_query = query
+        return self.store.text_condition(query)
+
+    def compile_narrow(self, query_string):
+        """
+        Compiles a narrow() query: its field:value terms match the
+        field exactly and the rest of it is matched as text.
+        """
+        parts = []
+        params = []
+        for field, quoted, bare in NARROW_RE.findall(query_string):
+            sql, sql_params = self.compile_filter(field, 'exact', quoted or bare)
+            parts.append(sql)
+            params.extend(sql_params)
+        sql, sql_params = self.compile_text(TextQuery(NARROW_RE.sub(u' ', query_string)))
+        if sql:
+            parts.append(sql)
+            params.extend(sql_params)
+        if not parts:
+            return '', []
+        return '(%s)' % ' AND '.join(parts), params
+
+    def compile_filter(self, field, filter_type, value, negated=False):
+        if field in ('content', self.document_field):
+            if isinstance(value, (list, tuple)):
+                value = u' '.join(force_text(v) for v in value)
+            query_string = getattr(value, 'query_string', value)
+            return self.compile_text(TextQuery(query_string, exact=isinstance(value, Exact)),
+                                     negated)
+
+        if field in (ID, DJANGO_CT, DJANGO_ID):
+            column = {ID: 'd.doc_id', DJANGO_CT: 'd.django_ct', DJANGO_ID: 'd.django_id'}[field]
+            values = value if filter_type == 'in' else [value]
+            values = [force_text(getattr(v, 'query_string', v)) for v in values]
+            if not values:
+                return '1 = 0', []
+            return '%s IN (%s)' % (column, ', '.join(['%s'] * len(values))), values
+
+        if filter_type == 'in':
+            texts = [normalize_value(v)[0] for v in value]
+            if not texts:
+                return '1 = 0', []
+            return self.field_condition(field, 'f.value IN (%s)' % ', '.join(['%s'] * len(texts)),
+                                        texts)
+
+        if filter_type == 'range':
+            start, end = value
+            return self.compare(field, '>=', start, 'AND', '<=', end)
+
+        if filter_type in COMPARISONS:
+            return self.compare(field, COMPARISONS[filter_type], value)
+
+        text, number = normalize_value(value)
+
+        if filter_type == 'startswith':
+            pattern = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            return self.field_condition(field, "f.value LIKE %s ESCAPE '\\'", [pattern])
+
+        if filter_type == 'exact' or isinstance(value, Exact):
+            return self.field_condition(field, 'f.value = %s AND f.token = 0', [text])
+
+        # contains (the default) and fuzzy match the whole value or,
+        # for text, every word of the value
+        words = WORD_RE.findall(text) if number is None else []
+        if len(words) <= 1:
+            return self.field_condition(field, 'f.value = %s', [text])
+        sql, params = self.field_condition(field, 'f.value = %s AND f.token = 0', [text])
+        word_parts = [self.field_condition(field, 'f.value = %s', [word]) for word in words]
+        return ('(%s OR (%s))' % (sql, ' AND '.join(part[0] for part in word_parts)),
+                params + [p for part in word_parts for p in part[1]])
+
+    def compare(self, field, operator, value, connector=None, operator2=None, value2=None):
+        text, number = normalize_value(value)
+        column, param = ('f.num', number) if number is not None else ('f.value', text)
+        condition = '%s %s %%s AND f.token = 0' % (column, operator)
+        params = [param]
+        if connector:
+            text2, number2 = normalize_value(value2)
+            condition += ' %s %s %s %%s' % (connector, column, operator2)
+            params.append(number2 if column == 'f.num' else text2)
+        return self.field_condition(field, condition, params)
+
+    def field_condition(self, field, condition, params):
+        return ('d.id IN (SELECT f.document_id FROM %s f WHERE f.name = %%s AND %s)' % (
+                FIELD_TABLE, condition), [field] + list(params))
+
+    def compile_order(self, sort_by, rank_order):
+        """
+        Returns the ORDER BY clause and its params. Results are ordered
+        by rank when nothing else is asked for.
+        """
+        parts = []
+        params = []
+        for sort_field in sort_by:
+            descending = sort_field.startswith('-')
+            name = sort_field.lstrip('-')
+            direction = 'DESC' if descending else 'ASC'
+
+            if name == 'score':
+                if rank_order[0]:
+                    parts.append(rank_order[0])
+                    params.extend(rank_order[1])
+                continue
+            if name in (ID, DJANGO_CT, DJANGO_ID):
+                column = {ID: 'd.doc_id', DJANGO_CT: 'd.django_ct', DJANGO_ID: 'd.django_id'}[name]
+                parts.append('%s %s' % (column, direction))
+                continue
+
+            field = self.fields.get(name)
+            field_type = getattr(field, 'field_type', 'string')
+            column = 'num' if field_type in ('integer', 'float', 'boolean') else 'value'
+            function = 'MAX' if descending else 'MIN'
+            parts.append('(SELECT %s(f.%s) FROM %s f WHERE f.document_id = d.id '
+                         'AND f.name = %%s AND f.token = 0) %s' % (
+                         function, column, FIELD_TABLE, direction))
+            params.append(name)
+
+        if not parts and rank_order[0]:
+            parts.append(rank_order[0])
+            params.extend(rank_order[1])
+        parts.append('d.id')
+        return ', '.join(parts), params
+
+
+class FullTextSearchQuery(BaseSearchQuery):
+    """
+    The query tree is compiled into SQL by the backend, which receives
+    it with the search params; build_query only renders it for display.
+    """
+    def build_params(self, spelling_query=None):
+        kwargs = super(FullTextSearchQuery, self).build_params(spelling_query=spelling_query)
+        kwargs['query_filter'] = self.query_filter
+        return kwargs
+
+    def build_query_fragment(self, field, filter_type, value):
+        if not hasattr(value, 'input_type_name'):
+            value = force_text(value)
+        else:
+            value = force_text(value.query_string)
+        return u'%s__%s=%s' % (field, filter_type, value)
+
+    def clean(self, query_fragment):
+        # user input is parsed by the backend, nothing needs escaping
+        return query_fragment
+
+
+class FullTextSearchEngine(BaseEngine):
+    backend = FullTextSearchBackend
+    query = FullTextSearchQuery
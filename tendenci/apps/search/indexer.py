@@ -0,0 +1,149 @@
+import datetime
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from haystack import connection_router, connections
+from haystack.exceptions import NotHandled
+from haystack.utils import get_model_ct
+
+from tendenci.apps.search.models import UnindexedItem
+
+logger = logging.getLogger(__name__)
+
+# claims older than this are considered abandoned by a dead indexer
+CLAIM_TIMEOUT = getattr(settings, 'SEARCH_INDEXER_CLAIM_TIMEOUT', 60 * 60)
+
+
+class IndexerStats(object):
+    def __init__(self):
+        self.updated = 0
+        self.removed = 0
+        self.failed = 0
+
+    def __str__(self):
+        return 'updated: %d, removed: %d, failed: %d' % (
+                self.updated, self.removed, self.failed)
+
+
+def claim_items(batch_size):
+    """
+    Claims up to batch_size of the oldest unclaimed (or abandoned)
+    queued items, by setting their claimed_dt.
+
+    The rows stay on the queue until their objects are indexed (see
+    release_items), so a crash or a backend error loses nothing; a claim
+    older than CLAIM_TIMEOUT is taken over by the next run. An object
+    saved again while it is being indexed is queued again, as the save
+    only looks for unclaimed items.
+    """
+    now = datetime.datetime.now()
+    unclaimed = UnindexedItem.objects.filter(
+                    Q(claimed_dt=None) |
+                    Q(claimed_dt__lt=now - datetime.timedelta(seconds=CLAIM_TIMEOUT)))
+    item_ids = list(unclaimed.order_by('pk').values_list('pk', flat=True)[:batch_size])
+    if not item_ids:
+        return []
+    unclaimed.filter(pk__in=item_ids).update(claimed_dt=now)
+    return list(UnindexedItem.objects.filter(pk__in=item_ids, claimed_dt=now).order_by('pk').values_list(
+                'pk', 'content_type_id', 'object_id'))
+
+
+def release_items(item_ids):
+    UnindexedItem.objects.filter(pk__in=item_ids).delete()
+
+
+def requeue(content_type_id, object_ids, item_ids):
+    """
+    Moves the items of objects that failed to index to the end of the
+    queue, so they don't hold up the items queued after them.
+    """
+    with transaction.atomic():
+        UnindexedItem.objects.bulk_create([
+            UnindexedItem(content_type_id=content_type_id, object_id=object_id)
+            for object_id in object_ids])
+        release_items(item_ids)
+
+
+def index_objects(model, object_ids, stats):
+    """
+    Updates the search indexes for the objects of model with the given
+    ids. Objects that are gone, or no longer in the index queryset
+    (soft deleted), are removed from the indexes.
+    """
+    for using in connection_router.for_write():
+        try:
+            index = connections[using].get_unified_index().get_index(model)
+        except NotHandled:
+            continue
+        backend = connections[using].get_backend()
+
+        objects = list(index.index_queryset(using=using).filter(pk__in=object_ids))
+        found_ids = set(obj.pk for obj in objects)
+        objects = [obj for obj in objects if index.should_update(obj)]
+        if objects:
+            backend.update(index, objects)
+            stats.updated += len(objects)
+
+        for object_id in set(object_ids) - found_ids:
+            backend.remove('%s.%s' % (get_model_ct(model), object_id))
+            stats.removed += 1
+
+
+def process_batch(batch_size, stats):
+    """
+    Indexes one batch of queued items, grouped by content type.
+    Returns the number of items read from the queue and the number
+    of those that failed and were queued again.
+    """
+    items = claim_items(batch_size)
+
+    failed = 0
+    object_ids = {}
+    item_ids = {}
+    for pk, content_type_id, object_id in items:
+        object_ids.setdefault(content_type_id, set()).add(object_id)
+        item_ids.setdefault(content_type_id, []).append(pk)
+
+    for content_type_id, ids in object_ids.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            release_items(item_ids[content_type_id])
+            continue
+        try:
+            index_objects(model, list(ids), stats)
+        except Exception:
+            logger.exception('Failed to index %s objects %s', get_model_ct(model), sorted(ids))
+            failed += len(ids)
+            requeue(content_type_id, ids, item_ids[content_type_id])
+        else:
+            release_items(item_ids[content_type_id])
+
+    stats.failed += failed
+    return len(items), failed
+
+
+def process_unindexed(batch_size=100, loop=False, interval=5, max_batches=None):
+    """
+    Indexes the queued items in batches until the queue is empty or,
+    when loop is set, keeps polling the queue every interval seconds.
+    """
+    stats = IndexerStats()
+    batches = 0
+    while True:
+        close_old_connections()
+        claimed, failed = process_batch(batch_size, stats)
+        batches += 1
+        if max_batches and batches >= max_batches:
+            break
+        # wait for new items once the queue is drained, or when
+        # everything taken off it had to be queued again
+        if claimed < batch_size or failed == claimed:
+            if not loop:
+                break
+            time.sleep(interval)
+    return stats
@@ -0,0 +1,136 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Compares search times of haystack's SimpleEngine against the full
+    text search backend on a seeded corpus of articles. The articles
+    are created in a transaction that is rolled back, and the full text
+    index is built in a temporary file (or, on PostgreSQL, in tables
+    created within the same transaction).
+
+    Usage: python manage.py benchmark_search --count=100000
+    """
+    help = 'Benchmark SimpleEngine against the full text search backend'
+
+    words = ('annual', 'meeting', 'board', 'member', 'event', 'conference',
+             'budget', 'report', 'chapter', 'award', 'volunteer', 'training',
+             'policy', 'election', 'newsletter', 'sponsor', 'workshop',
+             'committee', 'survey', 'renewal', 'directory', 'donation',
+             'summit', 'webinar', 'certification', 'partner', 'journal')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count',
+                            dest='count',
+                            type=int,
+                            default=100000,
+            help='Number of articles to seed')
+        parser.add_argument('--queries',
+                            dest='queries',
+                            default='budget,annual meeting,"board election",volunt,policy -draft',
+            help='Comma separated search queries')
+        parser.add_argument('--repeat',
+                            dest='repeat',
+                            type=int,
+                            default=3,
+            help='Number of runs of each query')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        queries = [q.strip() for q in options['queries'].split(',') if q.strip()]
+        path = tempfile.mkdtemp()
+
+        try:
+            with transaction.atomic():
+                self.seed(count)
+                self.build_index(os.path.join(path, 'benchmark.sqlite3'))
+                for query in queries:
+                    self.compare(query, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def seed(self, count):
+        from tendenci.apps.articles.models import Article
+
+        start = time.time()
+        batch = []
+        random.seed(count)
+        for i in xrange(count):
+            headline = ' '.join(random.sample(self.words, 4))
+            body = ' '.join(random.choice(self.words) for n in xrange(60))
+            batch.append(Article(guid=str(uuid.uuid1()),
+                                 slug='benchmark-search-%d' % i,
+                                 timezone=settings.TIME_ZONE,
+                                 headline=headline,
+                                 body=body,
+                                 group=None,
+                                 allow_anonymous_view=bool(i % 3),
+                                 status_detail='active' if i % 10 else 'pending'))
+            if len(batch) == 1000:
+                Article.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Article.objects.bulk_create(batch)
+        self.stdout.write('seeded %d articles in %.1fs' % (count, time.time() - start))
+
+    def build_index(self, path):
+        from haystack import connections
+        from tendenci.apps.articles.models import Article
+        from tendenci.apps.search.fts_backend import FullTextSearchBackend
+
+        self.backend = FullTextSearchBackend('default', PATH=path, SILENTLY_FAIL=False)
+        index = connections['default'].get_unified_index().get_index(Article)
+        articles = Article.objects.filter(slug__startswith='benchmark-search-').order_by('pk')
+
+        start = time.time()
+        chunk_size = 1000
+        total = articles.count()
+        for offset in xrange(0, total, chunk_size):
+            self.backend.update(index, articles[offset:offset + chunk_size])
+        self.stdout.write('indexed %d articles in %.1fs' % (total, time.time() - start))
+
+    def compare(self, query, repeat):
+        from haystack.backends import SQ
+        from haystack.backends.simple_backend import SimpleSearchBackend
+        from haystack.inputs import AutoQuery
+        from tendenci.apps.articles.models import Article
+
+        simple = SimpleSearchBackend('default')
+        query_filter = (SQ(content=AutoQuery(query)) & SQ(status=True) &
+                        SQ(status_detail='active') & SQ(allow_anonymous_view=True))
+
+        self.stdout.write('\nquery: %s' % query)
+        self.report('SimpleEngine', repeat, lambda: simple.search(
+                    query, models=[Article]))
+        self.report('full text, first page', repeat, lambda: self.backend.search(
+                    query, query_filter=query_filter, models=[Article],
+                    start_offset=0, end_offset=10))
+        self.report('full text, page 50', repeat, lambda: self.backend.search(
+                    query, query_filter=query_filter, models=[Article],
+                    start_offset=490, end_offset=500))
+
+    def report(self, label, repeat, func):
+        timings = []
+        for i in xrange(repeat):
+            start = time.time()
+            results = func()
+            timings.append(time.time() - start)
+        self.stdout.write('  %-24s %8d hits  best %8.3fs  avg %8.3fs' % (
+                          label, results['hits'], min(timings),
+                          sum(timings) / len(timings)))
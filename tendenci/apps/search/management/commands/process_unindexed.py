@@ -1,45 +1,48 @@
 #process_unindexed.py
-from datetime import datetime
-
 from django.core.management.base import BaseCommand
-from django.core.management import call_command
-
-
 
 
 class Command(BaseCommand):
     """
-    Command used to process unindexed items by querying per Model
-    and running update_index based on a calculated age
-    for models with unindexed items.
-    """
+    Indexes the objects queued in UnindexedItem, in batches, by their
+    exact content type and object id. Objects that were deleted, or
+    are no longer in their index queryset, are removed from the index.
+    Only the queued items that were processed are removed from the queue.
+
+    Without --loop the command exits once the queue is empty; with
+    --loop it keeps running and polls the queue every --interval seconds.
 
-    def handle(self, **options):
-        from tendenci.apps.search.models import UnindexedItem
-        items = []
-        ages = []
-
-        unindexed_items = UnindexedItem.objects.all().select_related('content_type__app_label').order_by('create_dt')
-        for ui in unindexed_items:
-            app = ui.content_type.app_label
-            if app not in items:
-                items.append(app)
-
-                age = datetime.now() - unindexed_items[0].create_dt
-                age = (int(age.days)*60*60*24) + age.seconds
-                age = (age / 3600) + 1
-                ages.append(int(age))
-
-        # If we have items, then we find the max age and run a single
-        # update_index command for those apps with the longest age.
-        if items and ages:
-            ages.sort()
-            ages.reverse()
-            max_age = ages[0]
-            # Remove is required because soft-deletes cannot be updated
-            # in the index as the index cannot query for them to update
-            # them.
-            params = {'age': max_age, 'batch-size': 25, 'remove': True}
-
-            call_command('update_index', *items, **params)
-            unindexed_items.delete()
+    Usage: python manage.py process_unindexed --loop --interval=5
+    """
+    help = 'Index the objects queued in UnindexedItem'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size',
+                            dest='batch_size',
+                            type=int,
+                            default=100,
+            help='Number of queued items indexed per batch')
+        parser.add_argument('--loop',
+                            action='store_true',
+                            dest='loop',
+                            default=False,
+            help='Keep running and poll the queue for new items')
+        parser.add_argument('--interval',
+                            dest='interval',
+                            type=float,
+                            default=5,
+            help='Seconds to wait between polls when the queue is empty')
+
+    def handle(self, *args, **options):
+        from tendenci.apps.search.indexer import process_unindexed
+
+        verbosity = int(options['verbosity'])
+        try:
+            stats = process_unindexed(batch_size=options['batch_size'],
+                                      loop=options['loop'],
+                                      interval=options['interval'])
+        except KeyboardInterrupt:
+            return
+
+        if verbosity > 1:
+            self.stdout.write(str(stats))
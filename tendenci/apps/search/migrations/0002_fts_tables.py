@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def create_fts_tables(apps, schema_editor):
+    """
+        Tables of the full text search engine (search.fts_backend),
+        which keeps its index in the site database on PostgreSQL.
+        Elsewhere it uses a SQLite file, created by the engine.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    cursor = connection.cursor()
+    if 'search_fts_document' in connection.introspection.table_names(cursor):
+        return
+    cursor.execute('CREATE TABLE search_fts_document ('
+                   'id SERIAL PRIMARY KEY, '
+                   'doc_id VARCHAR(255) NOT NULL UNIQUE, '
+                   'django_ct VARCHAR(100) NOT NULL, '
+                   'django_id VARCHAR(255) NOT NULL, '
+                   'data TEXT NOT NULL, '
+                   'vector TSVECTOR)')
+    cursor.execute('CREATE INDEX search_fts_document_ct ON search_fts_document (django_ct)')
+    cursor.execute('CREATE INDEX search_fts_document_vector ON search_fts_document USING GIN (vector)')
+    cursor.execute('CREATE TABLE search_fts_field ('
+                   'document_id INTEGER NOT NULL, '
+                   'name VARCHAR(100) NOT NULL, '
+                   'value TEXT NOT NULL, '
+                   'num DOUBLE PRECISION, '
+                   'token SMALLINT NOT NULL DEFAULT 0)')
+    cursor.execute('CREATE INDEX search_fts_field_value ON search_fts_field (name, value, document_id)')
+    cursor.execute('CREATE INDEX search_fts_field_num ON search_fts_field (name, num, document_id)')
+    cursor.execute('CREATE INDEX search_fts_field_document ON search_fts_field (document_id, name)')
+
+
+def drop_fts_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    cursor = schema_editor.connection.cursor()
+    cursor.execute('DROP TABLE IF EXISTS search_fts_field')
+    cursor.execute('DROP TABLE IF EXISTS search_fts_document')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_tables, drop_fts_tables),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_fts_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='unindexeditem',
+            name='claimed_dt',
+            field=models.DateTimeField(null=True, blank=True),
+        ),
+    ]
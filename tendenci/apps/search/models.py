@@ -6,6 +6,8 @@ class UnindexedItem(models.Model):
     content_type = models.ForeignKey(ContentType, db_index=True)
     object_id = models.PositiveIntegerField()
     create_dt = models.DateTimeField(auto_now_add=True)
+    # set while the object is being indexed by process_unindexed
+    claimed_dt = models.DateTimeField(null=True, blank=True)
 
     object = GenericForeignKey('content_type', 'object_id')
 
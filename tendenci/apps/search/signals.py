@@ -17,7 +17,8 @@ def save_unindexed_item(sender, **kwargs):
         'object_id': instance.pk
     }
 
-    if not UnindexedItem.objects.filter(**params).exists():
+    # an item claimed by the indexer may have been read already
+    if not UnindexedItem.objects.filter(claimed_dt=None, **params).exists():
         UnindexedItem.objects.create(**params)
         
         
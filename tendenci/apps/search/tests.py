@@ -0,0 +1,224 @@
+import datetime
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import TestCase
+
+from haystack import connections, indexes
+from haystack.backends import BaseSearchBackend
+from haystack.query import SQ
+from haystack.utils.loading import UnifiedIndex
+
+from tendenci.apps.search.fts_backend import FullTextSearchBackend, significant_words
+from tendenci.apps.search.indexer import claim_items, process_unindexed
+from tendenci.apps.search.models import UnindexedItem
+from tendenci.apps.search.signals import save_unindexed_item
+
+
+class UserTestIndex(indexes.SearchIndex, indexes.Indexable):
+    text = indexes.CharField(document=True)
+    username = indexes.CharField(model_attr='username')
+    is_active = indexes.BooleanField(model_attr='is_active')
+
+    def get_model(self):
+        return User
+
+    def prepare_text(self, obj):
+        return u'%s %s' % (obj.first_name, obj.last_name)
+
+
+class FullTextSearchBackendTest(TestCase):
+
+    def setUp(self):
+        self.old_unified_index = connections['default'].get_unified_index()
+        self.index = UserTestIndex()
+        unified_index = UnifiedIndex()
+        unified_index.build(indexes=[self.index])
+        connections['default']._index = unified_index
+
+        self.directory = tempfile.mkdtemp()
+        self.backend = FullTextSearchBackend('default',
+                                             PATH=os.path.join(self.directory, 'index.sqlite3'))
+        try:
+            self.backend.setup()
+        except ImproperlyConfigured as e:
+            self.skipTest(str(e))
+        self.backend.clear()
+
+        self.users = [
+            User.objects.create(username='fts1', first_name='apple banana', last_name='orchard'),
+            User.objects.create(username='fts2', first_name='banana split', last_name='dessert',
+                                is_active=False),
+            User.objects.create(username='fts3', first_name='granite', last_name='quarry'),
+        ]
+        self.backend.update(self.index, self.users)
+
+    def tearDown(self):
+        connections['default']._index = self.old_unified_index
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def result_pks(self, results):
+        return sorted(int(result.pk) for result in results['results'])
+
+    def test_search(self):
+        results = self.backend.search(u'banana')
+        self.assertEqual(results['hits'], 2)
+        self.assertEqual(self.result_pks(results), [self.users[0].pk, self.users[1].pk])
+
+        # words match as prefixes; excluded words and phrases
+        self.assertEqual(self.result_pks(self.backend.search(u'quar')), [self.users[2].pk])
+        self.assertEqual(self.result_pks(self.backend.search(u'banana -orchard')),
+                         [self.users[1].pk])
+        self.assertEqual(self.result_pks(self.backend.search(u'"banana split"')),
+                         [self.users[1].pk])
+        self.assertEqual(self.backend.search(u'kiwi')['hits'], 0)
+
+        # stored fields come back on the results
+        results = self.backend.search(u'granite')
+        self.assertEqual(results['results'][0].username, 'fts3')
+
+    def test_filter(self):
+        results = self.backend.search(u'', query_filter=SQ(content=u'banana') & SQ(is_active=True))
+        self.assertEqual(self.result_pks(results), [self.users[0].pk])
+
+        results = self.backend.search(u'', query_filter=SQ(username__in=['fts2', 'fts3']))
+        self.assertEqual(self.result_pks(results), [self.users[1].pk, self.users[2].pk])
+
+        results = self.backend.search(u'', query_filter=SQ(is_active=True), sort_by=['-username'],
+                                      end_offset=1)
+        self.assertEqual(results['hits'], 2)
+        self.assertEqual(self.result_pks(results), [self.users[2].pk])
+
+    def test_narrow(self):
+        results = self.backend.search(u'banana', narrow_queries=set([u'username:"fts2"']))
+        self.assertEqual(self.result_pks(results), [self.users[1].pk])
+
+        results = self.backend.search(u'', narrow_queries=set([u'orchard', u'username:fts1']))
+        self.assertEqual(self.result_pks(results), [self.users[0].pk])
+
+    def test_update_replaces_document(self):
+        user = self.users[2]
+        user.first_name = 'basalt'
+        user.save()
+        self.backend.update(self.index, [user])
+
+        self.assertEqual(self.backend.search(u'granite')['hits'], 0)
+        self.assertEqual(self.result_pks(self.backend.search(u'basalt')), [user.pk])
+        self.assertEqual(self.backend.search(u'')['hits'], 3)
+
+    def test_remove_and_clear(self):
+        self.backend.remove(self.users[0])
+        self.assertEqual(self.result_pks(self.backend.search(u'banana')), [self.users[1].pk])
+        self.assertEqual(self.backend.search(u'', query_filter=SQ(username='fts1'))['hits'], 0)
+
+        self.backend.clear(models=[User])
+        self.assertEqual(self.backend.search(u'')['hits'], 0)
+
+    def test_more_like_this(self):
+        results = self.backend.more_like_this(self.users[0])
+        self.assertEqual(self.result_pks(results), [self.users[1].pk])
+
+    def test_significant_words(self):
+        self.assertEqual(significant_words(u'The quarry, the quarry and 2016 with granite'),
+                         [u'quarry', u'granite'])
+
+
+class RecordingBackend(BaseSearchBackend):
+    """
+    Records the updated objects and removed ids, or fails when fail is set.
+    """
+    def __init__(self, connection_alias, **connection_options):
+        super(RecordingBackend, self).__init__(connection_alias, **connection_options)
+        self.updated = []
+        self.removed = []
+        self.fail = False
+        self.on_update = None
+
+    def update(self, index, iterable, commit=True):
+        if self.fail:
+            raise Exception('Search backend error')
+        if self.on_update:
+            self.on_update()
+        self.updated.extend(obj.pk for obj in iterable)
+
+    def remove(self, obj_or_string, commit=True):
+        self.removed.append(obj_or_string)
+
+
+class ProcessUnindexedTest(TestCase):
+
+    def setUp(self):
+        self.connection = connections['default']
+        self.old_unified_index = self.connection.get_unified_index()
+        self.old_backend = self.connection._backend
+        unified_index = UnifiedIndex()
+        unified_index.build(indexes=[UserTestIndex()])
+        self.connection._index = unified_index
+        self.backend = RecordingBackend('default')
+        self.connection._backend = self.backend
+
+        self.users = [User.objects.create(username='indexer%d' % i) for i in range(3)]
+        self.content_type = ContentType.objects.get_for_model(User)
+
+    def tearDown(self):
+        self.connection._index = self.old_unified_index
+        self.connection._backend = self.old_backend
+
+    def queue(self, object_id):
+        return UnindexedItem.objects.create(content_type=self.content_type, object_id=object_id)
+
+    def test_process_unindexed(self):
+        deleted_id = self.users[2].pk
+        self.users[2].delete()
+        for object_id in (self.users[0].pk, self.users[1].pk, deleted_id):
+            self.queue(object_id)
+
+        call_command('process_unindexed', batch_size=2)
+
+        self.assertEqual(sorted(self.backend.updated), [self.users[0].pk, self.users[1].pk])
+        self.assertEqual(self.backend.removed, ['auth.user.%d' % deleted_id])
+        self.assertFalse(UnindexedItem.objects.exists())
+
+    def test_failure_keeps_items(self):
+        first = self.queue(self.users[0].pk)
+        self.backend.fail = True
+
+        stats = process_unindexed()
+        self.assertEqual(stats.failed, 1)
+        item = UnindexedItem.objects.get()
+        self.assertEqual(item.object_id, self.users[0].pk)
+        self.assertGreater(item.pk, first.pk)
+        self.assertEqual(item.claimed_dt, None)
+
+        self.backend.fail = False
+        process_unindexed()
+        self.assertEqual(self.backend.updated, [self.users[0].pk])
+        self.assertFalse(UnindexedItem.objects.exists())
+
+    def test_saved_while_indexing(self):
+        """
+            An object saved while it is being indexed stays queued
+        """
+        user = self.users[0]
+        self.queue(user.pk)
+        self.backend.on_update = lambda: save_unindexed_item(User, instance=user)
+
+        process_unindexed(max_batches=1)
+        item = UnindexedItem.objects.get()
+        self.assertEqual((item.object_id, item.claimed_dt), (user.pk, None))
+
+    def test_claim_items(self):
+        items = [self.queue(user.pk) for user in self.users]
+        self.assertEqual([pk for pk, ct, obj_id in claim_items(2)], [items[0].pk, items[1].pk])
+        self.assertEqual([pk for pk, ct, obj_id in claim_items(2)], [items[2].pk])
+        self.assertEqual(claim_items(2), [])
+
+        # the claims of a dead indexer expire
+        UnindexedItem.objects.filter(pk=items[0].pk).update(
+            claimed_dt=datetime.datetime.now() - datetime.timedelta(days=1))
+        self.assertEqual([pk for pk, ct, obj_id in claim_items(2)], [items[0].pk])
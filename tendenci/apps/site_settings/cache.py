@@ -1 +1,3 @@
-SETTING_PRE_KEY = "settings"
\ No newline at end of file
+SETTING_PRE_KEY = "settings"
+SETTING_VERSION_KEY = "version"
+SETTING_SNAPSHOT_KEY = "snapshot"
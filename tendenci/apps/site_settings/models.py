@@ -97,7 +97,10 @@ class Setting(models.Model):
             super(Setting, self).save(*args, **kwargs)
 
         #update the cache when value has changed
-        if orig and self.value != orig.value:
+        if not orig:
+            from tendenci.apps.site_settings.utils import bump_settings_version
+            bump_settings_version()
+        elif self.value != orig.value:
             from tendenci.apps.site_settings.utils import (delete_setting_cache,
                 cache_setting, delete_all_settings_cache)
             from tendenci.apps.site_settings.cache import SETTING_PRE_KEY
@@ -107,3 +110,17 @@ class Setting(models.Model):
             # delete and set cache for single key and save the value in the database
             delete_setting_cache(self.scope, self.scope_category, self.name)
             cache_setting(self.scope, self.scope_category, self.name, self)
+
+
+def delete_setting(sender, instance, **kwargs):
+    """
+    post_delete of Setting; the other processes drop the deleted
+    setting from their snapshot once the version changes.
+    """
+    from tendenci.apps.site_settings.utils import (delete_setting_cache,
+        delete_all_settings_cache)
+
+    delete_all_settings_cache()
+    delete_setting_cache(instance.scope, instance.scope_category, instance.name)
+
+models.signals.post_delete.connect(delete_setting, sender=Setting, weak=False)
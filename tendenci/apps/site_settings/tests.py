@@ -0,0 +1,41 @@
+from django.test import TestCase
+
+from tendenci.apps.site_settings.models import Setting
+from tendenci.apps.site_settings.utils import (get_setting, check_setting,
+    delete_settings_cache)
+
+
+class SettingCacheTest(TestCase):
+
+    def setUp(self):
+        self.setting = Setting.objects.create(
+            name='testflag',
+            label='Test Flag',
+            description='unit testing',
+            data_type='boolean',
+            value='true',
+            input_type='select',
+            scope='module',
+            scope_category='testing')
+
+    def test_value_is_converted(self):
+        self.assertTrue(get_setting('module', 'testing', 'testflag') is True)
+        self.assertTrue(check_setting('module', 'testing', 'testflag'))
+        self.assertEqual(get_setting('module', 'testing', 'missing'), u'')
+
+    def test_save_invalidates_snapshot(self):
+        get_setting('module', 'testing', 'testflag')
+        self.setting.value = 'false'
+        self.setting.save()
+        self.assertTrue(get_setting('module', 'testing', 'testflag') is False)
+
+    def test_delete_settings_cache_invalidates_snapshot(self):
+        get_setting('module', 'testing', 'testflag')
+        Setting.objects.filter(pk=self.setting.pk).update(value='false')
+        delete_settings_cache('module', 'testing')
+        self.assertTrue(get_setting('module', 'testing', 'testflag') is False)
+
+    def test_delete_invalidates_snapshot(self):
+        get_setting('module', 'testing', 'testflag')
+        self.setting.delete()
+        self.assertEqual(get_setting('module', 'testing', 'testflag'), u'')
@@ -1,14 +1,136 @@
+import threading
+import time
+from uuid import uuid4
+
 from django.core.cache import cache
+from django.core.signals import request_started
 from django.conf import settings as d_settings
 from django.utils.translation import ugettext_lazy as _
 
 from tendenci.apps.site_settings.models import Setting
-from tendenci.apps.site_settings.cache import SETTING_PRE_KEY
+from tendenci.apps.site_settings.cache import (SETTING_PRE_KEY,
+    SETTING_VERSION_KEY, SETTING_SNAPSHOT_KEY)
+
+
+# Per-process snapshot of every setting, already type converted.
+# It is rebuilt whenever the version stamp kept in the shared cache
+# changes. The stamp is re-read once per request, and at least every
+# SNAPSHOT_CHECK_INTERVAL seconds for long running processes.
+SNAPSHOT_CHECK_INTERVAL = 5
+_settings_snapshot = {'version': None, 'values': None, 'checked': 0}
+_snapshot_lock = threading.Lock()
+
+
+def _version_key():
+    return '.'.join([d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY,
+                     SETTING_VERSION_KEY])
+
+
+def _snapshot_key(version):
+    return '.'.join([d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY,
+                     SETTING_SNAPSHOT_KEY, version])
+
+
+def get_settings_version():
+    """
+    Returns the version stamp shared by all workers,
+    creating one if the cache does not have it yet.
+    """
+    key = _version_key()
+    version = cache.get(key)
+    if not version:
+        version = uuid4().hex
+        if not cache.add(key, version, None):
+            version = cache.get(key) or version
+    return version
+
+
+def bump_settings_version():
+    """
+    Invalidates the settings snapshot in every worker.
+    """
+    cache.set(_version_key(), uuid4().hex, None)
+    _settings_snapshot['checked'] = 0
+
+
+def _mark_snapshot_unchecked(sender, **kwargs):
+    _settings_snapshot['checked'] = 0
+
+request_started.connect(_mark_snapshot_unchecked,
+                        dispatch_uid='site_settings_snapshot')
+
+
+def convert_setting_value(data_type, value):
+    """
+    Converts a raw setting value to the type given by data_type.
+    """
+    value = value.strip()
+    if data_type == 'boolean':
+        value = value[:1].lower() == 't'
+    elif data_type == 'int':
+        try:
+            value = int(value)
+        except ValueError:
+            value = 0  # default to 0
+    elif data_type == 'file':
+        from tendenci.apps.files.models import File as TFile
+        try:
+            value = TFile.objects.get(pk=value)
+        except (TFile.DoesNotExist, ValueError):
+            value = None
+    return value
+
+
+def _load_raw_settings(version):
+    """
+    Returns the stored setting fields from the shared cache,
+    or from the database on a miss. Secure values stay encrypted.
+    """
+    key = _snapshot_key(version)
+    rows = cache.get(key)
+    if rows is None:
+        rows = list(Setting.objects.values_list('scope', 'scope_category',
+            'name', 'data_type', 'value', 'is_secure'))
+        cache.set(key, rows)
+    return rows
+
+
+def get_settings_snapshot():
+    """
+    Returns a dict of all settings keyed by
+    (scope, scope_category, name) with converted values.
+    """
+    values = _settings_snapshot['values']
+    now = time.time()
+    if values is not None and \
+            now - _settings_snapshot['checked'] < SNAPSHOT_CHECK_INTERVAL:
+        return values
+
+    version = get_settings_version()
+    if values is None or version != _settings_snapshot['version']:
+        with _snapshot_lock:
+            if (_settings_snapshot['values'] is None or
+                    version != _settings_snapshot['version']):
+                values = {}
+                for (scope, scope_category, name, data_type, value,
+                        is_secure) in _load_raw_settings(version):
+                    setting = Setting(value=value, is_secure=is_secure)
+                    values[(scope, scope_category, name)] = \
+                        convert_setting_value(data_type,
+                                              setting.get_value() or u'')
+                _settings_snapshot['values'] = values
+                _settings_snapshot['version'] = version
+            values = _settings_snapshot['values']
+
+    _settings_snapshot['checked'] = now
+    return values
+
 
 def delete_all_settings_cache():
     keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, 'all']
     key = '.'.join(keys)
     cache.delete(key)
+    bump_settings_version()
 
 
 def cache_setting(scope, scope_category, name, value):
@@ -68,8 +190,9 @@ def delete_settings_cache(scope, scope_category):
     for setting in settings:
         keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY,
                 setting.scope, setting.scope_category, setting.name]
-        key = '_'.join(keys)
+        key = '.'.join(keys)
         cache.delete(key)
+    bump_settings_version()
 
 
 def get_setting(scope, scope_category, name):
@@ -79,52 +202,10 @@ def get_setting(scope, scope_category, name):
         Returns the value of the setting if it exists
         otherwise it returns an empty string
     """
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope,
-            scope_category, name]
-    key = '.'.join(keys)
-
-    # setting = cache.get(key)
-    setting = None
-
-    if not setting:
-        #setting is not in the cache
-        try:
-            #try to get the setting and cache it
-            filters = {
-                'scope': scope,
-                'scope_category': scope_category,
-                'name': name
-            }
-            setting = Setting.objects.get(**filters)
-            cache_setting(setting.scope, setting.scope_category, setting.name, setting)
-        except Exception:
-            setting = None
-
-    #check if the setting has been set and evaluate the value
-    if setting:
-        try:
-            # test is get_value will work
-            value = setting.get_value().strip()
-        except AttributeError:
-            return u''
-        # convert data types
-        if setting.data_type == 'boolean':
-            value = value[0].lower() == 't'
-        if setting.data_type == 'int':
-            if value.strip():
-                value = int(value.strip())
-            else:
-                value = 0  # default to 0
-        if setting.data_type == 'file':
-            from tendenci.apps.files.models import File as TFile
-            try:
-                tfile = TFile.objects.get(pk=value)
-            except TFile.DoesNotExist:
-                tfile = None
-            value = tfile
-        return value
-
-    return u''
+    try:
+        return get_settings_snapshot().get((scope, scope_category, name), u'')
+    except Exception:
+        return u''
 
 
 def get_global_setting(name):
@@ -136,35 +217,7 @@ def get_module_setting(scope_category, name):
 
 
 def check_setting(scope, scope_category, name):
-    #check cache first
-    keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope,
-            scope_category, name]
-    key = '.'.join(keys)
-
-    setting = cache.get(key)
-    if setting:
-        return True
-
-    missing_keys = [d_settings.CACHE_PRE_KEY, SETTING_PRE_KEY, scope,
-            scope_category, name, "missing"]
-    missing_key = '.'.join(missing_keys)
-
-    missing = cache.get(missing_key)
-    if not missing:
-        #check the db if it is not in the cache
-        exists = Setting.objects.filter(scope=scope,
-            scope_category=scope_category, name=name).exists()
-
-        #cache that it does not exist
-        if not exists:
-            #set to True to signify that it is missing so we do not
-            #come back into this if statement and query db again
-            is_set = cache.add(missing_key, True)
-            if not is_set:
-                cache.set(missing_key, True)
-
-        return exists
-    return False
+    return (scope, scope_category, name) in get_settings_snapshot()
 
 
 def get_form_list(user):
@@ -1,14 +1,16 @@
 from django.core.management.base import BaseCommand
-from django.conf import settings
-from django.core.cache import cache
+
+from tendenci.apps.base.cache_tags import invalidate_tags
+from tendenci.apps.theme.template_loaders import THEME_FILES_TAG, invalidate_theme_templates
 
 
 class Command(BaseCommand):
     """
     If theme files are served on an external server, such as AWS S3,
-    the theme files contents are cached and the cache keys are added
-    to a list that is also cached. This command clears that list, so
-    that theme files are then re-cached.
+    the theme files contents are cached under a cache tag. This command
+    invalidates that tag, so that theme files are then re-cached.
+    Resolved template indexes of the theme template loaders are
+    dropped as well.
 
     A usecase for this would be whenever a new theme is uploaded to the remote storage.
 
@@ -16,10 +18,5 @@ class Command(BaseCommand):
     """
 
     def handle(self, *args, **options):
-        cache_group_key = "%s.theme_files_cache_list" % settings.SITE_CACHE_KEY
-        cache_group_list = cache.get(cache_group_key)
-
-        if cache_group_list:  # protects against NoneType object
-            for key in cache_group_list:
-                cache.delete(key)
-            cache.set(cache_group_key, [])
+        invalidate_tags(THEME_FILES_TAG)
+        invalidate_theme_templates()
@@ -2,9 +2,10 @@
 Wrapper for loading template based on a selected Theme.
 """
 import os
+import time
 
 from django.conf import settings
-from django.template import TemplateDoesNotExist
+from django.template import Template, TemplateDoesNotExist
 from django.template.loader import BaseLoader
 from django.template import engines
 engine = engines['django'].engine
@@ -13,15 +14,40 @@ get_template_from_string = engine.from_string
 make_origin = engine.make_origin
 
 from django.utils._os import safe_join
-from django.core.cache import cache
 from django.utils.translation import ugettext_lazy as _
 
 from tendenci.libs.boto_s3.utils import read_theme_file_from_s3
+from tendenci.apps.base.cache_tags import (get_tag_versions, invalidate_tags,
+    tagged_cache_get, tagged_cache_set)
 from tendenci.apps.theme.utils import get_theme_root
 from tendenci.apps.theme.middleware import get_current_request
 
 non_theme_source_loaders = None
 
+THEME_TEMPLATES_TAG = 'theme.templates'
+# the contents of theme files read from S3
+THEME_FILES_TAG = 'theme.files'
+
+# How often (in seconds) an indexed template is checked against the
+# mtime of its file, and the index against the theme version shared
+# by all processes.
+THEME_TEMPLATE_CHECK_INTERVAL = getattr(settings,
+                                        'THEME_TEMPLATE_CHECK_INTERVAL', 5)
+
+
+# every Loader instance, so their indexes can be cleared on theme changes
+_loaders = []
+
+
+def invalidate_theme_templates():
+    """
+    Clears the resolved template index of this process and makes
+    every other process drop theirs.
+    """
+    invalidate_tags(THEME_TEMPLATES_TAG)
+    for loader in _loaders:
+        loader.clear_index()
+
 
 class Loader(BaseLoader):
     """Loader that includes a theme's templates files that enables
@@ -47,22 +73,112 @@ class Loader(BaseLoader):
         article view. - @jennyq)
         """
         self.theme_root = get_theme_root()
+        # (theme_root, mobile, template_name) -> (template, path, mtime, checked)
+        # a template of None marks a miss; path then lists the files tried
+        self.template_index = {}
+        self.index_version = None
+        self.index_checked = 0
+        _loaders.append(self)
         super(Loader, self).__init__(engine)
 
 
+    def get_theme_dirs(self, theme_root, mobile):
+        theme_templates = []
+        if mobile:
+            theme_templates.append(os.path.join(theme_root, 'mobile'))
+        theme_templates.append(os.path.join(theme_root, 'templates'))
+        return theme_templates
+
+    def check_index_version(self, now):
+        """
+        Drops the index when the theme version shared through the
+        cache has been bumped by another process.
+        """
+        if now - self.index_checked < THEME_TEMPLATE_CHECK_INTERVAL:
+            return
+        version = get_tag_versions([THEME_TEMPLATES_TAG])[0]
+        if version != self.index_version:
+            self.template_index = {}
+            self.index_version = version
+        self.index_checked = now
+
+    def is_stale(self, entry, now):
+        """
+        Local theme files are checked by mtime; theme files
+        on S3 only change through clear_theme_cache.
+        """
+        template, path, mtime, checked = entry
+        if settings.USE_S3_THEME or now - checked < THEME_TEMPLATE_CHECK_INTERVAL:
+            return False
+        if template is None:
+            # negative entry: stale once one of the tried files appears
+            return any(os.path.exists(p) for p in path)
+        try:
+            return os.path.getmtime(path) != mtime
+        except OSError:
+            return True
+
+    def load_template(self, template_name, template_dirs=None):
+        """
+        Looks the template up in the index of resolved templates for
+        the current theme and variant (mobile or not) before reading
+        and compiling it. Misses are indexed too.
+        """
+        if template_dirs:
+            return super(Loader, self).load_template(template_name, template_dirs)
+
+        now = time.time()
+        self.check_index_version(now)
+        current_request = get_current_request()
+        mobile = bool(current_request and getattr(current_request, 'mobile', False))
+        theme_root = get_theme_root()
+        key = (theme_root, mobile, template_name)
+
+        entry = self.template_index.get(key)
+        if entry is not None:
+            if not self.is_stale(entry, now):
+                if entry[0] is None:
+                    raise TemplateDoesNotExist(template_name)
+                return entry[0], None
+
+        try:
+            source, path = self.load_template_source(template_name)
+        except TemplateDoesNotExist:
+            tried = [os.path.join(d, template_name)
+                     for d in self.get_theme_dirs(theme_root, mobile)]
+            self.template_index[key] = (None, tried, None, now)
+            raise
+
+        origin = make_origin(path, self.load_template_source, template_name, None)
+        try:
+            template = Template(source, origin, template_name, self.engine)
+        except TemplateDoesNotExist:
+            # let the caller compile it so the missing parent is reported
+            return source, path
+
+        mtime = None
+        if not settings.USE_S3_THEME:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                pass
+        self.template_index[key] = (template, path, mtime, now)
+        return template, None
+
+    def clear_index(self):
+        self.template_index = {}
+
     def get_template_sources(self, template_name, template_dirs=None):
         """Return the absolute paths to "template_name", when appended to the
         selected theme directory in THEMES_DIR.
         Any paths that don't lie inside one of the
         template dirs are excluded from the result set, for security reasons.
         """
-        theme_templates = []
         current_request = get_current_request()
         # this is needed when the theme is changed
         self.theme_root = get_theme_root()
-        if current_request and current_request.mobile:
-            theme_templates.append(os.path.join(self.theme_root, 'mobile'))
-        theme_templates.append(os.path.join(self.theme_root, 'templates'))
+        mobile = bool(current_request and getattr(current_request, 'mobile', False))
+        theme_templates = self.get_theme_dirs(self.theme_root, mobile)
 
         for template_path in theme_templates:
             try:
@@ -87,7 +203,7 @@ class Loader(BaseLoader):
             if settings.USE_S3_THEME:
                 # first try to read from cache
                 cache_key = ".".join([settings.SITE_CACHE_KEY, "theme", filepath])
-                cached_template = cache.get(cache_key)
+                cached_template = tagged_cache_get(cache_key, [THEME_FILES_TAG])
                 if cached_template == "tried":
                     # Skip out of this on to the next template file
                     continue
@@ -97,22 +213,13 @@ class Loader(BaseLoader):
                 try:
                     file = read_theme_file_from_s3(filepath)
                     try:
-                        cache.set(cache_key, file)
-                        cache_group_key = "%s.theme_files_cache_list" % settings.SITE_CACHE_KEY
-                        cache_group_list = cache.get(cache_group_key)
-
-                        if cache_group_list is None:
-                            cache.set(cache_group_key, [cache_key])
-                        else:
-                            cache_group_list += [cache_key]
-                            cache.set(cache_group_key, cache_group_list)
-
+                        tagged_cache_set(cache_key, file, [THEME_FILES_TAG])
                         return (file, filepath)
                     finally:
                         pass
                 except:
                     # Cache that we tried this file
-                    cache.set(cache_key, "tried")
+                    tagged_cache_set(cache_key, "tried", [THEME_FILES_TAG])
 
             # Otherwise, look on to local file system.
             else:
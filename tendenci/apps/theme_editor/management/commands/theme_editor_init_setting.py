@@ -7,10 +7,13 @@ class Command(BaseCommand):
     """
     def handle(self, *args, **options):
         from django.conf import settings
+        from django.core.management import call_command
         from tendenci.apps.site_settings.models import Setting
-        from django.core.cache import cache
+        from tendenci.apps.site_settings.utils import delete_all_settings_cache
 
         setting = Setting.objects.get(scope='module', scope_category='theme_editor')
         setting.set_value(settings.SITE_THEME)
         setting.save()
-        cache.clear()
+        # the settings and theme caches are the ones affected
+        delete_all_settings_cache()
+        call_command('clear_theme_cache')
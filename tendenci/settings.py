@@ -82,6 +82,7 @@ MIDDLEWARE_CLASSES = (
     'tendenci.apps.redirects.middleware.RedirectMiddleware',
     'tendenci.apps.mobile.middleware.MobileMiddleware',
     'tendenci.apps.theme.middleware.RequestMiddleware',
+    'tendenci.apps.event_logs.middleware.EventLogMiddleware',
     'tendenci.apps.base.middleware.MissingAppMiddleware',
     'tendenci.apps.memberships.middleware.ExceededMaxTypesMiddleware',
     'tendenci.apps.forums.middleware.PybbMiddleware',
@@ -166,8 +167,13 @@ TEMPLATES = [
          'loaders':  [
                 ('django.template.loaders.cached.Loader', [
                 'app_namespace.Loader',
+                ]),
+                # the theme loader keeps its own index of resolved
+                # templates per theme and per mobile/desktop variant,
+                # so it stays out of the cached loader
                 'tendenci.apps.theme.template_loaders.Loader',
                 #'tendenci.apps.theme.template_loaders.load_template_source',
+                ('django.template.loaders.cached.Loader', [
                 'django.template.loaders.filesystem.Loader',
                 'django.template.loaders.app_directories.Loader',
                 #'django.template.loaders.eggs.load_template_source',
@@ -412,6 +418,17 @@ CELERY_IS_ACTIVE = False
 # if this setting is True
 USE_SUBPROCESS = True
 
+# --------------------------------------#
+# EVENT LOGS
+# --------------------------------------#
+# EVENT_LOG_WRITE_MODE - 'sync' saves each event log inside the
+# request. 'async' queues them per process and writes them with
+# bulk_create every EVENT_LOG_FLUSH_INTERVAL seconds or once
+# EVENT_LOG_BATCH_SIZE records are waiting.
+EVENT_LOG_WRITE_MODE = 'sync'
+EVENT_LOG_BATCH_SIZE = 100
+EVENT_LOG_FLUSH_INTERVAL = 5
+
 # --------------------------------------#
 # Hackstack Search
 # --------------------------------------#
@@ -420,6 +437,16 @@ HAYSTACK_CONNECTIONS = {
         'ENGINE': 'haystack.backends.simple_backend.SimpleEngine',
     }
 }
+# The embedded full text search engine is opt-in, see
+# docs/source/topic-guides/search.txt. Set in your project settings:
+# HAYSTACK_CONNECTIONS = {
+#     'default': {
+#         'ENGINE': 'tendenci.apps.search.fts_backend.FullTextSearchEngine',
+#         # a writable SQLite file; on PostgreSQL the index is kept in the database
+#         'PATH': os.path.join(PROJECT_ROOT, 'search_index', 'search_index.sqlite3'),
+#     }
+# }
+# then run: python manage.py migrate search && python manage.py rebuild_index
 
 HAYSTACK_SEARCH_RESULTS_PER_PAGE = 10
 